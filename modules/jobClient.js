@@ -0,0 +1,81 @@
+// Job Client Module
+// Talks to the Python job service (other-tools/job_server.py) so long-running
+// tools (TTS, page data, photos, face swap) run without blocking the editor
+
+const http = require('http');
+
+// PY_JOBS_SOCKET (Unix socket path) wins over PY_JOBS_URL
+const JOBS_SOCKET = process.env.PY_JOBS_SOCKET || null;
+const JOBS_URL = new URL(process.env.PY_JOBS_URL || 'http://127.0.0.1:8765');
+
+function requestOptions(method, jobPath) {
+    const options = { method, path: jobPath, headers: { 'Content-Type': 'application/json' } };
+    if (JOBS_SOCKET) {
+        options.socketPath = JOBS_SOCKET;
+    } else {
+        options.hostname = JOBS_URL.hostname;
+        options.port = JOBS_URL.port;
+    }
+    return options;
+}
+
+// JSON request to the job service; resolves { status, body }
+function callJobService(method, jobPath, payload) {
+    return new Promise((resolve, reject) => {
+        const options = requestOptions(method, jobPath);
+        const data = payload === undefined ? null : JSON.stringify(payload);
+        // The service reads the body by Content-Length (no chunked uploads)
+        if (data !== null) options.headers['Content-Length'] = Buffer.byteLength(data);
+        const req = http.request(options, (res) => {
+            let text = '';
+            res.setEncoding('utf8');
+            res.on('data', chunk => { text += chunk; });
+            res.on('end', () => {
+                try {
+                    resolve({ status: res.statusCode, body: text ? JSON.parse(text) : null });
+                } catch (parseError) {
+                    reject(new Error(`Invalid response from job service: ${parseError.message}`));
+                }
+            });
+        });
+        req.on('error', (error) => {
+            reject(new Error(`Job service unavailable (start other-tools/job_server.py): ${error.message}`));
+        });
+        if (data !== null) req.write(data);
+        req.end();
+    });
+}
+
+// Queue an operation with the same arguments as its command line
+function submitJob(operation, args = [], cwd = undefined) {
+    return callJobService('POST', '/jobs', { operation, args, cwd });
+}
+
+function getJob(jobId) {
+    return callJobService('GET', `/jobs/${encodeURIComponent(jobId)}`);
+}
+
+function cancelJob(jobId) {
+    return callJobService('DELETE', `/jobs/${encodeURIComponent(jobId)}`);
+}
+
+// Open the job's NDJSON event stream; the caller pipes or reads the response
+function streamJobEvents(jobId, since = 0) {
+    return new Promise((resolve, reject) => {
+        const req = http.request(
+            requestOptions('GET', `/jobs/${encodeURIComponent(jobId)}/events?since=${Number(since) || 0}`),
+            resolve
+        );
+        req.on('error', (error) => {
+            reject(new Error(`Job service unavailable (start other-tools/job_server.py): ${error.message}`));
+        });
+        req.end();
+    });
+}
+
+module.exports = {
+    submitJob,
+    getJob,
+    cancelJob,
+    streamJobEvents
+};
@@ -6,6 +6,33 @@ const fs = require('fs');
 const path = require('path');
 const { exec } = require('child_process');
 
+// Probe results written by other-tools/media_index.py (json/media-index.json), if any;
+// only the index format this reader knows (INDEX_VERSION there) is used
+const MEDIA_INDEX_VERSION = 2;
+
+function loadMediaIndex(storyPath) {
+    try {
+        const index = JSON.parse(fs.readFileSync(path.join(storyPath, 'json', 'media-index.json'), 'utf8'));
+        return index.version === MEDIA_INDEX_VERSION ? index.files || {} : {};
+    } catch (error) {
+        return {};
+    }
+}
+
+// Duration from the index while the file is unchanged (same size and mtime), else null.
+// mtime_ns is a string in the index: as a JSON number it would lose its last digits
+function indexedMediaDuration(mediaIndex, storyPath, mediaPath) {
+    const entry = mediaIndex[mediaPath];
+    if (!entry || entry.duration === null || entry.duration === undefined) return null;
+    try {
+        const stats = fs.statSync(path.join(storyPath, mediaPath), { bigint: true });
+        if (stats.size === BigInt(entry.size) && stats.mtimeNs === BigInt(entry.mtime_ns)) return entry.duration;
+    } catch (error) {
+        // Missing file: fall through to ffprobe's handling
+    }
+    return null;
+}
+
 // Generate page timing JSON based on audio files
 async function generatePageTiming(storyPath, storyFolder) {
     console.log('Generating timing for story:', storyFolder);
@@ -16,6 +43,7 @@ async function generatePageTiming(storyPath, storyFolder) {
     );
     
     const timingData = [];
+    const mediaIndex = loadMediaIndex(storyPath);
     
     for (const file of files) {
         const pageNum = parseInt(file.match(/\d+/)[0]);
@@ -25,7 +53,11 @@ async function generatePageTiming(storyPath, storyFolder) {
         const audioPath = path.join(storyPath, 'media', `${pageNum}.mp3`);
         console.log(`Page ${pageNum}: Checking for audio file: ${audioPath}`);
         
-        if (fs.existsSync(audioPath)) {
+        const indexedDuration = indexedMediaDuration(mediaIndex, storyPath, `media/${pageNum}.mp3`);
+        if (indexedDuration !== null) {
+            duration = Math.round(indexedDuration)+1; // round up and add 1s buffer
+            console.log(`Page ${pageNum}: Indexed audio duration ${indexedDuration}s -> Rounded to ${duration}s`);
+        } else if (fs.existsSync(audioPath)) {
             try {
                 await new Promise((resolve) => {
                     const cmd = `ffprobe -v quiet -show_entries format=duration -of csv=p=0 "${audioPath}"`;
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# python3 benchmarks/bench_pagedata_migrate.py [--stories 200] [--pages 40] [--jobs 1 2 4 8]
+# -*- coding: utf-8 -*-
+"""
+Throughput of the pageNhtml2json.py migration over a synthetic story library
+Serial (process_story_folder per folder, the previous behaviour) against the
+process-pool mode (process_story_folders) at several worker counts. Pages are
+~2 KB builder-style HTML; every fifth page also carries ~200 KB of inline media.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pageNhtml2json import process_story_folder, process_story_folders
+
+MEDIA = "A" * 200_000
+
+
+def make_library(root, stories, pages):
+    folders = []
+    for story in range(stories):
+        folder = os.path.join(root, f"story{story}")
+        os.makedirs(folder)
+        for page in range(1, pages + 1):
+            data = {"bgUrl": f"media/{page}.jpg", "pageNum": str(page), "storyTitle": f"故事 {story}",
+                    "conv2": "再说了，咱俩从高中就是同学了。" * 4, "showPageNumber": True}
+            media = f"<img src='data:image/jpeg;base64,{MEDIA}'>" if page % 5 == 0 else ""
+            with open(os.path.join(folder, f"page{page}.html"), "w", encoding="utf-8") as f:
+                f.write("<!DOCTYPE html><html><body>\n"
+                        f"<script> var pageData = {json.dumps(data, ensure_ascii=False)}; </script>\n"
+                        f"{media}<script src='javascript/page.js'></script></body></html>\n")
+        folders.append(folder)
+    return folders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-story pageData migration.")
+    parser.add_argument("--stories", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    total = args.stories * args.pages
+    print(f"{args.stories} stories x {args.pages} pages = {total} pages, {os.cpu_count()} CPUs")
+    print(f"{'mode':>10} {'seconds':>8} {'pages/s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        folders = make_library(tmp, args.stories, args.pages)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for folder in folders:
+                process_story_folder(folder)
+        elapsed = time.perf_counter() - start
+        print(f"{'serial':>10} {elapsed:>8.2f} {total / elapsed:>8.0f}")
+
+        for jobs in args.jobs:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = process_story_folders(folders, jobs)
+            elapsed = time.perf_counter() - start
+            assert sum(result["pages"] for result in summary.values()) == total
+            print(f"{f'pool x{jobs}':>10} {elapsed:>8.2f} {total / elapsed:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
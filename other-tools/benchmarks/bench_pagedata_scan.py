@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# python3 benchmarks/bench_pagedata_scan.py [--sizes 10k 100k 1m 10m 50m] [--repeats 5]
+# -*- coding: utf-8 -*-
+"""
+pageData extraction: previous read-all + lazy regex vs the memory-mapped scanner
+Synthetic pages shaped like the builder's output are padded to each size with
+inline base64 media, once after the pageData script (typical) and once inside
+pageData itself (a data: URL in bgUrl). Reports median wall time and peak Python
+allocations (tracemalloc; mmap pages are not Python allocations), and checks a
+page whose conversation text contains "};".
+"""
+import argparse
+import base64
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pagedata_scanner import scan_pagedata
+
+LEGACY_PATTERN = r'var pageData = ({[\s\S]*?});(?=\s*</script>|\s*var|\s*function|\s*document)'
+
+PAGE_DATA = {
+    "bgUrl": "media/6.jpg", "bgScale": "33", "fgUrl": "media/", "audioUrl": "",
+    "conv2": "再说了，咱俩从高中就是同学了，我其实早就知道你喜欢扮成女孩子。",
+    "storyTitle": "文化祭来袭", "pageNum": "6", "showPageNumber": True,
+}
+HEAD = "<!DOCTYPE html>\n<html>\n<head><meta charset='utf-8'><title>page</title></head>\n<body>\n"
+
+
+def legacy_extract(path):
+    """The extractor before the scanner: whole file into a str, lazy regex"""
+    with open(path, "r", encoding="utf-8") as f:
+        html_content = f.read()
+    match = re.search(LEGACY_PATTERN, html_content)
+    return json.loads(match.group(1)) if match else None
+
+
+def parse_size(text):
+    units = {"k": 1_000, "m": 1_000_000}
+    return int(float(text[:-1]) * units[text[-1].lower()]) if text[-1].lower() in units else int(text)
+
+
+def blob(nbytes):
+    """Base64 text of about nbytes characters"""
+    return base64.b64encode(os.urandom(nbytes * 3 // 4)).decode("ascii")
+
+
+def make_page(path, size, inline):
+    data = dict(PAGE_DATA)
+    padding = max(0, size - 600)
+    if inline:
+        data["bgUrl"] = "data:image/jpeg;base64," + blob(padding)
+        tail = ""
+    else:
+        tail = f"<img id='inline' src='data:image/jpeg;base64,{blob(padding)}'>\n"
+    script = f"<script> var pageData = {json.dumps(data, ensure_ascii=False)}; </script>\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEAD + script + tail + "<script src='javascript/page.js'></script>\n</body>\n</html>\n")
+
+
+def measure(extract, path, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = extract(path)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    extract(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sorted(timings)[len(timings) // 2], peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pageData extraction on synthetic pages.")
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k", "1m", "10m", "50m"])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'page':>6} {'media':>8} {'regex ms':>9} {'scan ms':>9} {'speedup':>8} {'regex peak':>11} {'scan peak':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_text in args.sizes:
+            size = parse_size(size_text)
+            for inline in (False, True):
+                path = os.path.join(tmp, f"page_{size_text}_{int(inline)}.html")
+                make_page(path, size, inline)
+                regex_time, regex_peak, expected = measure(legacy_extract, path, args.repeats)
+                scan_time, scan_peak, result = measure(scan_pagedata, path, args.repeats)
+                assert result == expected
+                os.remove(path)
+                print(f"{size_text:>6} {'inline' if inline else 'after':>8} {regex_time * 1e3:>9.2f} "
+                      f"{scan_time * 1e3:>9.2f} {regex_time / scan_time:>7.1f}x "
+                      f"{regex_peak / 1e6:>9.2f}MB {scan_peak / 1e6:>8.2f}MB")
+
+        # A conversation line containing "};" must not end the object
+        path = os.path.join(tmp, "tricky.html")
+        data = dict(PAGE_DATA, conv1="if (x) { return; }; var y = 1;")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(HEAD + f"<script> var pageData = {json.dumps(data)}; </script>\n</body></html>\n")
+        try:
+            legacy_ok = legacy_extract(path) == data
+        except ValueError:
+            legacy_ok = False
+        print(f'"}};" inside a string: regex {"ok" if legacy_ok else "FAILS"}, '
+              f'scanner {"ok" if scan_pagedata(path) == data else "FAILS"}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# python3 benchmarks/bench_pages_output.py [--pages 1000] [--repeats 20]
+# -*- coding: utf-8 -*-
+"""
+Size and parse time of pageNhtml2json.py outputs on a synthetic story
+Compares the pretty pages.json, --compact, and --shards (what a loader needs for
+page 1: the index plus one shard), and reports the --media-manifest size.
+Parse time is json.loads() (median of --repeats), a stand-in for the browser's
+JSON.parse; gzip sizes approximate what a compressing server sends.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pageNhtml2json import save_story_json, PAGES_JSON, SHARDS_DIR, SHARD_INDEX, MEDIA_JSON
+
+LINES = [
+    "再说了，咱俩从高中就是同学了，我其实早就知道你喜欢扮成女孩子。",
+    "我...我支持你，支持你做自己！",
+    "你知道我们这里招的是伪娘对吧？",
+    "",
+]
+
+
+def make_pages(count, seed=1):
+    rng = random.Random(seed)
+    pages = {}
+    for n in range(1, count + 1):
+        pages[str(n)] = {
+            "bgUrl": f"media/{n}.jpg", "bgScale": "33", "bgWid": "100", "bgPos": "33",
+            "fgUrl": rng.choice(["media/", f"media/fg{n}.png"]), "audioUrl": f"media/{n}.mp3",
+            "descript": rng.choice(LINES), "fgScale": "30", "fgWid": "100", "fgPos": "70",
+            "bgStart": "0", "bgEnd": "0", "fgStart": "0", "fgEnd": "0", "title": "", "titlePos": "top-left",
+            "pageNum": str(n), "conv1": rng.choice(LINES), "conv1PosL": "50", "conv1PosT": "50",
+            "conv2": rng.choice(LINES), "conv2PosL": "600", "conv2PosT": "350",
+            "animationFolder": f"media/{n}/" if n % 10 == 0 else "", "animationInterval": "0.1",
+            "animationScale": "80", "animationPosition": "30", "animationAudio": "",
+            "storyTitle": "文化祭来袭", "playerBgAudio": "media/music.m4a", "sceneBgColor": "#ffffff",
+            "controlsBgColor": "#000000", "descriptPos": "top", "showPageNumber": True,
+        }
+    return pages
+
+
+def parse_time(paths, repeats):
+    """Median seconds to read and parse all paths"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for path in paths:
+            with open(path, "rb") as f:
+                json.loads(f.read())
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def sizes(paths):
+    raw = b"".join(Path(path).read_bytes() for path in paths)
+    gzipped = sum(len(gzip.compress(Path(path).read_bytes())) for path in paths)
+    return len(raw), gzipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pages.json output variants.")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages)
+    plan = {"fingerprints": {}}
+    print(f"{args.pages}-page story")
+    print(f"{'output':<34} {'bytes':>10} {'gzip':>9} {'parse ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = []
+        for label, options in (("pages.json (pretty, previous)", {}),
+                               ("pages.json --compact", {"compact": True})):
+            folder = os.path.join(tmp, label.split()[1].strip("()"))
+            os.makedirs(folder)
+            save_story_json(folder, pages, plan, options)
+            path = os.path.join(folder, "json", PAGES_JSON)
+            rows.append((label, [path]))
+
+        folder = os.path.join(tmp, "shards")
+        os.makedirs(folder)
+        save_story_json(folder, pages, plan, {"compact": True, "shards": True, "media": True})
+        shard_dir = os.path.join(folder, "json", SHARDS_DIR)
+        rows.append(("--shards: index.json", [os.path.join(shard_dir, SHARD_INDEX)]))
+        rows.append(("--shards: index + page 1", [os.path.join(shard_dir, SHARD_INDEX),
+                                                   os.path.join(shard_dir, "1.json")]))
+        rows.append(("--shards: one page shard", [os.path.join(shard_dir, "1.json")]))
+        rows.append(("--media-manifest: media.json", [os.path.join(folder, "json", MEDIA_JSON)]))
+
+        for label, paths in rows:
+            raw, gzipped = sizes(paths)
+            print(f"{label:<34} {raw:>10} {gzipped:>9} {parse_time(paths, args.repeats) * 1e3:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
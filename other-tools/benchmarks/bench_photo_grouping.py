@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# python3 benchmarks/bench_photo_grouping.py [--files 1000000] [--repeats 3]
+# -*- coding: utf-8 -*-
+"""
+Grouping synthetic photo names into sequences with organize_photos.py
+The previous parser (two uncompiled re.match calls per name, n-n-n.jpg and
+n-n-n-x.jpg only) against the compiled pattern engine. Names are shuffled
+n-n-n.jpg and n-n-n-x.jpg shots plus 5% non-matching files; the new engine
+must produce the same sequences in the same order. Reports median wall time.
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from organize_photos import group_photos_by_sequence
+
+
+def legacy_parse(filename):
+    """The parser before the pattern engine"""
+    match1 = re.match(r'^(\d+)-(\d+)-(\d+)\.jpg$', filename)
+    if match1:
+        return (int(match1.group(1)), int(match1.group(2)), int(match1.group(3)), None)
+    match2 = re.match(r'^(\d+)-(\d+)-(\d+)-([a-z])\.jpg$', filename)
+    if match2:
+        return (int(match2.group(1)), int(match2.group(2)), int(match2.group(3)), match2.group(4))
+    return None
+
+
+def legacy_group(photo_files):
+    sequences = defaultdict(list)
+    for filename in photo_files:
+        parsed = legacy_parse(filename)
+        if parsed:
+            seq_key = (parsed[0], parsed[1]) if parsed[3] is None else parsed[:3]
+            sequences[seq_key].append((filename, parsed))
+    for seq_key in sequences:
+        if any(x[1][3] is not None for x in sequences[seq_key]):
+            sequences[seq_key].sort(key=lambda x: (x[1][3] or ''))
+        else:
+            sequences[seq_key].sort(key=lambda x: x[1][2])
+    return sequences
+
+
+def make_names(count, seed=1):
+    rng = random.Random(seed)
+    names = []
+    while len(names) < count:
+        roll = rng.random()
+        a, b, c = rng.randint(1, 2000), rng.randint(1, 50), rng.randint(1, 40)
+        if roll < 0.05:
+            names.append(rng.choice([f"IMG_{a}{b}{c}.jpg", f"{a}-{b}.jpg", f"notes-{a}.txt"]))
+        elif roll < 0.25:
+            names.append(f"{a}-{b}-{c}-{rng.choice(string.ascii_lowercase)}.jpg")
+        else:
+            names.append(f"{a}-{b}-{c}.jpg")
+    return list(dict.fromkeys(names))
+
+
+def measure(group, names, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = group(names)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark photo name grouping.")
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    names = make_names(args.files)
+    legacy_time, expected = measure(legacy_group, names, args.repeats)
+    engine_time, result = measure(group_photos_by_sequence, names, args.repeats)
+    assert {key: [name for name, _ in photos] for key, photos in result.items()} == \
+        {key: [name for name, _ in photos] for key, photos in expected.items()}
+
+    print(f"{len(names)} names, {len(result)} sequences, "
+          f"{sum(map(len, result.values()))} photos")
+    print(f"{'parser':>8} {'seconds':>8} {'names/s':>10}")
+    for label, elapsed in (("previous", legacy_time), ("compiled", engine_time)):
+        print(f"{label:>8} {elapsed:>8.2f} {len(names) / elapsed:>10.0f}")
+    print(f"speedup {legacy_time / engine_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
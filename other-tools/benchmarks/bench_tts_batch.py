@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# python3 benchmarks/bench_tts_batch.py [--lines 200] [--latency 0.2] [--per-char 0.005]
+# -*- coding: utf-8 -*-
+"""
+Reproducible throughput benchmark for the cosyvoice_tts_json.py batch pipeline
+Runs run_batch() on a synthetic narration file with the offline local backend at
+several --jobs settings, and measures CLI startup (python cosyvoice_tts_json.py -h)
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import Namespace
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, TOOLS_DIR)
+from jobkit import Journal
+
+SENTENCES = [
+    "你好，我叫王小娇，是来这里应聘的。",
+    "你知道我们这里招的是伪娘对吧？",
+    "这是我本来的声音，现在你相信人家了吧？",
+    "哇，你好漂亮！你是怎么做到的？",
+]
+
+
+def make_narration(lines, voices=4, seed=1):
+    rng = random.Random(seed)
+    return {
+        str(i): [str(rng.randint(1, voices)), "".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 4)))]
+        for i in range(1, lines + 1)
+    }
+
+
+def startup_time(repeats=5):
+    """Median wall time of `python cosyvoice_tts_json.py -h`"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(TOOLS_DIR, "cosyvoice_tts_json.py"), "-h"],
+                       check=True, capture_output=True)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the TTS batch pipeline with the local backend.")
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="Local backend delay per request (s)")
+    parser.add_argument("--per-char", type=float, default=0.005, help="Local backend delay per character (s)")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    data = make_narration(args.lines)
+    chars = sum(len(text) for _, text in data.values())
+    print(f"Startup (cosyvoice_tts_json.py -h): {startup_time():.3f}s")
+    print(f"{args.lines} lines, {chars} characters, local backend {args.latency}s + {args.per_char}s/char")
+    print(f"{'jobs':>5} {'seconds':>8} {'lines/s':>8} {'chars/s':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TTS_VOICE_STATS_FILE"] = os.path.join(tmp, "voice_stats.json")
+        import cosyvoice_tts_json
+
+        cwd = os.getcwd()
+        try:
+            for jobs in args.jobs:
+                run_dir = os.path.join(tmp, f"jobs{jobs}")
+                os.makedirs(run_dir)
+                os.chdir(run_dir)
+                options = Namespace(
+                    backend="local", local_latency=args.latency, local_per_char=args.per_char,
+                    max_chars=0, workers=1, jobs=jobs, per_voice=jobs, retries=0, backoff=0, output_dir=None,
+                )
+                start = time.perf_counter()
+                journal = Journal(os.path.join(run_dir, "journal.jsonl"))
+                summary = cosyvoice_tts_json.run_batch(data, journal, options)
+                elapsed = time.perf_counter() - start
+                assert summary["ok"] == args.lines
+                print(f"{jobs:>5} {elapsed:>8.2f} {args.lines / elapsed:>8.1f} {chars / elapsed:>8.0f}")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# python3 benchmarks/bench_tts_postprocess.py [--lines 40] [--rtt 0.05] [--bandwidth 2000000]
+# -*- coding: utf-8 -*-
+"""
+Size and load-latency comparison for narration post-processing on a synthetic story
+Generates N mp3 "lines" (tones with random gain and padded silence, like raw TTS
+output), runs the post-processing stage and sprite packing, and compares:
+  - total bytes: raw mp3 vs processed files vs one sprite
+  - modeled player load time: one request per line vs one sprite request
+Requires ffmpeg and ffprobe on PATH.
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import Namespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tts_postprocess import run_postprocess, DEFAULT_FORMAT, DEFAULT_BITRATE, DEFAULT_LUFS
+
+
+def make_story(directory, lines, seed=1):
+    """Write lines 1.mp3..N.mp3 shaped like raw TTS output"""
+    rng = random.Random(seed)
+    files = []
+    for i in range(1, lines + 1):
+        duration = rng.uniform(1.5, 6.0)
+        gain_db = rng.uniform(-18, -3)
+        lead, tail = rng.uniform(0.2, 0.8), rng.uniform(0.3, 1.0)
+        path = os.path.join(directory, f"{i}.mp3")
+        subprocess.run(
+            ['ffmpeg', '-hide_banner', '-y', '-f', 'lavfi',
+             '-i', f"sine=frequency={rng.randint(180, 320)}:duration={duration:.2f}:sample_rate=22050",
+             '-af', f"volume={gain_db:.1f}dB,adelay={int(lead * 1000)},apad=pad_dur={tail:.2f}",
+             '-ac', '1', '-c:a', 'libmp3lame', '-b:a', '128k', path],
+            check=True, capture_output=True,
+        )
+        files.append(path)
+    return files
+
+
+def load_time(sizes, rtt, bandwidth):
+    """Modeled sequential fetch time: one round trip plus transfer per request"""
+    return sum(rtt + size / bandwidth for size in sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark narration post-processing on a synthetic story.")
+    parser.add_argument("--lines", type=int, default=40)
+    parser.add_argument("--format", default=DEFAULT_FORMAT)
+    parser.add_argument("--bitrate", default=DEFAULT_BITRATE)
+    parser.add_argument("--rtt", type=float, default=0.05, help="Modeled request round trip (s)")
+    parser.add_argument("--bandwidth", type=float, default=2_000_000, help="Modeled bandwidth (bytes/s)")
+    parser.add_argument("--pool", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = os.path.join(tmp, "raw")
+        out_dir = os.path.join(tmp, "out")
+        os.makedirs(raw_dir)
+        files = make_story(raw_dir, args.lines)
+        raw_sizes = [os.path.getsize(f) for f in files]
+
+        options = Namespace(format=args.format, bitrate=args.bitrate, lufs=DEFAULT_LUFS,
+                            no_trim=False, sprite="narration", pool=args.pool)
+        start = time.perf_counter()
+        results = run_postprocess(files, out_dir, options)
+        elapsed = time.perf_counter() - start
+
+        processed_sizes = [r["bytes_out"] for r in results if r["ok"]]
+        sprite = [f for f in os.listdir(out_dir) if f.startswith("narration.")]
+        sprite_sizes = [os.path.getsize(os.path.join(out_dir, f)) for f in sprite]
+
+        print()
+        print(f"{'variant':<22} {'requests':>8} {'bytes':>10} {'modeled load':>13}")
+        for name, sizes in (("raw mp3 per line", raw_sizes),
+                            (f"{args.format} per line", processed_sizes),
+                            (f"{args.format} sprite + index", sprite_sizes)):
+            print(f"{name:<22} {len(sizes):>8} {sum(sizes):>10} {load_time(sizes, args.rtt, args.bandwidth):>12.2f}s")
+        print(f"\nPost-processing wall time: {elapsed:.2f}s for {args.lines} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# python3 benchmarks/bench_tts_segment.py [--lines 20] [--base-latency 0.4] [--per-char 0.01]
+# -*- coding: utf-8 -*-
+"""
+End-to-end latency of long narration lines: single request vs segmented parallel path
+The synthesizer is the local backend (fixed request overhead + per-character time), so the
+numbers show the shape of the speedup rather than DashScope's absolute latency.
+With the defaults (median over 20 lines per length):
+  sentences  chars segments  single p50  split p50  speedup
+          2     32        1      0.720s     0.720s    1.00x
+          6    156        2      1.960s     1.371s    1.43x
+         12    312        3      3.520s     1.651s    2.13x
+         24    624        5      6.640s     2.982s    2.23x
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tts_backends import LocalBackend
+from tts_segment import split_text, synthesize_segments, DEFAULT_MAX_CHARS, DEFAULT_WORKERS
+
+SENTENCES = [
+    "你好，我叫王小娇，是来这里应聘的。",
+    "你知道我们这里招的是伪娘对吧？",
+    "嗯……人家，人家就是伪娘来着。",
+    "这是我本来的声音，现在你相信人家了吧？",
+    "再说了，咱俩从高中就是同学了，我其实早就知道你喜欢扮成女孩子。",
+    "It was late when the train finally pulled into the station.",
+]
+
+
+def make_line(n_sentences):
+    return "".join(SENTENCES[i % len(SENTENCES)] for i in range(n_sentences))
+
+
+def run(lines, synth, max_chars, workers):
+    timings = []
+    for line in lines:
+        start = time.perf_counter()
+        audio = synthesize_segments(split_text(line, max_chars), synth, workers)
+        timings.append(time.perf_counter() - start)
+        assert audio
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark segmented vs single-request TTS latency.")
+    parser.add_argument("--lines", type=int, default=20, help="Number of synthetic lines per length")
+    parser.add_argument("--base-latency", type=float, default=0.4, help="Simulated per-request overhead (s)")
+    parser.add_argument("--per-char", type=float, default=0.01, help="Simulated synthesis time per character (s)")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    backend = LocalBackend(latency=args.base_latency, per_char=args.per_char)
+    synth = lambda text: backend.synthesize(text, "local", "local")
+    print(f"{'sentences':>9} {'chars':>6} {'segments':>8} {'single p50':>11} {'split p50':>10} {'speedup':>8}")
+    for n_sentences in (2, 6, 12, 24):
+        line = make_line(n_sentences)
+        lines = [line] * args.lines
+        single = statistics.median(run(lines, synth, 0, 1))
+        split = statistics.median(run(lines, synth, args.max_chars, args.workers))
+        segments = len(split_text(line, args.max_chars))
+        print(f"{n_sentences:>9} {len(line):>6} {segments:>8} {single:>10.3f}s {split:>9.3f}s {single / split:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# python3 benchmarks/bench_video_rotate.py [--clips 3] [--seconds 10] [--size 1280x720]
+# -*- coding: utf-8 -*-
+"""
+Wall time and bytes written for [r90] handling on synthetic clips:
+  two-step  download copy + full mpeg4 re-encode, both files kept (previous behaviour)
+  auto      download copy + display-matrix remux (stream copy), intermediate removed
+  reencode  download copy + one libx264 veryfast encode, intermediate removed
+The "download" is a file copy, so times show the transform cost on top of it.
+Requires ffmpeg >= 6.1 on PATH.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import youtube_download
+from youtube_download import rotate_video
+
+LEGACY_COMMAND = ['-vf', 'transpose=1', '-c:v', 'mpeg4', '-q:v', '12', '-c:a', 'copy']
+
+
+def make_clip(path, seconds, size):
+    subprocess.run(
+        ['ffmpeg', '-y', '-f', 'lavfi', '-i', f"testsrc2=size={size}:rate=30:duration={seconds}",
+         '-f', 'lavfi', '-i', f"sine=duration={seconds}", '-c:v', 'libx264', '-preset', 'veryfast',
+         '-crf', '20', '-c:a', 'aac', '-shortest', path],
+        check=True, capture_output=True,
+    )
+
+
+def run_legacy(source, work_dir, idx):
+    downloaded = os.path.join(work_dir, f"video_{idx}.mp4")
+    final = os.path.join(work_dir, f"video_{idx}_final.mp4")
+    shutil.copyfile(source, downloaded)
+    subprocess.run(['ffmpeg', '-y', '-i', downloaded] + LEGACY_COMMAND + [final], check=True, capture_output=True)
+    return os.path.getsize(downloaded) + os.path.getsize(final)
+
+
+def run_new(source, work_dir, idx, mode):
+    downloaded = os.path.join(work_dir, f"video_{idx}.mp4")
+    final = os.path.join(work_dir, f"video_{idx}_final.mp4")
+    shutil.copyfile(source, downloaded)
+    written = os.path.getsize(downloaded)
+    assert rotate_video(idx, 90, downloaded, final, mode) == final
+    return written + os.path.getsize(final)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rotation strategies for downloaded videos.")
+    parser.add_argument("--clips", type=int, default=3)
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--size", default="1280x720")
+    args = parser.parse_args()
+
+    youtube_download.log = lambda message: None
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = []
+        for i in range(args.clips):
+            path = os.path.join(tmp, f"source_{i}.mp4")
+            make_clip(path, args.seconds, args.size)
+            sources.append(path)
+        source_bytes = sum(os.path.getsize(p) for p in sources)
+        print(f"{args.clips} clips, {args.seconds}s {args.size}, {source_bytes / 1e6:.1f} MB downloaded")
+        print(f"{'path':<10} {'wall':>8} {'written':>10} {'on disk':>10}")
+
+        for name in ('two-step', 'auto', 'reencode'):
+            work_dir = os.path.join(tmp, name)
+            os.makedirs(work_dir)
+            start = time.perf_counter()
+            written = 0
+            for idx, source in enumerate(sources, start=1):
+                if name == 'two-step':
+                    written += run_legacy(source, work_dir, idx)
+                else:
+                    written += run_new(source, work_dir, idx, name)
+            elapsed = time.perf_counter() - start
+            on_disk = sum(os.path.getsize(os.path.join(work_dir, f)) for f in os.listdir(work_dir))
+            print(f"{name:<10} {elapsed:>7.2f}s {written / 1e6:>8.1f}MB {on_disk / 1e6:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# python youtube_download.py urls.txt --downloader "python3 benchmarks/stub_downloader.py"
+# -*- coding: utf-8 -*-
+"""
+Stand-in for yt-dlp that simulates a transfer without touching the network
+Accepts the yt-dlp arguments youtube_download.py passes, ignores everything but
+--output, the output format and the URL, and writes the output file over a simulated transfer time,
+resuming an existing .part file like yt-dlp --continue.
+  STUB_MBPS    simulated bandwidth per download in MB/s (default 20)
+  STUB_LATENCY seconds before the transfer starts (extraction, connection setup; default 0)
+  STUB_SIZE_MB default file size in MB (default 5); a URL query ?size=N overrides it
+  STUB_SOURCE  optional real video copied as the output (so ffmpeg steps can run)
+  STUB_FAIL    URLs containing this substring exit with an error
+  STUB_EXT     write this extension whatever was requested (a format yt-dlp could not remux)
+"""
+import os
+import sys
+import time
+import shutil
+from urllib.parse import urlparse, parse_qs
+
+CHUNK = 256 * 1024
+
+
+def main(argv):
+    output = argv[argv.index('--output') + 1] if '--output' in argv else 'stub.%(ext)s'
+    url = argv[-1]
+    # Final extension as yt-dlp would pick it: --audio-format, then --remux-video/--merge-output-format
+    ext = 'mp4'
+    for option in ('--merge-output-format', '--remux-video', '--audio-format'):
+        if option in argv:
+            ext = argv[argv.index(option) + 1]
+    ext = os.environ.get('STUB_EXT') or ext
+    output = output.replace('%(ext)s', ext)
+
+    fail = os.getenv('STUB_FAIL')
+    if fail and fail in url:
+        print(f"ERROR: stub failure for {url}", file=sys.stderr)
+        return 1
+
+    bandwidth = float(os.getenv('STUB_MBPS', '20')) * 1e6
+    source = os.getenv('STUB_SOURCE')
+    query = parse_qs(urlparse(url).query)
+    size = int(float(query.get('size', [os.getenv('STUB_SIZE_MB', '5')])[0]) * 1e6)
+    if source:
+        size = os.path.getsize(source)
+
+    time.sleep(float(os.getenv('STUB_LATENCY', '0')))
+    start = time.perf_counter()
+    partial = output + '.part'
+    # Like yt-dlp --continue: pick up an existing partial file
+    written = os.path.getsize(partial) if os.path.exists(partial) else 0
+    if written:
+        print(f"[stub] resuming {partial} at {written} bytes")
+    resumed = written
+    with open(partial, 'ab') as f:
+        while written < size:
+            n = min(CHUNK, size - written)
+            f.write(b'\0' * n)
+            written += n
+            # Pace writes to the simulated bandwidth
+            delay = (written - resumed) / bandwidth - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+    if source:
+        shutil.copyfile(source, partial)
+    os.replace(partial, output)
+    print(f"[stub] {url} -> {output} ({size - resumed} of {size} bytes in {time.perf_counter() - start:.2f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# python stub_facefusion.py headless-run ... -s source.jpg -t target.jpg -o output.jpg
+# -*- coding: utf-8 -*-
+"""
+Stand-in for facefusion.py headless-run, for benchmarking the face-swap monitors
+Accepts the arguments the monitors pass, waits a simulated processing time and
+copies the target to the output, so the monitor's bookkeeping runs for real.
+  STUB_FACEFUSION_LATENCY  seconds per image (default 1.0)
+  STUB_FACEFUSION_PER_MB   extra seconds per MB of target, e.g. for videos (default 0)
+  STUB_FAIL                targets whose name contains this substring exit with an error
+"""
+import os
+import sys
+import time
+import shutil
+
+
+def main(argv):
+    target = argv[argv.index('-t') + 1]
+    output = argv[argv.index('-o') + 1]
+    fail = os.getenv('STUB_FAIL')
+    if fail and fail in os.path.basename(target):
+        print(f"ERROR: stub failure for {target}", file=sys.stderr)
+        return 1
+    megabytes = os.path.getsize(target) / 1e6
+    time.sleep(float(os.getenv('STUB_FACEFUSION_LATENCY', '1.0'))
+               + float(os.getenv('STUB_FACEFUSION_PER_MB', '0')) * megabytes)
+    shutil.copyfile(target, output + '.tmp')
+    os.replace(output + '.tmp', output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+# python3 benchmarks/suite.py [--cases facefusion youtube tts pages photos] [--scale 1] [--compare OLD.json]
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmark suite for the other-tools pipelines, without real services
+Every case generates synthetic inputs in a temp folder, runs the tool's own CLI
+against local stand-ins with configurable latency, and reads back the per-job
+timings the tool writes with --timings (see jobkit):
+  facefusion  监控换脸.py --once over screenshots (PNG and JPG), stub_facefusion.py
+  youtube     youtube_download.py over a URL list, stub_downloader.py (every
+              fourth line [r90] when ffmpeg is available)
+  tts         cosyvoice_tts_json.py over narration JSON, the local backend
+  pages       pageNhtml2json.py over pageN.html story folders
+  photos      organize_photos.py over sequenced photos (1-1-1.jpg, 1-1-2-a.jpg)
+Reports throughput, latency percentiles per stage (stages timed once per run,
+such as pages "extract", show their single time as n=1) and peak memory, stored
+as JSON, by default in benchmarks/results/<time>-<commit>.json. Memory is
+peak_rss_mb, the max RSS of the tool's own process (os.wait4), and on Linux
+also tree_rss_mb, the peak summed RSS of the tool and every process it starts
+(pool workers, stand-ins), sampled from /proc every 50 ms so short spikes can
+be missed; the table shows tree_rss_mb when there is one. --compare prints the change against
+an earlier result file. Cases whose requirements are missing (Pillow, ffmpeg)
+are skipped and say why.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TOOLS_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, TOOLS_DIR)
+sys.path.insert(0, BENCH_DIR)
+from jobkit.log import percentile
+from bench_pagedata_migrate import make_library
+from bench_tts_batch import make_narration
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+CASES = ("facefusion", "youtube", "tts", "pages", "photos")
+REGRESSION = 0.10  # flag throughput drops / p90 increases beyond 10% in --compare
+NOISE_SECONDS = 0.005  # ...and p90 increases smaller than this (timer noise on tiny stages)
+
+
+class Skip(Exception):
+    """A case cannot run here (missing optional dependency)"""
+
+
+def _require_pillow():
+    if importlib.util.find_spec("PIL") is None:
+        raise Skip("needs Pillow (pip install pillow)")
+
+
+def case_facefusion(tmp, options):
+    """The monitor finds its venv and facefusion.py next to itself, so it runs from a copy"""
+    _require_pillow()
+    script_dir = os.path.join(tmp, "monitor")
+    os.makedirs(os.path.join(script_dir, "venv", "bin"))
+    shutil.copy(os.path.join(TOOLS_DIR, "监控换脸.py"), script_dir)
+    shutil.copytree(os.path.join(TOOLS_DIR, "jobkit"), os.path.join(script_dir, "jobkit"))
+    shutil.copy(os.path.join(BENCH_DIR, "stub_facefusion.py"), os.path.join(script_dir, "facefusion.py"))
+    os.symlink(sys.executable, os.path.join(script_dir, "venv", "bin", "python"))
+    shots = os.path.join(tmp, "screenshots")
+    count = 8 * options.scale
+    # In a separate process: a child's peak RSS starts at the parent's RSS at fork
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--make-screenshots", script_dir, shots, str(count)],
+                   check=True)
+    env = {"STUB_FACEFUSION_LATENCY": str(options.latency)}
+    command = [sys.executable, os.path.join(script_dir, "监控换脸.py"), "--source-dir", shots,
+               "--once", "--settle", "0", "--jobs", str(options.jobs)]
+    return command, script_dir, env, count
+
+
+def make_screenshots(script_dir, shots, count):
+    """The monitor's source face (1.jpg) and count screenshots, alternating PNG and JPG"""
+    from PIL import Image, ImageDraw
+
+    Image.new("RGB", (256, 256), (200, 160, 140)).save(os.path.join(script_dir, "1.jpg"))
+    os.makedirs(shots)
+    rng = random.Random(1)
+    for i in range(count):
+        image = Image.new("RGB", (1280, 800), (240, 240, 240))
+        draw = ImageDraw.Draw(image)
+        for _ in range(20):
+            x, y = rng.randint(0, 1200), rng.randint(0, 740)
+            draw.rectangle([x, y, x + rng.randint(20, 300), y + rng.randint(10, 120)],
+                           fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        image.save(os.path.join(shots, f"Screenshot {i:04d}.{'png' if i % 2 else 'jpg'}"))
+
+
+def case_youtube(tmp, options):
+    count = 12 * options.scale
+    env = {"STUB_MBPS": "50", "STUB_LATENCY": str(options.latency)}
+    rotate = shutil.which("ffmpeg") is not None
+    if rotate:
+        source = os.path.join(tmp, "source.mp4")
+        subprocess.run(["ffmpeg", "-v", "quiet", "-y", "-f", "lavfi", "-i", "testsrc=size=640x360:rate=25",
+                        "-t", "4", "-c:v", "libx264", "-preset", "ultrafast", source], check=True)
+        env["STUB_SOURCE"] = source
+    with open(os.path.join(tmp, "urls.txt"), "w") as f:
+        for i in range(count):
+            directive = "[r90] " if rotate and i % 4 == 0 else ""
+            f.write(f"{directive}https://host{i % 3}.example/watch?v={i}&size=2\n")
+    command = [sys.executable, os.path.join(TOOLS_DIR, "youtube_download.py"), "urls.txt",
+               "--downloader", f"{sys.executable} {os.path.join(BENCH_DIR, 'stub_downloader.py')}",
+               "--workers", str(options.jobs), "--retries", "0"]
+    return command, tmp, env, count
+
+
+def case_tts(tmp, options):
+    count = 40 * options.scale
+    with open(os.path.join(tmp, "narration.json"), "w", encoding="utf-8") as f:
+        json.dump(make_narration(count), f, ensure_ascii=False)
+    env = {"TTS_VOICE_STATS_FILE": os.path.join(tmp, "voice_stats.json")}
+    command = [sys.executable, os.path.join(TOOLS_DIR, "cosyvoice_tts_json.py"), "narration.json",
+               "--backend", "local", "--local-latency", str(options.latency), "--local-per-char", "0.002",
+               "--jobs", str(options.jobs), "--retries", "0"]
+    return command, tmp, env, count
+
+
+def case_pages(tmp, options):
+    stories, pages = 20 * options.scale, 40
+    folders = make_library(tmp, stories, pages)
+    command = [sys.executable, os.path.join(TOOLS_DIR, "pageNhtml2json.py")] + folders
+    return command, tmp, {}, stories * pages
+
+
+def case_photos(tmp, options):
+    photos = os.path.join(tmp, "photos")
+    os.makedirs(photos)
+    rng = random.Random(1)
+    blob = os.urandom(200_000)
+    count = 0
+    for scene in range(1, 40 * options.scale + 1):
+        for shot in range(1, rng.randint(2, 12)):
+            if rng.random() < 0.2:
+                names = [f"{scene}-1-{shot}-{letter}.jpg" for letter in "abc"]
+            else:
+                names = [f"{scene}-1-{shot}.jpg"]
+            for name in names:
+                with open(os.path.join(photos, name), "wb") as f:
+                    f.write(blob)
+                count += 1
+    command = [sys.executable, os.path.join(TOOLS_DIR, "organize_photos.py"), photos, "--link", "copy"]
+    return command, tmp, {}, count
+
+
+CASE_BUILDERS = {
+    "facefusion": case_facefusion,
+    "youtube": case_youtube,
+    "tts": case_tts,
+    "pages": case_pages,
+    "photos": case_photos,
+}
+
+
+SAMPLE_SECONDS = 0.05
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def tree_rss(root_pid):
+    """Summed RSS in bytes of root_pid and all its descendants, from /proc (Linux)"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                # the command name may contain spaces; fields after it are fixed
+                ppid = int(f.read().rsplit(b")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue  # exited meanwhile
+        children.setdefault(ppid, []).append(int(entry))
+    total = 0
+    pids = [root_pid]
+    while pids:
+        pid = pids.pop()
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            continue
+        pids.extend(children.get(pid, ()))
+    return total
+
+
+def run_tool(command, cwd, env, log_path):
+    """
+    Run command to completion
+
+    Returns:
+        tuple: exit status, wall seconds, peak RSS of the tool's process in MB,
+            peak RSS of its whole process tree in MB (None where /proc is missing)
+    """
+    start = time.perf_counter()
+    sample = os.path.exists("/proc/self/statm")
+    tree_peak = [0]
+    finished = threading.Event()
+
+    def sampler(pid):
+        while not finished.wait(SAMPLE_SECONDS):
+            tree_peak[0] = max(tree_peak[0], tree_rss(pid))
+
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(command, cwd=cwd, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+        thread = threading.Thread(target=sampler, args=(process.pid,), daemon=True) if sample else None
+        if thread:
+            thread.start()
+        # wait4 gives the resource usage of exactly this child (not the processes it starts)
+        _, status, usage = os.wait4(process.pid, 0)
+        finished.set()
+        if thread:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = usage.ru_maxrss / (1e6 if sys.platform == "darwin" else 1e3)
+    return os.waitstatus_to_exitcode(status), elapsed, peak, tree_peak[0] / 1e6 if sample else None
+
+
+def stage_stats(records):
+    """
+    {stage: {"count", "failed", "p50", "p90", "p99", "max", "total"}} from --timings records
+
+    Percentiles of a stage recorded once per run are just that one time; they are
+    still filled in (so --compare works) and print_results() shows them as n=1.
+    """
+    by_stage = {}
+    for record in records:
+        by_stage.setdefault(record["stage"], []).append(record)
+    stats = {}
+    for stage, rows in by_stage.items():
+        seconds = sorted(row["seconds"] for row in rows)
+        stats[stage] = {
+            "count": len(rows),
+            "failed": sum(1 for row in rows if not row["ok"]),
+            "p50": percentile(seconds, 0.5),
+            "p90": percentile(seconds, 0.9),
+            "p99": percentile(seconds, 0.99),
+            "max": seconds[-1],
+            "total": round(sum(seconds), 6),
+        }
+    return stats
+
+
+def run_case(name, options):
+    runs = []
+    records = []
+    for repeat in range(options.repeats):
+        with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as tmp:
+            command, cwd, env, items = CASE_BUILDERS[name](tmp, options)
+            timings_path = os.path.join(tmp, "timings.jsonl")
+            status, elapsed, peak, tree_peak = run_tool(command + ["--timings", timings_path], cwd, env,
+                                                        os.path.join(tmp, "tool.log"))
+            if status != 0:
+                with open(os.path.join(tmp, "tool.log"), errors="replace") as f:
+                    tail = f.read()[-2000:]
+                raise RuntimeError(f"{name} exited with {status}:\n{tail}")
+            if os.path.exists(timings_path):
+                with open(timings_path, encoding="utf-8") as f:
+                    records.extend(json.loads(line) for line in f)
+            run = {"seconds": round(elapsed, 4), "peak_rss_mb": round(peak, 1)}
+            if tree_peak is not None:
+                run["tree_rss_mb"] = round(tree_peak, 1)
+            runs.append(run)
+    seconds = statistics.median(run["seconds"] for run in runs)
+    result = {
+        "items": items,
+        "seconds": seconds,
+        "throughput": round(items / seconds, 3),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "runs": runs,
+        "stages": stage_stats(records),
+    }
+    if all("tree_rss_mb" in run for run in runs):
+        result["tree_rss_mb"] = max(run["tree_rss_mb"] for run in runs)
+    return result
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=TOOLS_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "."], cwd=TOOLS_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def print_results(results):
+    print(f"{'case':<11} {'items':>6} {'seconds':>8} {'items/s':>9} {'peak MB':>8}   stage p50 / p90 / p99 s")
+    # peak MB: the whole process tree where it could be sampled, else the tool's own process
+    for name, result in results["cases"].items():
+        if "skipped" in result:
+            print(f"{name:<11} skipped: {result['skipped']}")
+            continue
+        stages = "; ".join(f"{stage} {row['max']:.3f} (n=1)" if row["count"] == 1 else
+                           f"{stage} {row['p50']:.3f}/{row['p90']:.3f}/{row['p99']:.3f}"
+                           for stage, row in result["stages"].items())
+        memory = result.get("tree_rss_mb", result["peak_rss_mb"])
+        print(f"{name:<11} {result['items']:>6} {result['seconds']:>8.2f} {result['throughput']:>9.1f} "
+              f"{memory:>8.1f}   {stages}")
+
+
+def compare(results, baseline):
+    """Print throughput and per-stage p90 changes against an earlier result file"""
+    print(f"\nAgainst {baseline.get('commit')} ({baseline.get('time')}):")
+    for name, result in results["cases"].items():
+        before = baseline.get("cases", {}).get(name)
+        if "skipped" in result or not before or "skipped" in before:
+            continue
+        change = result["throughput"] / before["throughput"] - 1
+        flag = "  ⚠️  slower" if change < -REGRESSION else ""
+        print(f"  {name:<11} throughput {before['throughput']:.1f} -> {result['throughput']:.1f} items/s "
+              f"({change:+.0%}){flag}")
+        for stage, row in result["stages"].items():
+            old = before["stages"].get(stage)
+            if old and old["p90"]:
+                stage_change = row["p90"] / old["p90"] - 1
+                slower = stage_change > REGRESSION and row["p90"] - old["p90"] > NOISE_SECONDS
+                stage_flag = "  ⚠️  slower" if slower else ""
+                label = "n=1" if row["count"] == 1 else "p90"
+                print(f"    {stage:<12} {label} {old['p90']:.3f} -> {row['p90']:.3f} s ({stage_change:+.0%}){stage_flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the other-tools pipelines with local stand-ins.")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--scale", type=int, default=1, help="Multiply every case's input size")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Stand-in latency per job in seconds (facefusion, downloads, TTS requests)")
+    parser.add_argument("--jobs", type=int, default=4, help="Concurrency passed to each tool")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per case (median time, pooled stage timings)")
+    parser.add_argument("--output", default=None, help="Result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", default=None, metavar="OLD.json", help="Earlier result file to compare against")
+    parser.add_argument("--make-screenshots", nargs=3, default=None, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.make_screenshots:
+        script_dir, shots, count = options.make_screenshots
+        make_screenshots(script_dir, shots, int(count))
+        return
+
+    commit, dirty = git_commit()
+    results = {
+        "commit": commit, "dirty": dirty, "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+        "options": {key: value for key, value in vars(options).items()
+                    if key not in ("output", "compare", "make_screenshots")},
+        "cases": {},
+    }
+    for name in options.cases:
+        print(f"▶ {name}...", flush=True)
+        try:
+            results["cases"][name] = run_case(name, options)
+        except Skip as e:
+            results["cases"][name] = {"skipped": str(e)}
+    print()
+    print_results(results)
+
+    output = options.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}{'-dirty' if dirty else ''}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nResults: {output}")
+
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
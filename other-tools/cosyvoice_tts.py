@@ -3,47 +3,53 @@
 # -*- coding: utf-8 -*-
 """
 CosyVoice TTS with Cloned Voice - Final Working Version
-Uses DashScope API for voice cloning and synthesis
+Uses DashScope API for voice cloning and synthesis (or the offline local backend)
 """
-import os
-import dashscope
-from dashscope.audio.tts_v2 import SpeechSynthesizer
-from dotenv import load_dotenv
 import argparse
+from tts_backends import get_backend, add_backend_arguments, backend_from_args
+from tts_segment import split_text, synthesize_segments, DEFAULT_MAX_CHARS, DEFAULT_WORKERS
+from voice_registry import get_voice, get_stats, timed_call
 
-load_dotenv()
+# Default voice from voices.json (cloned voices generated by dashscope_voice_clone.py)
+DEFAULT_VOICE_ID = "1"
 
-# Your cloned voice ID (generated from dashscope_voice_clone.py)
-CLONED_VOICE_ID = "cosyvoice-v2-fbaijie1-05551bc6c5044dd69e5c1a98b4990641"
-
-def synthesize_speech(text, output_file):
+def synthesize_speech(text, output_file, max_chars=DEFAULT_MAX_CHARS, workers=DEFAULT_WORKERS, voice_id=DEFAULT_VOICE_ID, backend=None):
     """
     Convert text to speech using your cloned voice
     
     Args:
         text (str): Text to convert to speech
         output_file (str): Output audio file name
+        max_chars (int): Split text longer than this into parallel requests (0 disables)
+        workers (int): Maximum concurrent requests for split text
+        voice_id (str): Voice ID from the voice registry
+        backend (TTSBackend): Backend to use (defaults to $TTS_BACKEND or dashscope)
     """
-    # Set API key
-    dashscope.api_key = os.getenv('BAILIAN_API_KEY')
+    backend = backend or get_backend()
+    error = backend.check()
+    
+    if error:
+        print(f"Error: {error}")
+        return False
     
-    if not dashscope.api_key:
-        print("Error: Please set BAILIAN_API_KEY in your .env file")
+    voice = get_voice(voice_id)
+    if not voice:
+        print(f"Error: Invalid voice ID {voice_id}")
         return False
+    cloned_voice = voice["voice"]
     
-    # Create synthesizer with your cloned voice
-    synthesizer = SpeechSynthesizer(
-        model="cosyvoice-v2",
-        voice=CLONED_VOICE_ID,
-        volume='75',
-    )
+    def synthesize_segment(segment):
+        return backend.synthesize(segment, cloned_voice, voice["model"])
     
     try:
+        segments = split_text(text, max_chars)
         print(f"Converting text to speech: {text}")
-        print(f"Using cloned voice: {CLONED_VOICE_ID}")
+        print(f"Using cloned voice: {cloned_voice}")
+        if len(segments) > 1:
+            print(f"Split into {len(segments)} segments, up to {workers} in parallel")
         
-        # Generate speech
-        audio = synthesizer.call(text)
+        # Generate speech (latency and size are recorded in the per-voice stats)
+        audio = timed_call(voice_id, text, lambda: synthesize_segments(segments, synthesize_segment, workers))
         
         if audio:
             # Save to file
@@ -58,15 +64,21 @@ def synthesize_speech(text, output_file):
     except Exception as e:
         print(f"❌ Error: {e}")
         return False
+    finally:
+        get_stats().save()
 
 if __name__ == "__main__":
     # Set up command line argument parsing
     parser = argparse.ArgumentParser(description="Convert text to speech using cloned voice.")
     parser.add_argument("input_text", type=str, help="Text to convert to speech")
     parser.add_argument("output_filename", type=str, help="Output audio file name")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS, help="Split text longer than this into sentence segments (0 disables)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Maximum concurrent requests for split text")
+    parser.add_argument("--voice", type=str, default=DEFAULT_VOICE_ID, help="Voice ID from voices.json")
+    add_backend_arguments(parser)
 
     # Parse arguments
     args = parser.parse_args()
     
     # Call synthesize_speech with provided arguments
-    synthesize_speech(args.input_text, args.output_filename)
+    synthesize_speech(args.input_text, args.output_filename, args.max_chars, args.workers, args.voice, backend_from_args(args))
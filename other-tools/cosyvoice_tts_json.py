@@ -3,66 +3,69 @@
 # -*- coding: utf-8 -*-
 """
 CosyVoice TTS with Cloned Voice - JSON batch processing
-Uses DashScope API for voice cloning and synthesis
+Uses DashScope API for voice cloning and synthesis (or the offline local backend)
 """
 import os
+import sys
 import json
-import dashscope
-from dashscope.audio.tts_v2 import SpeechSynthesizer
-from dotenv import load_dotenv
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import argparse
+from tts_backends import get_backend, add_backend_arguments, backend_from_args
+from tts_segment import split_text, synthesize_segments, DEFAULT_MAX_CHARS, DEFAULT_WORKERS
+from tts_postprocess import add_postprocess_arguments, run_postprocess, check_output_names
+from voice_registry import get_voice, get_stats, timed_call, print_report
+from jobkit import Journal, Timings, file_checksum, retry, add_runtime_arguments, timings_from_args
 
-load_dotenv()
+# Voice IDs ("1", "2", ...) map to cloned voices in voices.json (see voice_registry.py)
 
-# Dictionary to map voice IDs to their corresponding values
-CLONED_VOICE_IDS = {
-    "1": "cosyvoice-v2-fbaijie1-05551bc6c5044dd69e5c1a98b4990641",
-    "2": "cosyvoice-v2-mradio3-87de632cfd754f82af46a144ea7e10cc",
-    "3": "cosyvoice-v2-faggreen1-61fb75e64a9f4b688871a8e140f4b83d",
-    "4": "cosyvoice-v2-mkeda1-b9d3f6c48fa8498abb863d699b7ef915",
-    # Add more voice IDs as needed
-}
-
-def synthesize_speech(text, voice_id, output_file):
+def synthesize_speech(text, voice_id, output_file, max_chars=DEFAULT_MAX_CHARS, workers=DEFAULT_WORKERS, backend=None):
     """
     Convert text to speech using the specified cloned voice
 
     Args:
         text (str): Text to convert to speech
-        voice_id (str): Cloned voice ID to use
+        voice_id (str): Voice ID from the voice registry
         output_file (str): Output audio file name
+        max_chars (int): Split text longer than this into parallel requests (0 disables)
+        workers (int): Maximum concurrent requests for split text
+        backend (TTSBackend): Backend to use (defaults to $TTS_BACKEND or dashscope)
     """
-    # Set API key
-    dashscope.api_key = os.getenv('BAILIAN_API_KEY')
+    backend = backend or get_backend()
+    error = backend.check()
 
-    if not dashscope.api_key:
-        print("Error: Please set BAILIAN_API_KEY in your .env file")
+    if error:
+        print(f"Error: {error}")
         return False
 
-    # Get the cloned voice value from the dictionary
-    cloned_voice = CLONED_VOICE_IDS.get(voice_id)
-    if not cloned_voice:
+    # Look up the cloned voice in the registry
+    voice = get_voice(voice_id)
+    if not voice:
         print(f"Error: Invalid voice ID {voice_id}")
         return False
+    cloned_voice = voice["voice"]
 
-    # Create synthesizer with the specified cloned voice
-    synthesizer = SpeechSynthesizer(
-        model="cosyvoice-v2",
-        voice=cloned_voice,
-        volume='75',
-    )
+    def synthesize_segment(segment):
+        return backend.synthesize(segment, cloned_voice, voice["model"])
 
     try:
+        segments = split_text(text, max_chars)
         print(f"Converting text to speech: {text}")
         print(f"Using cloned voice: {cloned_voice}")
+        if len(segments) > 1:
+            print(f"Split into {len(segments)} segments, up to {workers} in parallel")
 
-        # Generate speech
-        audio = synthesizer.call(text)
+        # Generate speech (latency and size are recorded in the per-voice stats)
+        audio = timed_call(voice_id, text, lambda: synthesize_segments(segments, synthesize_segment, workers))
 
         if audio:
-            # Save to file
-            with open(output_file, "wb") as f:
+            # Save to file (via a temp file so an interrupted run never leaves a truncated mp3)
+            temp_file = output_file + ".part"
+            with open(temp_file, "wb") as f:
                 f.write(audio)
+            os.replace(temp_file, output_file)
             print(f"✅ Success! Audio saved to {output_file}")
             return True
         else:
@@ -74,24 +77,212 @@ def synthesize_speech(text, voice_id, output_file):
         return False
 
 
-if __name__ == "__main__":
-    # Set up command line argument parsing
+# --- Journal: one JSON line per attempt outcome, the last line for a key wins ---
+
+def text_hash(voice_id, text, max_chars, backend_name):
+    """Hash of everything that determines a key's audio"""
+    return hashlib.sha256(f"{backend_name}\0{voice_id}\0{max_chars}\0{text}".encode("utf-8")).hexdigest()
+
+
+def is_done(record, content_hash, output_file):
+    """A key is done if its last run succeeded for the same input and the output is unchanged"""
+    return (
+        record is not None
+        and record.get("status") == "ok"
+        and record.get("text_hash") == content_hash
+        and record.get("checksum") == file_checksum(output_file)
+    )
+
+
+def synthesize_with_retry(text, voice_id, output_file, args):
+    """Call synthesize_speech() up to 1 + args.retries times with exponential backoff"""
+    return retry(
+        lambda: synthesize_speech(text, voice_id, output_file, args.max_chars, args.workers, backend_from_args(args)),
+        args.retries, args.backoff, retry_on=(),
+        # An unknown voice will not start working on retry
+        give_up=lambda: get_voice(voice_id) is None,
+        on_retry=lambda attempt, delay, error: print(
+            f"🔁 Retrying in {delay:.1f}s (attempt {attempt + 1}/{args.retries + 1})"),
+    )
+
+
+def schedule_keys(data):
+    """
+    Order keys so the longest expected jobs start first: by estimated seconds from
+    the voice's recorded s/char (unmeasured voices count as slowest), then by length
+    """
+    stats = get_stats()
+
+    def expected(key):
+        voice_id, text = data[key]
+        estimate = stats.estimate(voice_id, len(text))
+        return (estimate is not None, -(estimate or 0), -len(text), int(key))
+
+    return sorted(data.keys(), key=expected)
+
+
+def run_batch(data, journal, args, timings=None):
+    """
+    Synthesize every key, skipping keys the journal marks as done
+
+    Up to args.jobs keys run at once, with at most max_concurrency (from the
+    registry, or args.per_voice) requests in flight per voice. Key N is written
+    to N.mp3 in args.output_dir (the current folder if None).
+
+    Returns:
+        dict: Counts (ok, skipped, failed), successful output files in key order,
+              and whether the run was interrupted
+    """
+    start_time = time.time()
+    summary = {"ok": 0, "skipped": 0, "failed": 0, "failed_keys": [], "files": [], "interrupted": False}
+    lock = threading.Lock()
+    voice_limits = {}
+    timings = timings or Timings()
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    pending = []
+    for key in schedule_keys(data):
+        voice_id, text = data[key]
+        output_filename = os.path.join(args.output_dir or "", f"{key}.mp3")
+        if is_done(journal.get(key), text_hash(voice_id, text, args.max_chars, args.backend), output_filename):
+            print(f"⏭️  Key {key} already done, skipping")
+            summary["skipped"] += 1
+            summary["files"].append(output_filename)
+        else:
+            pending.append(key)
+            voice = get_voice(voice_id)
+            voice_limits[voice_id] = args.per_voice or (voice["max_concurrency"] if voice else 1)
+
+    def process_key(key):
+        voice_id, text = data[key]
+        output_filename = os.path.join(args.output_dir or "", f"{key}.mp3")
+        key_start = time.time()
+        ok, attempts = synthesize_with_retry(text, voice_id, output_filename, args)
+        timings.record("synthesize", time.time() - key_start, bool(ok), key=key, voice=voice_id,
+                       chars=len(text), attempts=attempts)
+        record = {
+            "key": key,
+            "status": "ok" if ok else "failed",
+            "voice": voice_id,
+            "text_hash": text_hash(voice_id, text, args.max_chars, args.backend),
+            "output": output_filename,
+            "checksum": file_checksum(output_filename) if ok else None,
+            "bytes": os.path.getsize(output_filename) if ok else 0,
+            "attempts": attempts,
+            "seconds": round(time.time() - key_start, 3),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        journal.append(record)
+        with lock:
+            if ok:
+                summary["ok"] += 1
+                summary["files"].append(output_filename)
+            else:
+                summary["failed"] += 1
+                summary["failed_keys"].append(key)
+
+    jobs = max(1, args.jobs)
+    in_flight = {voice_id: 0 for voice_id in voice_limits}
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        futures = {}
+        while pending or futures:
+            # Start the first scheduled keys whose voice still has a free slot
+            for key in list(pending):
+                if len(futures) >= jobs:
+                    break
+                voice_id = data[key][0]
+                if in_flight[voice_id] < voice_limits[voice_id]:
+                    pending.remove(key)
+                    in_flight[voice_id] += 1
+                    futures[executor.submit(process_key, key)] = voice_id
+            # Short waits keep the main thread responsive to Ctrl-C
+            done, _ = wait(futures, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight[futures.pop(future)] -= 1
+                future.result()
+        executor.shutdown()
+    except KeyboardInterrupt:
+        summary["interrupted"] = True
+        executor.shutdown(wait=False, cancel_futures=True)
+        print("\n⚠️  Interrupted, progress is saved in the journal; rerun to resume")
+    finally:
+        get_stats().save()
+
+    summary["files"].sort(key=lambda name: int(os.path.basename(name).split(".")[0]))
+    summary["failed_keys"].sort(key=int)
+    print("-" * 50)
+    print(f"📊 Done: {summary['ok']} synthesized, {summary['skipped']} skipped, {summary['failed']} failed "
+          f"in {time.time() - start_time:.2f} seconds")
+    if summary["failed_keys"]:
+        print(f"❌ Failed keys: {', '.join(summary['failed_keys'])}")
+    return summary
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description="Convert JSON text entries to speech using cloned voices.")
     parser.add_argument("json_file", type=str, help="Path to JSON file containing numbered text entries with voice IDs")
+    parser.add_argument("--output-dir", type=str, default=None, help="Folder for the N.mp3 files (default: current folder)")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS, help="Split text longer than this into sentence segments (0 disables)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Maximum concurrent requests for split text")
+    parser.add_argument("--postprocess", type=str, default=None, metavar="OUT_DIR", help="Trim, normalize and re-encode the generated files into OUT_DIR")
+    add_backend_arguments(parser)
+    parser.add_argument("--per-voice", type=int, default=None, help="Concurrent keys per voice (default: max_concurrency from voices.json)")
+    parser.add_argument("--stats", action="store_true", help="Print per-voice throughput stats after the run")
+    parser.add_argument("--journal", type=str, default=None, help="Journal file (default: <json_file>.journal.jsonl)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the journal and synthesize every key again")
+    add_runtime_arguments(parser, jobs=4, retries=3, backoff=2.0)
+    add_postprocess_arguments(parser)
+    return parser
+
 
-    # Parse arguments
-    args = parser.parse_args()
+def run(args, timings=None):
+    """
+    The whole CLI run for parsed build_parser() options: read the JSON, resume
+    from the journal, synthesize, then post-process if asked
 
-    # Load JSON
+    Raises ValueError if the JSON file cannot be read or a --sprite name clashes with a key.
+    """
     try:
         with open(args.json_file, "r", encoding="utf-8") as f:
             data = json.load(f)
-    except Exception as e:
-        print(f"❌ Failed to read JSON file: {e}")
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Failed to read JSON file: {e}")
+    if args.postprocess:
+        # Checked before synthesizing: the lines are post-processed as <key>.mp3
+        error = check_output_names([f"{key}.mp3" for key in data], args.sprite)
+        if error:
+            raise ValueError(error)
+
+    journal_file = args.journal or args.json_file + ".journal.jsonl"
+    journal = Journal(journal_file, fsync=True, restart=args.restart)
+    if len(journal):
+        print(f"📒 Resuming from journal {journal_file} ({len(journal)} keys recorded)")
+
+    summary = run_batch(data, journal, args, timings)
+
+    # Optional post-processing stage over every successful line (including resumed ones)
+    if args.postprocess and summary["files"]:
+        run_postprocess(summary["files"], args.postprocess, args)
+    return summary
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    timings = timings_from_args(args)
+    try:
+        summary = run(args, timings)
+    except ValueError as e:
+        print(f"❌ {e}")
         exit(1)
+    if args.timings:
+        timings.report()
 
-    # Process entries in sorted order of keys
-    for key in sorted(data.keys(), key=lambda x: int(x)):
-        voice_id, text = data[key]
-        output_filename = f"{key}.mp3"
-        synthesize_speech(text, voice_id, output_filename)
+    if args.stats:
+        print_report()
+
+    if summary["interrupted"]:
+        sys.exit(130)
+    if summary["failed"]:
+        sys.exit(1)
@@ -0,0 +1,578 @@
+#!/usr/bin/env python
+# python3 job_server.py [--port 8765 | --socket /tmp/story-jobs.sock] [--workers 2]
+# -*- coding: utf-8 -*-
+"""
+Local HTTP job service for the story editor
+One long-running process runs the TTS, page-data, photo and face-swap tools as
+background jobs, so their modules, the voice registry and TTS clients stay loaded
+between requests and the Node server never waits on a fresh interpreter.
+
+A job takes the same arguments as the tool's command line; relative paths are
+resolved against the job's "cwd" (default: the server's folder):
+  POST   /jobs              {"operation": "tts", "args": ["1.json", "--jobs", "4"], "cwd": "/…/story1"}
+                            -> 202 {"id", "status": "queued", ...}
+  GET    /jobs              every job (newest last)
+  GET    /jobs/<id>         status (queued, running, done, failed, cancelled), progress, result
+  GET    /jobs/<id>/events  newline-delimited JSON events, streamed until the job ends
+                            (?since=N skips the first N)
+                            -> 409 while another job writes to the same folder
+  DELETE /jobs/<id>         cancel a queued job
+  GET    /operations        operation names and their usage
+  GET    /health
+Operations: tts (cosyvoice_tts_json.py), pages (pageNhtml2json.py), photos
+(organize_photos.py) and faceswap (facefusion headless-run over files).
+Progress events are the tools' --timings records; their console output goes to
+the server's console. Listens on 127.0.0.1 only, or on a Unix socket.
+
+Jobs run local tools on local files, so the service only takes requests meant
+for it: POST bodies must be Content-Type: application/json (a cross-site form or
+no-cors fetch cannot send that without a CORS preflight, which is never answered),
+the Host header must name this server and any Origin header must be this server
+(no browser page elsewhere, no DNS rebinding). The cwd and every path argument
+must lie inside stories/ or other-tools/ (more with --allow-dir), and the
+facefusion folder and interpreter come from the server's own options.
+
+Two jobs never write to the same folder at once: a job whose output folders
+(the story, photo or output folder; nested folders count) overlap those of a
+queued or running job is refused with 409. Tools start their process pools from
+job threads, so the server uses the forkserver start method where there is one:
+a plain fork could copy a lock (log output, timings) that another thread holds.
+"""
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+import socketserver
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import cosyvoice_tts_json
+import organize_photos
+import pageNhtml2json
+from pageNhtml2json import STORIES_DIR
+from photo_similarity import check_pillow
+from jobkit import Timings, run_jobs, add_runtime_arguments, log
+
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+KEEP_FINISHED = 200  # finished jobs kept for polling; older ones are forgotten
+FINISHED = ("done", "failed", "cancelled")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FACEFUSION_DIR = SCRIPT_DIR
+# Folders jobs may use as cwd and for path arguments (extend with --allow-dir)
+ALLOWED_ROOTS = (STORIES_DIR, SCRIPT_DIR)
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+FACEFUSION_EXTENSIONS = (".mp4", ".mov", ".webm", ".png", ".jpg", ".jpeg", ".webp")
+
+
+class JobTimings(Timings):
+    """Timings that also publish every record as a job progress event"""
+
+    def __init__(self, job, path=None):
+        super().__init__(path)
+        self.job = job
+
+    def record(self, stage, seconds, ok=True, **fields):
+        record = super().record(stage, seconds, ok, **fields)
+        self.job.progress(record)
+        return record
+
+
+class Job:
+    """One queued/running/finished operation; events are kept for streaming"""
+
+    def __init__(self, operation, args, cwd):
+        self.id = uuid.uuid4().hex[:12]
+        self.operation = operation
+        self.args = args
+        self.cwd = cwd
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.total = None
+        self.done = 0
+        self.result = None
+        self.error = None
+        self.future = None
+        self.folders = []
+        self.events = []
+        self._changed = threading.Condition()
+
+    def emit(self, kind, **fields):
+        with self._changed:
+            self.events.append({"seq": len(self.events), "type": kind, "time": time.time(), **fields})
+            self._changed.notify_all()
+
+    def progress(self, record):
+        with self._changed:
+            self.done += 1
+        self.emit("progress", done=self.done, total=self.total, record=record)
+
+    def set_status(self, status, **fields):
+        self.status = status
+        if status == "running":
+            self.started = time.time()
+        elif status in FINISHED:
+            self.finished = time.time()
+        self.emit("status", status=status, **fields)
+
+    def wait_events(self, since, timeout):
+        """Events from index since on, waiting up to timeout for new ones"""
+        with self._changed:
+            if since >= len(self.events) and self.status not in FINISHED:
+                self._changed.wait(timeout)
+            return self.events[since:]
+
+    def to_dict(self):
+        return {
+            "id": self.id, "operation": self.operation, "args": self.args, "cwd": self.cwd,
+            "status": self.status, "created": self.created, "started": self.started, "finished": self.finished,
+            "progress": {"done": self.done, "total": self.total},
+            "result": self.result, "error": self.error,
+        }
+
+
+# --- Operations: name -> (build_parser, path options resolved against cwd, run(args, job) -> JSON-able result) ---
+
+class UsageError(ValueError):
+    """Bad job arguments (reported as HTTP 400)"""
+
+
+class ForbiddenError(UsageError):
+    """A request or path the service does not serve (reported as HTTP 403)"""
+
+
+class ConflictError(UsageError):
+    """Another active job writes to the same folder (reported as HTTP 409)"""
+
+
+def _raise_usage(message):
+    raise UsageError(message)
+
+
+def _absolute(path, cwd):
+    return path if path is None or os.path.isabs(path) else os.path.normpath(os.path.join(cwd, path))
+
+
+def _check_inside(path, roots):
+    """Raise ForbiddenError unless path (symlinks resolved) lies in one of the roots"""
+    real = os.path.realpath(path)
+    if not any(os.path.commonpath([real, root]) == root for root in roots):
+        raise ForbiddenError(f"{path} is outside the folders jobs may use ({', '.join(roots)})")
+
+
+def _overlaps(folder, other):
+    """Whether two real paths are the same folder or one lies inside the other"""
+    return os.path.commonpath([folder, other]) in (folder, other)
+
+
+def job_folders(operation, args):
+    """Real paths of the folders a job writes to"""
+    if operation == "tts":
+        paths = [args.output_dir, args.postprocess, os.path.dirname(args.journal)]
+    elif operation == "pages":
+        paths = list(args.folders) + ([args.stories_dir] if args.all else [])
+    elif operation == "photos":
+        paths = [args.source_dir]
+    else:
+        paths = [args.output_dir]
+    return sorted({os.path.realpath(path) for path in paths if path})
+
+
+def run_tts(args, job):
+    try:
+        with open(args.json_file, "r", encoding="utf-8") as f:
+            job.total = len(json.load(f))
+    except (OSError, ValueError):
+        pass  # run() reports it
+    return cosyvoice_tts_json.run(args, job.timings)
+
+
+def run_pages(args, job):
+    folders = pageNhtml2json.story_folders(args)
+    if not folders:
+        raise UsageError("no story folders given")
+    return pageNhtml2json.run(folders, args, job.timings)
+
+
+def run_photos(args, job):
+    if args.max_per_folder < 1:
+        raise UsageError("--max-per-folder must be at least 1")
+    if args.similar or args.derivatives:
+        error = check_pillow()
+        if error:
+            raise RuntimeError(error)
+    return organize_photos.organize(args, job.timings)
+
+
+def build_faceswap_parser():
+    parser = argparse.ArgumentParser(prog="faceswap", description="Run facefusion headless-run on image/video files.")
+    parser.add_argument("files", nargs="+", help="Target images/videos")
+    parser.add_argument("--output-dir", required=True, help="Folder for the face-swapped files (same names)")
+    parser.add_argument("--source-face", default=None, help="Face to swap in (default: 1.jpg in the facefusion folder)")
+    parser.add_argument("--execution-provider", default="cuda", help="cuda, coreml or cpu (default: cuda)")
+    add_runtime_arguments(parser, jobs=1, retries=1, backoff=10.0)
+    return parser
+
+
+def facefusion_command(args, target, output):
+    return [
+        args.python or os.path.join(args.facefusion_dir, "venv", "bin", "python"),
+        os.path.join(args.facefusion_dir, "facefusion.py"),
+        "headless-run",
+        "--processors", "face_swapper", "face_enhancer",
+        "--temp-path", os.path.join(args.facefusion_dir, "temp"),
+        "--execution-providers", args.execution_provider,
+        "--face-selector-mode", "one",
+        "--face-selector-gender", "female",
+        "--face-selector-order", "best-worst",
+        "-s", args.source_face or os.path.join(args.facefusion_dir, "1.jpg"),
+        "-t", target,
+        "-o", output,
+    ]
+
+
+def run_faceswap(args, job):
+    unsupported = [path for path in args.files if os.path.splitext(path)[1].lower() not in FACEFUSION_EXTENSIONS]
+    if unsupported:
+        raise UsageError(f"unsupported file type: {', '.join(unsupported)}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    job.total = len(args.files)
+
+    def command(target):
+        output = os.path.join(args.output_dir, os.path.basename(target))
+        if os.path.exists(output) and os.path.getsize(output) > 0:
+            return None  # already swapped
+        return facefusion_command(args, target, output)
+
+    summary = run_jobs([(os.path.basename(path), path) for path in args.files], command, kind="subprocess",
+                       workers=args.jobs, retries=args.retries, backoff=args.backoff,
+                       timings=job.timings, stage="facefusion")
+    return {key: summary[key] for key in ("ok", "failed", "failed_keys", "seconds")}
+
+
+OPERATIONS = {
+    "tts": (cosyvoice_tts_json.build_parser, ("json_file", "output_dir", "journal", "postprocess"), run_tts),
+    "pages": (pageNhtml2json.build_parser, ("folders", "stories_dir"), run_pages),
+    "photos": (organize_photos.build_parser, ("source_dir",), run_photos),
+    "faceswap": (build_faceswap_parser, ("files", "output_dir", "source_face"), run_faceswap),
+}
+
+
+def operation_parser(operation):
+    parser = OPERATIONS[operation][0]()
+    parser.prog = operation
+    return parser
+
+
+def parse_job_args(operation, argv, cwd, roots=None):
+    """
+    Parse argv with the operation's own CLI parser and make its paths absolute
+
+    With roots, every path must lie inside one of them (ForbiddenError otherwise).
+    """
+    if operation not in OPERATIONS:
+        raise UsageError(f"unknown operation {operation!r} (use {', '.join(OPERATIONS)})")
+    if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+        raise UsageError('"args" must be a list of strings')
+    if "-h" in argv or "--help" in argv:
+        raise UsageError("see GET /operations for usage")
+    parser = operation_parser(operation)
+    parser.error = _raise_usage  # report instead of exiting the server
+    args = parser.parse_args(argv)
+    for name in OPERATIONS[operation][1] + ("timings",):
+        value = getattr(args, name)
+        if isinstance(value, list):
+            setattr(args, name, [_absolute(path, cwd) for path in value])
+        else:
+            setattr(args, name, _absolute(value, cwd))
+    if operation == "tts":
+        if args.output_dir is None:
+            args.output_dir = cwd  # the CLI writes N.mp3 to its working folder
+        if args.sprite and os.path.basename(args.sprite) != args.sprite:
+            raise UsageError("--sprite is a file name inside the --postprocess folder, not a path")
+        if args.journal is None:
+            args.journal = args.json_file + ".journal.jsonl"  # the CLI default, checked below
+    if roots:
+        for name in OPERATIONS[operation][1] + ("timings",):
+            value = getattr(args, name)
+            for path in value if isinstance(value, list) else [value]:
+                if path is not None:
+                    _check_inside(path, roots)
+    return args
+
+
+# --- Job registry ---
+
+class JobService:
+    def __init__(self, workers=DEFAULT_WORKERS, roots=ALLOWED_ROOTS, facefusion_dir=FACEFUSION_DIR,
+                 facefusion_python=None):
+        # Jobs may only read and write inside these folders
+        self.roots = [os.path.realpath(root) for root in roots]
+        self.facefusion_dir = os.path.abspath(facefusion_dir)
+        self.facefusion_python = facefusion_python
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, operation, argv, cwd=None):
+        cwd = os.path.abspath(cwd or SCRIPT_DIR)
+        if not os.path.isdir(cwd):
+            raise UsageError(f"cwd is not a folder: {cwd}")
+        _check_inside(cwd, self.roots)
+        args = parse_job_args(operation, argv, cwd, self.roots)
+        if operation == "faceswap":
+            # Which program runs is the server's choice, never the request's
+            args.facefusion_dir, args.python = self.facefusion_dir, self.facefusion_python
+        job = Job(operation, argv, cwd)
+        job.folders = job_folders(operation, args)
+        job.timings = JobTimings(job, args.timings)
+        # Publish the job only once it has its future, so a DELETE can always cancel it
+        with self.lock:
+            self._check_folders_free(job)
+            job.set_status("queued")
+            log(f"📥 Job {job.id}: {operation} {' '.join(argv)}")
+            job.future = self.executor.submit(self._run, job, args)
+            self.jobs[job.id] = job
+            self._forget_old()
+        return job
+
+    def _check_folders_free(self, job):
+        """Raise ConflictError if a queued or running job writes to one of job's folders (hold the lock)"""
+        for other in self.jobs.values():
+            if other.status in FINISHED:
+                continue
+            for folder in job.folders:
+                if any(_overlaps(folder, other_folder) for other_folder in other.folders):
+                    raise ConflictError(f"job {other.id} ({other.operation}, {other.status}) "
+                                        f"is already writing to {folder}; retry when it has finished")
+
+    def _run(self, job, args):
+        _, _, run = OPERATIONS[job.operation]
+        job.set_status("running")
+        try:
+            result = run(args, job)
+            # Round-trip through JSON so the stored result is exactly what clients get
+            job.result = json.loads(json.dumps(result, default=str))
+            status = "failed" if isinstance(result, dict) and result.get("failed") else "done"
+            job.set_status(status, result=job.result)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.set_status("failed", error=job.error)
+        log(f"{'✅' if job.status == 'done' else '❌'} Job {job.id} {job.status} "
+            f"in {job.finished - job.started:.1f}s" + (f": {job.error}" if job.error else ""))
+
+    def cancel(self, job):
+        """Cancel a job that has not started; returns whether it was cancelled"""
+        with self.lock:
+            cancelled = job.status == "queued" and job.future is not None and job.future.cancel()
+        if cancelled:
+            job.set_status("cancelled")
+            return True
+        return False
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def all(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def _forget_old(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self.jobs[job_id]
+
+
+# --- HTTP ---
+
+class JobHandler(BaseHTTPRequestHandler):
+    server_version = "StoryJobs/1.0"
+    service = None  # set by serve()
+
+    def address_string(self):
+        # Unix socket clients have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        pass  # jobs are logged by the service; keep polling quiet
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def local_hosts(self):
+        """Host header values naming this server (any for a Unix socket, which browsers cannot reach)"""
+        if not isinstance(self.server.server_address, tuple):
+            return None
+        port = self.server.server_address[1]
+        return {f"{host}:{port}" for host in LOOPBACK_HOSTS}
+
+    def check_request(self, body=False):
+        """Send 403/415 and return False for requests not from a local client of this service"""
+        hosts = self.local_hosts()
+        host = self.headers.get("Host", "")
+        origin = self.headers.get("Origin")
+        if hosts is not None and host not in hosts:
+            self.send_json(403, {"error": f"unexpected Host {host!r}"})
+            return False
+        if origin is not None and (hosts is None or urlsplit(origin).netloc not in hosts
+                                   or urlsplit(origin).scheme != "http"):
+            self.send_json(403, {"error": f"requests from {origin} are not accepted"})
+            return False
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if body and content_type != "application/json":
+            self.send_json(415, {"error": "the body must be sent as Content-Type: application/json"})
+            return False
+        return True
+
+    def route(self):
+        if not self.check_request(body=self.command == "POST"):
+            return None, None, None
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        job = None
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job = self.service.get(parts[1])
+            if job is None:
+                self.send_json(404, {"error": f"no job {parts[1]}"})
+                return None, None, None
+        return parts, parse_qs(url.query), job
+
+    def do_GET(self):
+        parts, query, job = self.route()
+        if parts is None:
+            return
+        if parts == ["health"]:
+            self.send_json(200, {"ok": True, "jobs": len(self.service.all()), "pid": os.getpid()})
+        elif parts == ["operations"]:
+            self.send_json(200, {name: operation_parser(name).format_usage().strip() for name in OPERATIONS})
+        elif parts == ["jobs"]:
+            self.send_json(200, [job.to_dict() for job in self.service.all()])
+        elif len(parts) == 2 and job:
+            self.send_json(200, job.to_dict())
+        elif len(parts) == 3 and parts[2] == "events" and job:
+            since = query.get("since", ["0"])[0]
+            if not since.isdigit():
+                self.send_json(400, {"error": f"since must be a non-negative event number, not {since!r}"})
+                return
+            self.stream_events(job, int(since))
+        else:
+            self.send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        parts, _, _ = self.route()
+        if parts != ["jobs"]:
+            if parts is not None:
+                self.send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not isinstance(request, dict):
+                raise UsageError('the body must be a JSON object {"operation", "args", "cwd"}')
+            job = self.service.submit(request.get("operation"), request.get("args", []), request.get("cwd"))
+        except ForbiddenError as e:
+            self.send_json(403, {"error": str(e)})
+            return
+        except ConflictError as e:
+            self.send_json(409, {"error": str(e)})
+            return
+        except ValueError as e:
+            # UsageError or bad JSON
+            self.send_json(400, {"error": str(e)})
+            return
+        self.send_json(202, job.to_dict())
+
+    def do_DELETE(self):
+        parts, _, job = self.route()
+        if parts is None:
+            return
+        if len(parts) != 2 or not job:
+            self.send_json(404, {"error": f"unknown path {self.path}"})
+        elif self.service.cancel(job):
+            self.send_json(200, job.to_dict())
+        else:
+            self.send_json(409, {"error": f"job {job.id} is {job.status}; only queued jobs can be cancelled"})
+
+    def stream_events(self, job, since):
+        """Send events as NDJSON while they happen; the response ends with the job"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()  # no Content-Length: HTTP/1.0, the body ends when the connection closes
+        try:
+            while True:
+                events = job.wait_events(since, timeout=15)
+                for event in events:
+                    self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+                since += len(events)
+                if events:
+                    self.wfile.flush()
+                if job.status in FINISHED and since >= len(job.events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped listening; the job carries on
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(service, port=DEFAULT_PORT, socket_path=None):
+    JobHandler.service = service
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # left over from a previous run
+        server = UnixHTTPServer(socket_path, JobHandler)
+        where = socket_path
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", port), JobHandler)
+        server.daemon_threads = True
+        where = f"http://127.0.0.1:{port}"
+    log(f"🚀 Job service on {where} ({', '.join(OPERATIONS)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log("\n⚠️  Stopping; queued jobs are dropped, running jobs finish first")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+        service.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the other-tools operations as jobs behind a local HTTP API.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port on 127.0.0.1 (default: {DEFAULT_PORT})")
+    parser.add_argument("--socket", default=None, metavar="PATH", help="Listen on a Unix socket instead of a port")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Jobs run at once (default: {DEFAULT_WORKERS}); each tool still uses its own --jobs")
+    parser.add_argument("--allow-dir", action="append", default=[], metavar="DIR",
+                        help="Also let jobs use this folder (besides stories/ and other-tools/); repeatable")
+    parser.add_argument("--facefusion-dir", default=FACEFUSION_DIR,
+                        help="Folder with facefusion.py and its venv/ for faceswap jobs (default: next to this script)")
+    parser.add_argument("--facefusion-python", default=None,
+                        help="Interpreter for facefusion (default: venv/bin/python in --facefusion-dir)")
+    args = parser.parse_args()
+    # Not fork: pools are started from job threads while other threads may hold locks
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("forkserver")
+    service = JobService(args.workers, ALLOWED_ROOTS + tuple(args.allow_dir), args.facefusion_dir,
+                         args.facefusion_python)
+    serve(service, args.port, args.socket)
+
+
+if __name__ == "__main__":
+    main()
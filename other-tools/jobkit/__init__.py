@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Shared job runtime for the other-tools scripts (standard library only)
+  journal.py  Journal: resumable JSONL record per job key, last line wins
+  queue.py    JobQueue: a Journal that is also a persistent FIFO queue
+              (queued -> running -> done/failed, resumed after a crash)
+  retry.py    retry() with exponential backoff and jitter
+  pool.py     run_jobs(): thread, process or subprocess pools with retries,
+              journal skipping and timings; run_command() for external tools
+  log.py      log() that does not interleave threads; Timings: JSONL timing
+              records with per-stage percentiles
+  cli.py      add_runtime_arguments(): --jobs --retries --backoff --timings
+Scripts import it from the other-tools folder: from jobkit import run_jobs, ...
+"""
+from .journal import Journal, file_checksum
+from .queue import JobQueue
+from .retry import retry, backoff_delay
+from .log import log, Timings
+from .pool import run_jobs, run_command
+from .cli import add_runtime_arguments, timings_from_args
+
+__all__ = [
+    "Journal", "JobQueue", "file_checksum", "retry", "backoff_delay", "log", "Timings",
+    "run_jobs", "run_command", "add_runtime_arguments", "timings_from_args",
+]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""The command-line options every job-running tool shares"""
+from .log import Timings
+
+
+def add_runtime_arguments(parser, jobs=4, retries=3, backoff=2.0):
+    """
+    Add --jobs, --retries, --backoff and --timings
+
+    jobs=None leaves out --jobs (for tools that already name their concurrency
+    option), retries=None leaves out --retries and --backoff (for tools whose
+    work cannot fail transiently).
+    """
+    if jobs is not None:
+        parser.add_argument("--jobs", type=int, default=jobs, help=f"Jobs run concurrently (default: {jobs})")
+    if retries is not None:
+        parser.add_argument("--retries", type=int, default=retries, help=f"Retries per failed job (default: {retries})")
+        parser.add_argument("--backoff", type=float, default=backoff,
+                            help=f"Initial retry delay in seconds, doubling each retry (default: {backoff})")
+    parser.add_argument("--timings", type=str, default=None, metavar="FILE",
+                        help="Append one JSON line per timed job/stage to FILE and print a per-stage summary")
+
+
+def timings_from_args(args):
+    """Timings writing to --timings (records are kept in memory either way)"""
+    return Timings(getattr(args, "timings", None))
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Resumable job records: one JSON line per outcome, the last line for a key wins"""
+import os
+import json
+import hashlib
+import threading
+
+
+def file_checksum(path):
+    """sha256 of a file, or None if it does not exist"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Journal:
+    """
+    Append-only JSONL file of job records, loaded as {key: latest record}
+
+    A torn last line from a crash is ignored. Once superseded records dominate
+    the file (more than twice the number of keys, plus 100) it is rewritten
+    with only the latest record per key, so loading stays linear in the number
+    of jobs. With fsync=True every append is flushed to disk before returning.
+    """
+
+    def __init__(self, path, fsync=False, restart=False):
+        self.path = path
+        self.fsync = fsync
+        self.records = {} if restart else self._load()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        records = {}
+        lines = 0
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["key"]] = record
+                lines += 1
+        if lines > 2 * len(records) + 100:
+            temp_file = self.path + ".tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                for record in records.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(temp_file, self.path)
+        return records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, key):
+        return key in self.records
+
+    def get(self, key):
+        return self.records.get(key)
+
+    def append(self, record):
+        """Record an outcome (record["key"] identifies the job); safe from worker threads"""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.records[record["key"]] = record
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Console logging from worker threads and structured timing records"""
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+print_lock = threading.Lock()
+
+
+def log(message):
+    """print() that does not interleave lines from worker threads"""
+    with print_lock:
+        print(message, flush=True)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class Timings:
+    """
+    Timing records of one run: {"stage", "seconds", "ok", ...extra fields}
+
+    With a path, every record is also appended to that JSONL file as it
+    happens (so a crashed run still leaves its measurements); summary() gives
+    count, total, p50, p95 and max seconds per stage.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, ok=True, **fields):
+        record = {"stage": stage, "seconds": round(seconds, 6), "ok": ok,
+                  "time": time.strftime("%Y-%m-%d %H:%M:%S"), **fields}
+        with self._lock:
+            self.records.append(record)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    @contextmanager
+    def timed(self, stage, **fields):
+        """with timings.timed("download", key=...): ... records the block's time (ok=False if it raised)"""
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(stage, time.perf_counter() - start, ok, **fields)
+
+    def summary(self):
+        """{stage: {"count", "failed", "total", "p50", "p95", "max"}}"""
+        by_stage = {}
+        with self._lock:
+            for record in self.records:
+                by_stage.setdefault(record["stage"], []).append(record)
+        summary = {}
+        for stage, records in by_stage.items():
+            seconds = sorted(record["seconds"] for record in records)
+            summary[stage] = {
+                "count": len(records),
+                "failed": sum(1 for record in records if not record["ok"]),
+                "total": round(sum(seconds), 3),
+                "p50": percentile(seconds, 0.5),
+                "p95": percentile(seconds, 0.95),
+                "max": seconds[-1],
+            }
+        return summary
+
+    def report(self):
+        """Print the per-stage summary (nothing if no timings were recorded)"""
+        summary = self.summary()
+        if not summary:
+            return
+        log(f"⏱️  {'stage':<16} {'count':>6} {'failed':>6} {'total s':>9} {'p50 s':>8} {'p95 s':>8} {'max s':>8}")
+        for stage, row in summary.items():
+            log(f"   {stage:<16} {row['count']:>6} {row['failed']:>6} {row['total']:>9.2f} "
+                f"{row['p50']:>8.3f} {row['p95']:>8.3f} {row['max']:>8.3f}")
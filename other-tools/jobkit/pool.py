@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Worker pools for keyed jobs, with retries, journal skipping and timings"""
+import os
+import re
+import time
+import tempfile
+import subprocess
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from .log import log
+from .retry import retry
+
+KINDS = ("thread", "process", "subprocess")
+
+
+def run_command(command, timeout=None, log_file=None, cwd=None):
+    """
+    Run an external tool, raising CalledProcessError/TimeoutExpired on failure
+
+    Output goes to the terminal, or to log_file (kept only if the command fails)
+    when several commands run at once.
+    """
+    if log_file is None:
+        subprocess.run(command, check=True, timeout=timeout, cwd=cwd)
+        return True
+    with open(log_file, "w") as f:
+        subprocess.run(command, check=True, timeout=timeout, cwd=cwd, stdout=f, stderr=subprocess.STDOUT)
+    os.remove(log_file)
+    return True
+
+
+def _log_file(log_dir, key):
+    """Per-job output file in log_dir, named after the key"""
+    return os.path.join(log_dir, re.sub(r"[^\w.-]+", "_", str(key)) + ".log")
+
+
+def _attempt(worker, kind, retries, backoff, log_dir, key, payload):
+    """Run one job with retries; picklable for process pools"""
+    start = time.perf_counter()
+    log_file = _log_file(log_dir, key) if kind == "subprocess" and log_dir else None
+    try:
+        if kind == "subprocess":
+            def call():
+                command = worker(payload)
+                return command is None or run_command(command, log_file=log_file)
+        else:
+            def call():
+                return worker(payload)
+        result, attempts = retry(call, retries, backoff, retry_on=(Exception,))
+        return bool(result), result, attempts, time.perf_counter() - start, None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}" + (f" (output in {log_file})" if log_file else "")
+        return False, None, retries + 1, time.perf_counter() - start, error
+
+
+def run_jobs(jobs, worker, kind="thread", workers=4, retries=0, backoff=1.0, journal=None,
+             is_done=None, timings=None, stage="job", describe=None, log_dir=None):
+    """
+    Run worker(payload) for every (key, payload) in jobs on a pool
+
+    kind "thread" and "process" call worker in a thread or process pool (a
+    process worker must be a module-level function); "subprocess" expects
+    worker(payload) to return a command list, run with run_command() from a
+    thread (None means nothing to run). When several subprocess jobs run at
+    once their output goes to <log_dir>/<key>.log (log_dir defaults to a new
+    temporary folder) instead of interleaving on the terminal; the log of a
+    failed job is kept and named in the failure message. A truthy result is
+    success; an exception or falsy result is retried up to retries times with
+    backoff.
+
+    Jobs the journal already records as done (status "ok", or is_done(key,
+    payload, record) if given) are skipped. Every outcome is appended to the
+    journal ({"key", "status", "attempts", "seconds", "time"} plus
+    describe(key, payload, result) if given) and to timings under stage.
+
+    Returns:
+        dict: ok, failed, skipped counts, results {key: result}, failed_keys,
+            interrupted (Ctrl-C) and seconds
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown pool kind {kind!r} (use {', '.join(KINDS)})")
+    start = time.perf_counter()
+    summary = {"ok": 0, "failed": 0, "skipped": 0, "results": {}, "failed_keys": [], "interrupted": False}
+
+    pending = []
+    for key, payload in jobs:
+        record = journal.get(key) if journal is not None else None
+        done = is_done(key, payload, record) if is_done else (record is not None and record.get("status") == "ok")
+        if done:
+            summary["skipped"] += 1
+        else:
+            pending.append((key, payload))
+
+    def finish(key, payload, outcome):
+        ok, result, attempts, seconds, error = outcome
+        if ok:
+            summary["ok"] += 1
+            summary["results"][key] = result
+        else:
+            summary["failed"] += 1
+            summary["failed_keys"].append(key)
+            log(f"❌ {stage} {key} failed after {attempts} attempt(s)" + (f": {error}" if error else ""))
+        if journal is not None:
+            record = {"key": key, "status": "ok" if ok else "failed", "attempts": attempts,
+                      "seconds": round(seconds, 3), "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+            if describe:
+                record.update(describe(key, payload, result))
+            journal.append(record)
+        if timings is not None:
+            timings.record(stage, seconds, ok, key=key, attempts=attempts)
+
+    quiet = kind == "subprocess" and (workers or 1) > 1 and len(pending) > 1
+    if quiet:
+        if log_dir is None:
+            log_dir = tempfile.mkdtemp(prefix=f"{stage}-logs-")
+        else:
+            os.makedirs(log_dir, exist_ok=True)
+    attempt = partial(_attempt, worker, kind, retries, backoff, log_dir if quiet else None)
+    if kind == "process" and (workers == 1 or len(pending) <= 1):
+        executor = None  # not worth starting processes
+    elif kind == "process":
+        executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max(1, workers or 1))
+    try:
+        if executor is None:
+            for key, payload in pending:
+                finish(key, payload, attempt(key, payload))
+        else:
+            futures = {executor.submit(attempt, key, payload): (key, payload) for key, payload in pending}
+            while futures:
+                # Short waits keep the main thread responsive to Ctrl-C
+                done, _ = wait(futures, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, payload = futures.pop(future)
+                    finish(key, payload, future.result())
+            executor.shutdown()
+    except KeyboardInterrupt:
+        summary["interrupted"] = True
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        log("\n⚠️  Interrupted" + (", progress is saved in the journal; rerun to resume" if journal is not None else ""))
+    if quiet and not os.listdir(log_dir):
+        os.rmdir(log_dir)  # every job succeeded: nothing to look at
+    summary["seconds"] = time.perf_counter() - start
+    return summary
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Persistent job queue: jobs move queued -> running -> done/failed in a Journal file"""
+import time
+import threading
+from collections import OrderedDict, deque
+
+from .journal import Journal
+
+PENDING = ("queued", "running")
+
+
+class JobQueue(Journal):
+    """
+    Journal whose records also carry a queue state
+
+    put() queues a job (with any JSON fields it needs to run), take() hands out the
+    next queued job and marks it running, done()/fail() record the outcome. Every
+    transition is a journal line, so a crashed or interrupted run leaves its queue
+    on disk: on load, queued and running jobs (the latter were cut off mid-run) are
+    queued again, in their original order. Jobs are kept in FIFO order per group
+    (e.g. per host), so take() can skip groups that are at a concurrency limit
+    without rescanning every job.
+    """
+
+    def __init__(self, path, fsync=False, restart=False):
+        super().__init__(path, fsync, restart)
+        self._groups = OrderedDict()
+        self._queue_lock = threading.Lock()
+        for key, record in self.records.items():
+            if record.get("status") in PENDING:
+                self._groups.setdefault(record.get("group"), deque()).append(key)
+
+    def _transition(self, key, status, fields):
+        record = dict(self.records.get(key) or {"key": key}, **fields)
+        record.update(status=status, updated=time.strftime("%Y-%m-%d %H:%M:%S"))
+        self.append(record)
+        return record
+
+    def put(self, key, group=None, **fields):
+        """Queue a job unless it is already queued or running; returns whether it was added"""
+        with self._queue_lock:
+            if self.status(key) in PENDING:
+                return False
+            self._transition(key, "queued", dict(fields, group=group))
+            self._groups.setdefault(group, deque()).append(key)
+            return True
+
+    def take(self, can_start=None):
+        """
+        Next queued job, marked running (None if nothing can start)
+
+        can_start(group) -> bool skips groups that may not start another job now.
+        """
+        with self._queue_lock:
+            for group, keys in list(self._groups.items()):
+                if not keys:
+                    del self._groups[group]
+                    continue
+                if can_start is not None and not can_start(group):
+                    continue
+                key = keys.popleft()
+                if not keys:
+                    del self._groups[group]
+                return self._transition(key, "running", {})
+            return None
+
+    def discard(self, key):
+        """Drop a queued job (e.g. no longer wanted); returns whether it was pending"""
+        with self._queue_lock:
+            if self.status(key) not in PENDING:
+                return False
+            group = self.records[key].get("group")
+            if key in self._groups.get(group, ()):
+                self._groups[group].remove(key)
+            self._transition(key, "cancelled", {})
+            return True
+
+    def done(self, key, **fields):
+        return self._transition(key, "done", fields)
+
+    def fail(self, key, **fields):
+        return self._transition(key, "failed", fields)
+
+    def status(self, key):
+        record = self.records.get(key)
+        return record.get("status") if record else None
+
+    def queued(self):
+        """Number of jobs waiting to be taken"""
+        with self._queue_lock:
+            return sum(len(keys) for keys in self._groups.values())
+
+    def pending_keys(self):
+        """Keys of queued and running jobs, in queue order"""
+        return [key for key, record in self.records.items() if record.get("status") in PENDING]
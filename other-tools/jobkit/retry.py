@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Retries with exponential backoff"""
+import time
+import random
+
+
+def backoff_delay(attempt, backoff):
+    """Seconds to wait after failed attempt number attempt (1-based): backoff doubling, +-20% jitter"""
+    return backoff * (2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+
+
+def retry(fn, retries=3, backoff=2.0, retry_on=(Exception,), give_up=None, on_retry=None):
+    """
+    Call fn() up to 1 + retries times until it returns a truthy result
+
+    An exception in retry_on or a falsy result counts as a failure. give_up()
+    returning True stops early (e.g. a failure that cannot go away on retry).
+    on_retry(attempt, delay, error) is called before each wait.
+
+    Returns:
+        tuple: (last result, attempts); the last exception is re-raised if the
+            final attempt raised
+    """
+    attempts = 0
+    while True:
+        attempts += 1
+        error = None
+        try:
+            result = fn()
+        except retry_on as e:
+            error, result = e, None
+        if result:
+            return result, attempts
+        if attempts > retries or (give_up and give_up()):
+            if error is not None:
+                raise error
+            return result, attempts
+        delay = backoff_delay(attempts, backoff)
+        if on_retry:
+            on_retry(attempts, delay, error)
+        time.sleep(delay)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# python3 media_index.py ../stories/story1 [--all [--stories-dir DIR]] [--media-type] [--check]
+# -*- coding: utf-8 -*-
+"""
+Probe index of story media
+Probes every file under <story>/media/ once, in a process pool, and keeps the
+results in <story>/json/media-index.json, keyed by the path pages use:
+  "media/5.mp4": {"size", "mtime_ns", "sha256", "kind": "video", "width", "height",
+                  "duration", "codec", "valid", "error"}
+Entries whose mtime and size still match are reused, so a rerun only opens new or
+changed files (mtime_ns is written as a string, because nanosecond times exceed the
+integers a JavaScript JSON.parse keeps exact; load_index() hands back ints); other steps read the index (media_info(), or the JSON directly)
+instead of re-probing. Images are read with Pillow, audio and video with ffprobe;
+without them those fields stay None and "valid" is None (not checked).
+--media-type regenerates json/media-type.json from the media found: N.mp4 ->
+"video", media/N/ -> "slides", N.jpg -> ["image"] (plus "no-audio" without N.mp3).
+Teleport entries and pages without media keep their hand-written entries.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from media_prep import probe
+from pageNhtml2json import STORIES_DIR, story_folders
+from jobkit import Timings, file_checksum, add_runtime_arguments, timings_from_args
+
+MEDIA_DIR = "media"
+JSON_DIR = "json"
+INDEX_FILE = "media-index.json"
+MEDIA_TYPE_FILE = "media-type.json"
+INDEX_VERSION = 2  # 2: mtime_ns stored as a string
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".webm", ".m4v")
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".wav", ".ogg", ".aac")
+
+
+def media_kind(name):
+    extension = os.path.splitext(name)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return "image"
+    if extension in VIDEO_EXTENSIONS:
+        return "video"
+    if extension in AUDIO_EXTENSIONS:
+        return "audio"
+    return "other"
+
+
+def media_files(folder_path):
+    """Paths under media/ relative to the story folder (as URLs use them), skipping dotfiles"""
+    media_dir = Path(folder_path) / MEDIA_DIR
+    if not media_dir.is_dir():
+        return []
+    return sorted(path.relative_to(folder_path).as_posix() for path in media_dir.rglob("*")
+                  if path.is_file() and not path.name.startswith("."))
+
+
+def _probe_image(path, entry):
+    try:
+        from PIL import Image
+    except ImportError:
+        return _probe_av(path, entry)  # ffprobe reads images too
+    try:
+        with Image.open(path) as image:
+            entry["width"], entry["height"] = image.size
+            entry["codec"] = (image.format or "").lower() or None
+            image.verify()
+        entry["valid"] = True
+    except Exception as e:
+        entry["valid"], entry["error"] = False, f"{type(e).__name__}: {e}"
+
+
+def _probe_av(path, entry):
+    try:
+        info = probe(path)
+    except FileNotFoundError:
+        entry["error"] = "ffprobe not found"
+        return
+    except Exception:
+        entry["valid"], entry["error"] = False, "ffprobe could not read the file"
+        return
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    main = video if entry["kind"] != "audio" and video else audio or video
+    if video:
+        entry["width"], entry["height"] = video.get("width"), video.get("height")
+    entry["codec"] = main.get("codec_name") if main else None
+    duration = (info.get("format") or {}).get("duration")
+    entry["duration"] = round(float(duration), 3) if duration not in (None, "", "N/A") else None
+    entry["valid"] = main is not None
+    if main is None:
+        entry["error"] = "no audio or video stream"
+
+
+def probe_file(path):
+    """Index entry for one file (module-level, for the process pool)"""
+    start = time.perf_counter()
+    stat = os.stat(path)
+    entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_checksum(path),
+             "kind": media_kind(path), "width": None, "height": None, "duration": None,
+             "codec": None, "valid": None, "error": None}
+    if entry["kind"] == "image":
+        _probe_image(path, entry)
+    elif entry["kind"] in ("video", "audio"):
+        _probe_av(path, entry)
+    return entry, time.perf_counter() - start
+
+
+def _is_fresh(entry, path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+
+def load_index(folder_path):
+    """{"version", "files": {relative path: entry}} ({} files if there is no index yet)"""
+    try:
+        with open(Path(folder_path) / JSON_DIR / INDEX_FILE, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    if index.get("version") != INDEX_VERSION:
+        return {"version": INDEX_VERSION, "files": {}}
+    for entry in index["files"].values():
+        entry["mtime_ns"] = int(entry["mtime_ns"])
+    return index
+
+
+def save_index(folder_path, index):
+    json_dir = Path(folder_path) / JSON_DIR
+    json_dir.mkdir(exist_ok=True)
+    path = json_dir / INDEX_FILE
+    files = {name: dict(entry, mtime_ns=str(entry["mtime_ns"])) for name, entry in index["files"].items()}
+    with open(str(path) + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(dict(index, files=files), f, ensure_ascii=False, indent=1)
+    os.replace(str(path) + ".tmp", path)
+
+
+def media_info(folder_path, name, index=None):
+    """Index entry for media path name (e.g. "media/5.mp4"), probing it now if the index is stale"""
+    index = index or load_index(folder_path)
+    path = os.path.join(folder_path, name)
+    entry = index["files"].get(name)
+    if _is_fresh(entry, path):
+        return entry
+    return probe_file(path)[0]
+
+
+def index_story(folder_path, workers=None, full=False, timings=None):
+    """
+    Bring <story>/json/media-index.json up to date
+
+    Returns:
+        (index, number of files probed)
+    """
+    timings = timings or Timings()
+    previous = {} if full else load_index(folder_path)["files"]
+    files = {}
+    stale = []
+    for name in media_files(folder_path):
+        if _is_fresh(previous.get(name), os.path.join(folder_path, name)):
+            files[name] = previous[name]
+        else:
+            stale.append(name)
+
+    paths = [os.path.join(folder_path, name) for name in stale]
+    if len(paths) <= 1:
+        # Not worth starting a pool
+        results = [probe_file(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            results = list(executor.map(probe_file, paths))
+    for name, (entry, seconds) in zip(stale, results):
+        files[name] = entry
+        timings.record("probe", seconds, entry["valid"] is not False, file=name, kind=entry["kind"])
+
+    index = {"version": INDEX_VERSION, "files": dict(sorted(files.items()))}
+    save_index(folder_path, index)
+    return index, len(stale)
+
+
+def _page_number(text):
+    return int(text) if text.isdigit() else None
+
+
+def _page_order(key):
+    """Numeric page keys in order, anything else after them"""
+    number = _page_number(key)
+    return (number is None, number or 0, key)
+
+
+def media_types(index, previous=None):
+    """
+    media-type.json entries from the index: {page: "video" | "slides" | ["image"(, "no-audio")]}
+
+    Detected pages override previous entries, except teleport entries (which have
+    no media); previous entries for pages without media are kept.
+    """
+    videos, slides, images, audio = set(), set(), set(), set()
+    for name, entry in index["files"].items():
+        if entry["valid"] is False:
+            continue
+        parts = name.split("/")
+        if len(parts) == 2:
+            stem = _page_number(os.path.splitext(parts[1])[0])
+            if stem is None:
+                continue
+            kind = entry["kind"]
+            if kind == "video":
+                videos.add(stem)
+            elif kind == "image":
+                images.add(stem)
+            elif kind == "audio":
+                audio.add(stem)
+        elif len(parts) == 3 and entry["kind"] == "image":
+            folder = _page_number(parts[1])
+            if folder is not None:
+                slides.add(folder)
+
+    types = dict(previous or {})
+    for page in sorted(videos | slides | images):
+        key = str(page)
+        current = types.get(key)
+        if isinstance(current, list) and current and current[0] == "teleport":
+            continue
+        if page in videos:
+            types[key] = "video"
+        elif page in slides:
+            types[key] = "slides"
+        else:
+            types[key] = ["image"] if page in audio else ["image", "no-audio"]
+    return dict(sorted(types.items(), key=lambda item: _page_order(item[0])))
+
+
+def write_media_types(folder_path, types):
+    """Write json/media-type.json in its hand-written layout (one page per line); returns whether it changed"""
+    path = Path(folder_path) / JSON_DIR / MEDIA_TYPE_FILE
+    lines = [f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False, separators=(',', ':'))}"
+             for key, value in types.items()]
+    text = "{\n" + ",\n".join(lines) + "\n}"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if json.load(f) == types:
+                return False
+    except (OSError, ValueError):
+        pass
+    with open(str(path) + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(str(path) + ".tmp", path)
+    return True
+
+
+def _load_media_types(folder_path):
+    try:
+        with open(Path(folder_path) / JSON_DIR / MEDIA_TYPE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Probe story media once into json/media-index.json (and regenerate json/media-type.json).",
+        epilog="Example: python media_index.py ../stories/story1 --media-type")
+    parser.add_argument("folders", nargs="*", help="Story folders")
+    parser.add_argument("--all", action="store_true", help="Also index every story folder under --stories-dir")
+    parser.add_argument("--stories-dir", default=STORIES_DIR, help="Folder searched by --all (default: the repo's stories/)")
+    parser.add_argument("--full", action="store_true", help="Probe every file again instead of only new or changed ones")
+    parser.add_argument("--media-type", action="store_true", help="Regenerate json/media-type.json from the index")
+    parser.add_argument("--check", action="store_true", help="List unreadable media and exit with an error if there are any")
+    parser.add_argument("--workers", type=int, default=None, help="Probe processes (default: CPU count)")
+    add_runtime_arguments(parser, jobs=None, retries=None)
+    args = parser.parse_args()
+
+    folders = story_folders(args)
+    if not folders:
+        parser.print_usage()
+        sys.exit(1)
+
+    timings = timings_from_args(args)
+    start_time = time.time()
+    invalid = []
+    for folder in folders:
+        if not (Path(folder) / MEDIA_DIR).is_dir():
+            print(f"❌ No media folder in {folder}")
+            continue
+        index, probed = index_story(folder, args.workers, args.full, timings)
+        files = index["files"]
+        bad = [name for name, entry in files.items() if entry["valid"] is False]
+        invalid.extend((folder, name, files[name]["error"]) for name in bad)
+        print(f"✅ {folder}: {len(files)} media files ({probed} probed, {len(files) - probed} unchanged)"
+              + (f", {len(bad)} unreadable" if bad else ""))
+        if args.media_type:
+            types = media_types(index, _load_media_types(folder))
+            changed = write_media_types(folder, types)
+            print(f"  {'📝 Updated' if changed else '✅ Up to date:'} {Path(folder) / JSON_DIR / MEDIA_TYPE_FILE}")
+    print(f"📊 Indexed {len(folders)} stories in {time.time() - start_time:.2f} seconds")
+
+    if args.timings:
+        timings.report()
+    if args.check and invalid:
+        for folder, name, error in invalid:
+            print(f"❌ {folder}/{name}: {error}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# python3 media_prep.py ../stories/story1 downloads/video_*.mp4 [--max-height 1080] [--preview-height 360]
+# -*- coding: utf-8 -*-
+"""
+Prepare downloaded videos for use as bgUrl/fgUrl in story pages
+For every video writes into <story>/media/:
+  <name>.mp4             web encode with the moov atom at the front (faststart), so
+                         playback starts before the whole file is loaded; H.264/AAC
+                         sources within --max-height are only remuxed, not re-encoded
+  <name>_preview.mp4     small low-bitrate variant (no audio) to show while the
+                         full video loads
+  <name>_poster.jpg      poster frame (<video poster="...">)
+  <name>_thumb_<w>.jpg   thumbnails for the builder
+Outputs newer than their source are skipped, so rerunning only does new work.
+Jobs run in a process pool. Requires ffmpeg and ffprobe on PATH.
+"""
+import os
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_MAX_HEIGHT = 1080
+DEFAULT_PREVIEW_HEIGHT = 360
+DEFAULT_THUMB_WIDTHS = (320, 160)
+POSTER_AT = 1.0  # seconds into the video (earlier for shorter clips)
+
+# Codecs every browser plays from an .mp4 without re-encoding
+WEB_VIDEO_CODECS = ("h264",)
+WEB_AUDIO_CODECS = ("aac", "mp3")
+
+
+def probe(path):
+    """ffprobe streams and format of a media file as a dict"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams', '-show_format', path],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(result.stdout)
+
+
+def _video_stream(info):
+    return next((s for s in info["streams"] if s["codec_type"] == "video"), None)
+
+
+def _audio_stream(info):
+    return next((s for s in info["streams"] if s["codec_type"] == "audio"), None)
+
+
+def display_height(stream):
+    """Height as shown on screen (rotated streams swap width and height)"""
+    rotation = 0
+    for side_data in stream.get("side_data_list", []):
+        rotation = int(side_data.get("rotation", rotation))
+    return stream["width"] if rotation % 180 else stream["height"]
+
+
+def _scale(height):
+    """Downscale to at most height pixels, never upscale, keep even dimensions"""
+    return f"scale=-2:'min(ih,{height})'"
+
+
+def is_up_to_date(src, dst):
+    return os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src)
+
+
+def web_command(src, dst, info, max_height=DEFAULT_MAX_HEIGHT):
+    """ffmpeg command for the faststart web encode (stream copy when the source already fits)"""
+    video, audio = _video_stream(info), _audio_stream(info)
+    if (video["codec_name"] in WEB_VIDEO_CODECS and display_height(video) <= max_height
+            and (audio is None or audio["codec_name"] in WEB_AUDIO_CODECS)):
+        codecs = ['-c', 'copy']
+    else:
+        codecs = ['-vf', _scale(max_height), '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
+                  '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-b:a', '128k']
+    return ['ffmpeg', '-hide_banner', '-y', '-i', src, '-map', '0:v:0', '-map', '0:a:0?'] + codecs + [
+        '-movflags', '+faststart', dst]
+
+
+def preview_command(src, dst, preview_height=DEFAULT_PREVIEW_HEIGHT):
+    """ffmpeg command for the low-resolution preview"""
+    return ['ffmpeg', '-hide_banner', '-y', '-i', src, '-map', '0:v:0', '-vf', _scale(preview_height),
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '30', '-pix_fmt', 'yuv420p', '-an',
+            '-movflags', '+faststart', dst]
+
+
+def stills_command(src, poster, thumbs, info, max_height=DEFAULT_MAX_HEIGHT):
+    """
+    One ffmpeg command that decodes a single frame and writes the poster and all thumbnails
+
+    Args:
+        thumbs (list[tuple[int, str]]): (width, output file) pairs
+    """
+    duration = float(info["format"].get("duration") or 0)
+    at = min(POSTER_AT, duration / 2) if duration else 0
+    outputs = ["[poster]"] + [f"[thumb{i}]" for i in range(len(thumbs))]
+    graph = f"[0:v]split={len(outputs)}" + "".join(outputs) + ";"
+    graph += f"[poster]{_scale(max_height)}[poster_out]"
+    for i, (width, _) in enumerate(thumbs):
+        graph += f";[thumb{i}]scale={width}:-2[thumb{i}_out]"
+
+    command = ['ffmpeg', '-hide_banner', '-y', '-ss', f"{at:.3f}", '-i', src, '-filter_complex', graph,
+               '-map', '[poster_out]', '-frames:v', '1', '-q:v', '3', poster]
+    for i, (_, path) in enumerate(thumbs):
+        command.extend(['-map', f"[thumb{i}_out]", '-frames:v', '1', '-q:v', '5', path])
+    return command
+
+
+def _temp_name(path):
+    root, ext = os.path.splitext(path)
+    return root + ".tmp" + ext
+
+
+def run_job(job):
+    """
+    Run one preparation step in a worker process
+
+    Args:
+        job (tuple): (kind, src, outputs, command) where outputs are the final files and
+            command writes them under their _temp_name()
+
+    Returns:
+        dict: src, kind, outputs, ok, bytes_out, seconds and error (if any)
+    """
+    kind, src, outputs, command = job
+    start = time.perf_counter()
+    result = {"src": src, "kind": kind, "outputs": outputs, "ok": False, "bytes_out": 0}
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        # Publish only complete files, so an interrupted run never leaves a truncated output
+        for path in outputs:
+            os.replace(_temp_name(path), path)
+        result["ok"] = True
+        result["bytes_out"] = sum(os.path.getsize(path) for path in outputs)
+    except subprocess.CalledProcessError as e:
+        result["error"] = e.stderr.strip().splitlines()[-1] if e.stderr else str(e)
+        for path in outputs:
+            if os.path.exists(_temp_name(path)):
+                os.remove(_temp_name(path))
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def plan_jobs(src, media_dir, name=None, max_height=DEFAULT_MAX_HEIGHT,
+              preview_height=DEFAULT_PREVIEW_HEIGHT, thumb_widths=DEFAULT_THUMB_WIDTHS):
+    """
+    Jobs needed to bring one video's outputs up to date (empty if nothing changed)
+
+    Args:
+        src (str): Downloaded video
+        media_dir (str): The story's media directory
+        name (str): Output base name (defaults to the source stem without _final)
+        preview_height (int): Preview height, or 0 to skip the preview
+    """
+    if name is None:
+        name = os.path.splitext(os.path.basename(src))[0]
+        if name.endswith("_final"):
+            name = name[:-len("_final")]
+    base = os.path.join(media_dir, name)
+    web = base + ".mp4"
+    preview = base + "_preview.mp4"
+    poster = base + "_poster.jpg"
+    thumbs = [(width, f"{base}_thumb_{width}.jpg") for width in thumb_widths]
+
+    steps = [("web", [web])]
+    if preview_height:
+        steps.append(("preview", [preview]))
+    steps.append(("stills", [poster] + [path for _, path in thumbs]))
+    steps = [(kind, outputs) for kind, outputs in steps
+             if not all(is_up_to_date(src, path) for path in outputs)]
+    if not steps:
+        return []
+
+    info = probe(src)
+    if _video_stream(info) is None:
+        raise ValueError(f"{src} has no video stream")
+    jobs = []
+    for kind, outputs in steps:
+        if kind == "web":
+            command = web_command(src, _temp_name(web), info, max_height)
+        elif kind == "preview":
+            command = preview_command(src, _temp_name(preview), preview_height)
+        else:
+            command = stills_command(src, _temp_name(poster),
+                                     [(width, _temp_name(path)) for width, path in thumbs], info, max_height)
+        jobs.append((kind, src, outputs, command))
+    return jobs
+
+
+def prepare_videos(files, story_dir, max_height=DEFAULT_MAX_HEIGHT, preview_height=DEFAULT_PREVIEW_HEIGHT,
+                   thumb_widths=DEFAULT_THUMB_WIDTHS, workers=None):
+    """
+    Prepare many videos for a story in a process pool
+
+    Args:
+        files (list[str]): Downloaded videos
+        story_dir (str): Story directory; outputs go to its media/ subdirectory
+        workers (int): Pool size (defaults to the CPU count)
+
+    Returns:
+        list[dict]: One result per executed step (skipped steps are not listed)
+    """
+    media_dir = os.path.join(story_dir, "media")
+    os.makedirs(media_dir, exist_ok=True)
+    jobs = []
+    results = []
+    for src in files:
+        try:
+            jobs.extend(plan_jobs(src, media_dir, None, max_height, preview_height, thumb_widths))
+        except (subprocess.CalledProcessError, ValueError) as e:
+            results.append({"src": src, "kind": "probe", "outputs": [], "ok": False, "bytes_out": 0,
+                            "seconds": 0, "error": str(e)})
+    if not jobs:
+        print(f"✅ Media for {len(files)} videos in {media_dir} is up to date")
+        return results
+
+    # Longest steps first so a big web encode does not start last
+    order = {"web": 0, "preview": 1, "stills": 2}
+    jobs.sort(key=lambda job: order[job[0]])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results.extend(executor.map(run_job, jobs))
+
+    for result in results:
+        if result["ok"]:
+            outputs = ", ".join(os.path.relpath(path, story_dir) for path in result["outputs"])
+            print(f"✅ {result['kind']:<7} {result['src']} -> {outputs} ({result['seconds']:.1f}s)")
+        else:
+            print(f"❌ {result['kind']:<7} {result['src']}: {result.get('error')}")
+    return results
+
+
+def add_prep_arguments(parser):
+    """Shared CLI options for scripts that run this stage after downloading"""
+    parser.add_argument("--max-height", type=int, default=DEFAULT_MAX_HEIGHT, help="Web encode / poster height cap")
+    parser.add_argument("--preview-height", type=int, default=DEFAULT_PREVIEW_HEIGHT,
+                        help="Preview variant height (0 to skip the preview)")
+    parser.add_argument("--thumb-widths", type=int, nargs="+", default=list(DEFAULT_THUMB_WIDTHS),
+                        help="Thumbnail widths in pixels")
+    parser.add_argument("--prep-workers", type=int, default=None, help="Media preparation process pool size (default: CPU count)")
+
+
+def run_prep(files, story_dir, args):
+    """Run the stage with parsed add_prep_arguments() options"""
+    start_time = time.time()
+    results = prepare_videos(files, story_dir, args.max_height, args.preview_height,
+                             tuple(args.thumb_widths), args.prep_workers)
+    done = [r for r in results if r["ok"]]
+    print(f"📊 Media preparation: {len(done)}/{len(results)} steps, {sum(r['bytes_out'] for r in done)} bytes "
+          f"in {time.time() - start_time:.2f} seconds")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Make web-ready encodes, previews, posters and thumbnails for a story.")
+    parser.add_argument("story_dir", type=str, help="Story directory (outputs go to <story_dir>/media)")
+    parser.add_argument("files", nargs="+", help="Downloaded video files")
+    add_prep_arguments(parser)
+    args = parser.parse_args()
+
+    run_prep(args.files, args.story_dir, args)
@@ -1,72 +1,352 @@
 #!/usr/bin/env python3
 import os
 import re
+import sys
+import time
+import ctypes
 import shutil
+import json
+import argparse
 from collections import defaultdict
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from photo_derivatives import DEFAULT_WEB_SIZE, DEFAULT_THUMB_SIZE, build_derivatives, remove_derivatives
+from jobkit import Timings, add_runtime_arguments, timings_from_args
+from photo_similarity import DEFAULT_THRESHOLD, check_pillow, hash_photos, dedup_files, split_files
 
-def parse_filename(filename):
-    """Parse filename to extract sequence information"""
-    # Match patterns like 1-1-1.jpg or 4-2-1-a.jpg
-    pattern1 = r'^(\d+)-(\d+)-(\d+)\.jpg$'  # num-num-num.jpg
-    pattern2 = r'^(\d+)-(\d+)-(\d+)-([a-z])\.jpg$'  # num-num-num-letter.jpg
-    
-    match1 = re.match(pattern1, filename)
-    if match1:
-        return (int(match1.group(1)), int(match1.group(2)), int(match1.group(3)), None)
-    
-    match2 = re.match(pattern2, filename)
-    if match2:
-        return (int(match2.group(1)), int(match2.group(2)), int(match2.group(3)), match2.group(4))
-    
-    return None
+# Photo names: numeric parts joined by a separator, the last one (or a trailing
+# letter suffix) giving the order within the sequence: 1-1-1.jpg, 4-2-1-a.jpg, 3-1-2-7-b.png
+PHOTO_EXTENSIONS = ("jpg", "jpeg")
+MIN_NUMERIC_PARTS = 3
+SLOT_PATTERN = re.compile(r'^(\d+)\.[A-Za-z0-9]+$')
+NATURAL_SPLIT = re.compile(r'(\d+)')
 
-def group_photos_by_sequence(photo_files):
-    """Group photos by everything except the last number/letter"""
-    sequences = defaultdict(list)
-    
+def compile_pattern(extensions=PHOTO_EXTENSIONS, separator="-", min_parts=MIN_NUMERIC_PARTS):
+    """
+    Compile the filename pattern once: at least min_parts numbers joined by
+    separator, an optional suffix starting with a letter, and one of extensions
+    (any case). Groups: the numbers but the last, the last number, the suffix.
+    """
+    sep = re.escape(separator)
+    exts = "|".join(re.escape(ext.lstrip(".")) for ext in extensions)
+    return re.compile(rf'^(\d+(?:{sep}\d+){{{max(0, min_parts - 2)},}}){sep}(\d+)'
+                      rf'(?:{sep}([A-Za-z][A-Za-z0-9]*))?\.(?i:{exts})$')
+
+DEFAULT_PATTERN = compile_pattern()
+
+def natural_key(text):
+    """Sort key ordering embedded numbers by value: a2 < a10, 9 < 10"""
+    return tuple((0, int(part)) if part.isdigit() else (1, part.lower())
+                 for part in NATURAL_SPLIT.split(text) if part)
+
+def parse_filename(filename, pattern=DEFAULT_PATTERN, separator="-"):
+    """
+    Parse filename to extract sequence information
+
+    Returns:
+        tuple: (numbers, suffix) with suffix None for plain numbered photos,
+            or None if the name does not match
+    """
+    match = pattern.match(filename)
+    if not match:
+        return None
+    head, last, suffix = match.groups()
+    return tuple(map(int, head.split(separator))) + (int(last),), suffix
+
+def _position_key(photo):
+    """Numbered shots first, by value, then suffixed variants in natural order"""
+    filename, position = photo
+    if isinstance(position, int):
+        return 0, position, (), filename
+    return 1, 0, natural_key(position), filename
+
+def group_photos_by_sequence(photo_files, pattern=DEFAULT_PATTERN, separator="-"):
+    """
+    Group photos by everything except the last number/suffix
+
+    1-1-3.jpg belongs to sequence (1, 1) at position 3; 4-2-1-a.jpg to sequence
+    (4, 2, 1) at position a. Files within a sequence are naturally sorted by
+    their position, so 1-1-10.jpg follows 1-1-9.jpg and 4-2-1-b2 precedes 4-2-1-b10.
+
+    Returns:
+        dict: sequence key (tuple of ints) -> [(filename, position)] in order
+    """
+    # Group on the matched text; numbers are parsed once per sequence, not per photo
+    by_text = defaultdict(list)
+    suffixed = set()
+    match = pattern.match
     for filename in photo_files:
-        parsed = parse_filename(filename)
-        if parsed:
-            if parsed[3] is None:  # num-num-num.jpg format
-                # Group by first two numbers, drop the last (third) number
-                seq_key = (parsed[0], parsed[1])
-                sequences[seq_key].append((filename, parsed))
-            else:  # num-num-num-letter.jpg format  
-                # Group by first three numbers, drop the last (letter)
-                seq_key = (parsed[0], parsed[1], parsed[2])
-                sequences[seq_key].append((filename, parsed))
-    
-    # Sort files within each sequence
-    for seq_key in sequences:
-        if any(x[1][3] is not None for x in sequences[seq_key]):  # Has letter variants
-            sequences[seq_key].sort(key=lambda x: (x[1][3] or ''))  # Sort by letter
-        else:  # No letter variants, sort by third number
-            sequences[seq_key].sort(key=lambda x: x[1][2])  # Sort by third number
-    
+        parsed = match(filename)
+        if not parsed:
+            continue
+        head, last, suffix = parsed.groups()
+        if suffix is None:
+            by_text[head].append((filename, int(last)))
+        else:
+            text = f"{head}{separator}{last}"
+            by_text[text].append((filename, suffix))
+            suffixed.add(text)
+
+    sequences = {}
+    mixed = set()
+    for text, photos in by_text.items():
+        seq_key = tuple(map(int, text.split(separator)))
+        if seq_key in sequences:  # 01-2 and 1-2, or 4-2-1-a and 4-2-1-5
+            sequences[seq_key].extend(photos)
+            mixed.add(seq_key)
+        else:
+            sequences[seq_key] = photos
+        if text in suffixed:
+            mixed.add(seq_key)
+
+    # Sort files within each sequence; plain numbered ones with C-level keys
+    for seq_key, photos in sequences.items():
+        if seq_key in mixed:
+            photos.sort(key=_position_key)
+        else:
+            photos.sort()
+            photos.sort(key=itemgetter(1))
     return sequences
 
-def create_folders_with_consecutive_photos(sequences, source_dir, max_photos_per_folder=5):
-    """Create folders with consecutive photos, max 5 per folder, never mixing sequences"""
-    folder_num = 1
-    
+def slot_name(index, filename):
+    """Name of the index-th slide in a folder, keeping the photo's type (.jpeg -> .jpg)"""
+    ext = os.path.splitext(filename)[1].lower()
+    return f"{index}{'.jpg' if ext == '.jpeg' else ext}"
+
+# Folder plan of the last run, kept in the photo folder
+PLAN_FILE = ".organize_plan.json"
+
+# Ways to put a photo into its folder, tried in order by "auto"
+LINK_METHODS = ("reflink", "hardlink", "copy")
+FICLONE = 0x40049409  # Linux ioctl: share extents copy-on-write (btrfs, xfs, ...)
+
+def reflink(source_path, dest_path):
+    """Copy-on-write clone: no data is duplicated until one side is modified"""
+    if sys.platform == "darwin":
+        # APFS clonefile(2); fails if dest exists
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(source_path), os.fsencode(dest_path), 0) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), dest_path)
+        return
+    import fcntl
+    with open(source_path, "rb") as src, open(dest_path, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(dest_path)
+            raise
+    shutil.copystat(source_path, dest_path)
+
+def place_file(source_path, dest_path, method="copy"):
+    """
+    Put source_path at dest_path (replacing it) without a partially written file
+
+    Methods: copy, hardlink, symlink (relative), reflink, move, or auto (reflink,
+    then hardlink, then copy). Returns the method that succeeded.
+    """
+    temp_path = dest_path + ".tmp"
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    if method == "move":
+        if os.path.exists(dest_path) and os.path.samefile(source_path, dest_path):
+            # rename() between two links to the same file does nothing: drop the source link
+            os.remove(source_path)
+        else:
+            os.replace(source_path, dest_path)
+        return method
+    candidates = LINK_METHODS if method == "auto" else (method,)
+    for i, candidate in enumerate(candidates):
+        try:
+            if candidate == "copy":
+                shutil.copy2(source_path, temp_path)
+            elif candidate == "hardlink":
+                os.link(source_path, temp_path)
+            elif candidate == "symlink":
+                os.symlink(os.path.relpath(source_path, os.path.dirname(dest_path)), temp_path)
+            elif candidate == "reflink":
+                reflink(source_path, temp_path)
+            os.replace(temp_path, dest_path)
+            return candidate
+        except OSError:
+            # Unsupported by this filesystem (or across devices): try the next method
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            if i == len(candidates) - 1:
+                raise
+
+def place_files(operations, method="copy", workers=8):
+    """
+    Run (source, dest) file operations in a thread pool
+
+    Returns:
+        dict: files, bytes (total photo size), bytes_avoided (not duplicated on disk),
+            seconds, failed (destinations) and a count per method used
+    """
+    start = time.perf_counter()
+    summary = {"files": 0, "bytes": 0, "bytes_avoided": 0, "failed": [], "methods": defaultdict(int)}
+
+    def run(operation):
+        source_path, dest_path = operation
+        size = os.path.getsize(source_path)
+        return size, place_file(source_path, dest_path, method)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(run, operation): operation for operation in operations}
+        for future in as_completed(futures):
+            try:
+                size, used = future.result()
+            except OSError as e:
+                summary["failed"].append(futures[future][1])
+                print(f"  ❌ {futures[future][0]} -> {futures[future][1]}: {e}")
+                continue
+            summary["files"] += 1
+            summary["bytes"] += size
+            summary["methods"][used] += 1
+            if used != "copy":
+                summary["bytes_avoided"] += size
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+def sequence_name(seq_key):
+    return "-".join(map(str, seq_key))
+
+def load_plan(source_dir):
+    """The plan applied by the last run ({"folders": {}} if there is none)"""
+    try:
+        with open(os.path.join(source_dir, PLAN_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"folders": {}}
+
+def save_plan(source_dir, plan):
+    path = os.path.join(source_dir, PLAN_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+def plan_folders(sequences, previous, max_photos_per_folder=5, split=None):
+    """
+    Deterministic folder plan: folder number -> {"sequence", "files"}
+
+    Each sequence is split into consecutive batches (never mixing sequences) of
+    max_photos_per_folder files, or by split(files) -> [batch, ...] if given. A
+    sequence keeps the folder numbers it had in the previous plan, in order; extra
+    batches get numbers after the highest ever used, so adding shots never renumbers
+    existing folders. Folders whose photos were moved (--move) are kept as they are.
+    """
+    previous_folders = previous.get("folders", {})
+    folders = {}
+    moved = set()
+    for folder, entry in previous_folders.items():
+        if entry.get("moved"):
+            folders[folder] = entry
+            moved.update(entry["files"])
+
+    folders_by_sequence = defaultdict(list)
+    for folder, entry in sorted(previous_folders.items(), key=lambda item: int(item[0])):
+        if not entry.get("moved"):
+            folders_by_sequence[entry["sequence"]].append(folder)
+    next_folder = max(map(int, previous_folders), default=0) + 1
+
     # Sort sequences by their key (to process in order)
-    sorted_sequences = sorted(sequences.items())
-    
-    for seq_key, photos in sorted_sequences:
-        # Each sequence must be processed separately - never mix sequences
-        remaining_photos = photos[:]
-        
-        while remaining_photos:
-            # Take up to max_photos_per_folder from current sequence
-            batch = remaining_photos[:max_photos_per_folder]
-            remaining_photos = remaining_photos[max_photos_per_folder:]
-            
-            # Create folder with this batch
-            create_and_populate_folder(folder_num, batch, source_dir)
-            folder_num += 1
+    for seq_key, photos in sorted(sequences.items()):
+        name = sequence_name(seq_key)
+        files = [filename for filename, parsed in photos if filename not in moved]
+        reusable = folders_by_sequence.get(name, [])
+        if split:
+            batches = split(files)
+        else:
+            batches = [files[i:i + max_photos_per_folder] for i in range(0, len(files), max_photos_per_folder)]
+        for batch_index, batch in enumerate(batches):
+            if batch_index < len(reusable):
+                folder = reusable[batch_index]
+            else:
+                folder = str(next_folder)
+                next_folder += 1
+            folders[folder] = {"sequence": name, "files": batch}
+    return {"max_per_folder": max_photos_per_folder,
+            "folders": dict(sorted(folders.items(), key=lambda item: int(item[0])))}
+
+def _source_stamps(source_dir, files):
+    stamps = []
+    for filename in files:
+        stat = os.stat(os.path.join(source_dir, filename))
+        stamps.append([stat.st_size, stat.st_mtime_ns])
+    return stamps
+
+def _remove_stale_slots(folder_path, keep):
+    """Delete slot files (1.jpg, 2.png, ...) in folder_path that are not in keep"""
+    for name in os.listdir(folder_path):
+        if SLOT_PATTERN.match(name) and name not in keep:
+            os.remove(os.path.join(folder_path, name))
+
+def apply_plan(plan, previous, source_dir, method="copy", workers=8, dry_run=False):
+    """
+    Bring the folders on disk in line with plan, touching only folders that changed
+
+    A folder is unchanged if the previous plan put the same files there with the
+    same method, the source photos have the same size and mtime, and all its slot
+    files still exist. Folders dropped from the plan lose their slot files.
+
+    Returns:
+        dict: place_files() summary plus changed/unchanged/removed folder counts
+    """
+    previous_folders = previous.get("folders", {})
+    operations = []
+    changed = []
+    unchanged = 0
+    for folder, entry in plan["folders"].items():
+        if entry.get("moved"):
+            unchanged += 1
+            continue
+        entry["method"] = method
+        entry["stamps"] = _source_stamps(source_dir, entry["files"])
+        before = previous_folders.get(folder, {})
+        folder_path = os.path.join(source_dir, folder)
+        slots = [slot_name(i, filename) for i, filename in enumerate(entry["files"], 1)]
+        if (before.get("files") == entry["files"] and before.get("stamps") == entry["stamps"]
+                and before.get("method") == method
+                and all(os.path.lexists(os.path.join(folder_path, slot)) for slot in slots)):
+            unchanged += 1
+            continue
+        changed.append(folder)
+        if dry_run:
+            print(f"Would update folder '{folder}': {', '.join(entry['files'])}")
+            continue
+        photos = [(filename, None) for filename in entry["files"]]
+        operations.extend(create_and_populate_folder(folder, photos, source_dir))
+        _remove_stale_slots(folder_path, set(slots))
+
+    removed = [folder for folder in previous_folders if folder not in plan["folders"]]
+    for folder in removed:
+        if dry_run:
+            print(f"Would empty folder '{folder}'")
+            continue
+        folder_path = os.path.join(source_dir, folder)
+        if os.path.isdir(folder_path):
+            _remove_stale_slots(folder_path, set())
+            remove_derivatives(folder_path)
+            if not os.listdir(folder_path):
+                os.rmdir(folder_path)
+
+    # The file operations themselves run in parallel
+    summary = place_files([] if dry_run else operations, method, workers)
+    failed = set(summary["failed"])
+    for folder in changed:
+        entry = plan["folders"][folder]
+        folder_path = os.path.join(source_dir, folder)
+        if any(os.path.join(folder_path, slot_name(i, filename)) in failed
+               for i, filename in enumerate(entry["files"], 1)):
+            entry["stamps"] = None  # retried on the next run
+        elif method == "move":
+            entry["moved"] = True
+    summary.update(changed=len(changed), unchanged=unchanged, removed=len(removed))
+    return summary
 
 def create_and_populate_folder(folder_num, photos, source_dir):
-    """Create folder and copy photos to it with renamed files (1.jpg, 2.jpg, etc.)"""
+    """Create folder and list (source, dest) operations for its renamed files (1.jpg, 2.jpg, etc.)"""
     folder_name = str(folder_num)
     folder_path = os.path.join(source_dir, folder_name)
     
@@ -74,36 +354,137 @@ def create_and_populate_folder(folder_num, photos, source_dir):
     os.makedirs(folder_path, exist_ok=True)
     
     print(f"Creating folder '{folder_name}' with {len(photos)} photos:")
+    operations = []
     for i, (filename, parsed) in enumerate(photos, 1):
         source_path = os.path.join(source_dir, filename)
-        new_filename = f"{i}.jpg"
+        new_filename = slot_name(i, filename)
         dest_path = os.path.join(folder_path, new_filename)
-        shutil.copy2(source_path, dest_path)
-        print(f"  Copied: {filename} -> {new_filename}")
+        operations.append((source_path, dest_path))
+        print(f"  {filename} -> {new_filename}")
     print()
+    return operations
 
-def main():
-    source_dir = "./"
+def build_parser():
+    parser = argparse.ArgumentParser(description="Group sequence photos (1-1-1.jpg, 4-2-1-a.jpg) into folders of renamed slides.")
+    parser.add_argument("source_dir", nargs="?", default="./", help="Folder with the photos (default: current folder)")
+    parser.add_argument("--link", choices=("copy", "auto", "reflink", "hardlink", "symlink"), default="copy",
+                        help="How files are placed: copy (default), auto = reflink, else hardlink, else copy. "
+                             "Hardlinks/symlinks share data with the original photo, so in-place edits of a slide change it too")
+    parser.add_argument("--move", action="store_true", help="Move the photos into the folders instead")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel file operations")
+    parser.add_argument("--dry-run", action="store_true", help="Show which folders would change without touching anything")
+    parser.add_argument("--max-per-folder", type=int, default=5, help="Photos per folder (default: 5)")
+    parser.add_argument("--extensions", nargs="+", default=list(PHOTO_EXTENSIONS),
+                        help="Photo extensions, any case (default: jpg jpeg)")
+    parser.add_argument("--separator", default="-", help="Separator between the numbers (default: -)")
+    parser.add_argument("--min-parts", type=int, default=MIN_NUMERIC_PARTS,
+                        help="Fewest numbers in a name, the last being the position (default: 3)")
+    parser.add_argument("--similar", choices=("dedup", "split"),
+                        help="Compare shots by perceptual hash (needs Pillow): dedup = leave near-duplicates out, "
+                             "split = never put near-duplicates in the same folder")
+    parser.add_argument("--similar-threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help=f"Differing hash bits (of 64) still counted as near-duplicate (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--hash-workers", type=int, default=None, help="Processes for hashing (default: CPU count)")
+    parser.add_argument("--derivatives", action="store_true",
+                        help="Also write web-sized copies (<folder>/web/) and thumbnails (<folder>/thumb/) of the slides (needs Pillow)")
+    parser.add_argument("--web-size", type=int, default=DEFAULT_WEB_SIZE,
+                        help=f"Longest edge of the web copies (default: {DEFAULT_WEB_SIZE})")
+    parser.add_argument("--thumb-size", type=int, default=DEFAULT_THUMB_SIZE,
+                        help=f"Longest edge of the thumbnails (default: {DEFAULT_THUMB_SIZE})")
+    parser.add_argument("--derivative-workers", type=int, default=None,
+                        help="Processes for the derivatives (default: CPU count)")
+    add_runtime_arguments(parser, jobs=None, retries=None)
+    return parser
+
+def organize(args, timings=None):
+    """
+    Group, plan and apply with parsed build_parser() options (Pillow must be
+    available for --similar and --derivatives, see check_pillow())
+
+    Returns:
+        dict: apply_plan() summary, plus "derivatives" (build_derivatives()
+            summary) with --derivatives
+    """
+    source_dir = args.source_dir
+    pattern = compile_pattern(args.extensions, args.separator, args.min_parts)
+    timings = timings or Timings()
     
-    # Get all jpg files
-    all_files = [f for f in os.listdir(source_dir) if f.lower().endswith('.jpg')]
+    # Group photos matching the pattern by sequence
+    with timings.timed("group"):
+        sequences = group_photos_by_sequence(os.listdir(source_dir), pattern, args.separator)
+    print(f"Found {sum(map(len, sequences.values()))} photos matching the pattern")
+    print(f"Found {len(sequences)} unique sequences")
     
-    # Filter files that match our patterns
-    photo_files = []
-    for filename in all_files:
-        if parse_filename(filename):
-            photo_files.append(filename)
+    split = None
+    if args.similar:
+        filenames = [filename for photos in sequences.values() for filename, _ in photos]
+        with timings.timed("hash", photos=len(filenames)):
+            hashes, hashed = hash_photos(source_dir, filenames, args.hash_workers, update_cache=not args.dry_run)
+        print(f"Hashed {hashed} photos ({len(filenames) - hashed} cached)")
+        if args.similar == "dedup":
+            skipped = 0
+            for seq_key, photos in sequences.items():
+                kept, dropped = dedup_files([filename for filename, _ in photos], hashes, args.similar_threshold)
+                if dropped:
+                    print(f"Leaving out near-duplicates in {sequence_name(seq_key)}: {', '.join(dropped)}")
+                    kept = set(kept)
+                    sequences[seq_key] = [photo for photo in photos if photo[0] in kept]
+                    skipped += len(dropped)
+            print(f"Left out {skipped} near-duplicate photos")
+        else:
+            def split(files):
+                return split_files(files, hashes, args.max_per_folder, args.similar_threshold)
     
-    print(f"Found {len(photo_files)} photos matching the pattern")
+    # Plan folders (stable across runs), then only rewrite folders that changed
+    previous = load_plan(source_dir)
+    plan = plan_folders(sequences, previous, args.max_per_folder, split)
+    with timings.timed("apply", folders=len(plan["folders"])):
+        summary = apply_plan(plan, previous, source_dir, method="move" if args.move else args.link,
+                             workers=args.workers, dry_run=args.dry_run)
     
-    # Group photos by sequence
-    sequences = group_photos_by_sequence(photo_files)
-    print(f"Found {len(sequences)} unique sequences")
+    print(f"{summary['changed']} folders updated, {summary['unchanged']} unchanged, {summary['removed']} removed")
+    if args.dry_run:
+        return summary
+    save_plan(source_dir, plan)
+    if summary["files"]:
+        methods = ", ".join(f"{count} {method}" for method, count in sorted(summary["methods"].items()))
+        print(f"Placed {summary['files']} files ({methods}) in {summary['seconds']:.2f}s; "
+              f"{summary['bytes_avoided'] / 1e6:.1f} of {summary['bytes'] / 1e6:.1f} MB not duplicated"
+              + (f"; {len(summary['failed'])} failed" if summary['failed'] else ""))
+    elif summary["failed"]:
+        print(f"{len(summary['failed'])} files failed to place")
     
-    # Create folders with consecutive photos
-    create_folders_with_consecutive_photos(sequences, source_dir)
+    if args.derivatives:
+        folders = []
+        for folder, entry in plan["folders"].items():
+            folder_path = os.path.join(source_dir, folder)
+            slots = [slot_name(i, filename) for i, filename in enumerate(entry["files"], 1)]
+            folders.append((folder_path, [slot for slot in slots if os.path.exists(os.path.join(folder_path, slot))]))
+        with timings.timed("derivatives", folders=len(folders)):
+            derived = build_derivatives(folders, args.web_size, args.thumb_size, args.derivative_workers)
+        print(f"Derivatives: {derived['written']} files written, {derived['skipped']} slides up to date"
+              + (f", {derived['failed']} failed" if derived['failed'] else "") + f" in {derived['seconds']:.2f}s")
+        summary["derivatives"] = derived
+    return summary
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.max_per_folder < 1:
+        parser.error("--max-per-folder must be at least 1")
+    if args.similar or args.derivatives:
+        error = check_pillow()
+        if error:
+            print(f"❌ {error}")
+            sys.exit(1)
     
+    timings = timings_from_args(args)
+    organize(args, timings)
+    if args.dry_run:
+        return
+    if args.timings:
+        timings.report()
     print("Photo organization complete!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
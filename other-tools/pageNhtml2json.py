@@ -3,38 +3,252 @@ import os
 import re
 import json
 import sys
+import time
+import hashlib
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from pagedata_scanner import scan_pagedata
+from jobkit import Timings, add_runtime_arguments, timings_from_args
+
+PAGES_JSON = "pages.json"
+# Per-page mtime/size/sha256 of the last build (and of the pages.json it wrote), next to pages.json
+FINGERPRINTS_JSON = "pages.fingerprints.json"
+# Optional outputs: per-page shards with an index, and a media manifest for preloading
+SHARDS_DIR = "pages"
+SHARD_INDEX = "index.json"
+MEDIA_JSON = "media.json"
+MEDIA_FIELDS = ("bgUrl", "fgUrl", "audioUrl", "animationAudio")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORIES_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "stories"))
+
+def read_pagedata(html_file_path):
+    """Extract pageData from an HTML file without printing: returns (pagedata, error)"""
+    try:
+        # Memory-mapped scan that stops at the end of the object (see pagedata_scanner.py)
+        pagedata = scan_pagedata(html_file_path)
+
+        if pagedata is None:
+            return None, f"No pageData found in {html_file_path}"
+
+        return pagedata, None
+
+    except json.JSONDecodeError as e:
+        return None, f"Failed to parse pageData JSON in {html_file_path}: {e}"
+    except ValueError as e:
+        return None, f"Malformed pageData in {html_file_path}: {e}"
+    except Exception as e:
+        return None, f"Error reading {html_file_path}: {e}"
 
 def extract_pagedata_from_html(html_file_path):
     """Extract pageData JavaScript object from HTML file"""
+    pagedata, error = read_pagedata(html_file_path)
+    if error:
+        print(f"  ❌ {error}")
+    return pagedata
+
+def find_page_files(folder_path):
+    """(page number, path) of every pageN.html in a folder, sorted by page number"""
+    page_files = []
+    for file_path in Path(folder_path).glob("page*.html"):
+        match = re.match(r'page(\d+)\.html', file_path.name, re.IGNORECASE)
+        if match:
+            page_num = int(match.group(1))
+            page_files.append((page_num, file_path))
+
+    # Sort by page number
+    page_files.sort(key=lambda x: x[0])
+    return page_files
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def page_fingerprint(file_path, previous=None):
+    """
+    (fingerprint, unchanged) for a page file
+
+    Pages whose mtime and size match the previous fingerprint are not read at all;
+    otherwise the content hash decides (a touched but identical page is unchanged).
+    """
+    stat = os.stat(file_path)
+    if previous and previous["mtime_ns"] == stat.st_mtime_ns and previous["size"] == stat.st_size:
+        return previous, True
+    fingerprint = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": file_sha256(file_path)}
+    return fingerprint, bool(previous) and previous["sha256"] == fingerprint["sha256"]
+
+def _load_json(path):
     try:
-        with open(html_file_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
-        # Find the pageData JavaScript object
-        pattern = r'var pageData = ({[\s\S]*?});(?=\s*</script>|\s*var|\s*function|\s*document)'
-        match = re.search(pattern, html_content)
-        
-        if not match:
-            print(f"  ❌ No pageData found in {html_file_path}")
-            return None
-            
-        pagedata_str = match.group(1)
-        
-        # Parse as JSON
-        try:
-            pagedata = json.loads(pagedata_str)
-            return pagedata
-        except json.JSONDecodeError as e:
-            print(f"  ❌ Failed to parse pageData JSON in {html_file_path}: {e}")
-            return None
-            
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def plan_story_folder(folder_path, page_files, full=False):
+    """
+    Compare page files with the fingerprints saved by the last build
+
+    Pages are only reused while pages.json is still the file the last build wrote:
+    if something else rewrote it (the builder's /api/save-page-data), or it has no
+    recorded fingerprint, every page is extracted again, as with full.
+
+    Returns:
+        dict: "reused" pages (number -> pageData) taken from the existing pages.json,
+            "changed" (page number, path) pairs to extract, the new "fingerprints"
+            and the recorded "pages_json" fingerprint (None if it no longer applies)
+    """
+    json_dir = Path(folder_path) / "json"
+    saved = {} if full else _load_json(json_dir / FINGERPRINTS_JSON)
+    previous_pages = {} if full else _load_json(json_dir / PAGES_JSON)
+    previous_prints = saved.get("pages", {})
+    pages_json_print = saved.get("pages_json")
+    if previous_pages:
+        unchanged = False
+        if pages_json_print:
+            pages_json_print, unchanged = page_fingerprint(json_dir / PAGES_JSON, pages_json_print)
+        if not unchanged:
+            reason = "was changed outside this tool" if pages_json_print else "has no recorded fingerprint"
+            print(f"  ⚠️  {json_dir / PAGES_JSON} {reason}, re-extracting every page")
+            previous_pages, pages_json_print = {}, None
+    plan = {"reused": {}, "changed": [], "fingerprints": {}, "pages_json": pages_json_print}
+    for page_num, file_path in page_files:
+        key = str(page_num)
+        fingerprint, unchanged = page_fingerprint(file_path, previous_prints.get(key))
+        plan["fingerprints"][key] = fingerprint
+        if unchanged and key in previous_pages:
+            plan["reused"][key] = previous_pages[key]
+        else:
+            plan["changed"].append((page_num, file_path))
+    return plan
+
+def dump_json(data, compact=False):
+    """Serialized JSON text: pretty (indent=2) or compact (no whitespace)"""
+    if compact:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+def _write_if_changed(path, text):
+    """Atomically replace path with text unless it already holds exactly that; returns whether it wrote"""
+    data = text.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    temp_path = str(path) + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return True
+
+def write_shards(json_dir, pages_data, compact=False):
+    """
+    json/pages/N.json per page plus json/pages/index.json
+
+    The index maps each page number to its shard's content hash (for cache-busting,
+    e.g. pages/1.json?v=<hash>), so a loader can fetch the index and page 1 instead
+    of every page.
+    Shards of deleted pages are removed. Returns whether anything changed.
+    """
+    shard_dir = Path(json_dir) / SHARDS_DIR
+    shard_dir.mkdir(exist_ok=True)
+    changed = False
+    index = {"count": len(pages_data), "pages": {}}
+    for key, pagedata in pages_data.items():
+        text = dump_json(pagedata, compact)
+        changed |= _write_if_changed(shard_dir / f"{key}.json", text)
+        index["pages"][key] = hashlib.sha1(text.encode('utf-8')).hexdigest()[:10]
+    for shard in shard_dir.glob("*.json"):
+        if shard.stem.isdigit() and shard.stem not in pages_data:
+            shard.unlink()
+            changed = True
+    changed |= _write_if_changed(shard_dir / SHARD_INDEX, dump_json(index, compact))
+    return changed
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+def media_manifest(folder_path, pages_data):
+    """
+    Media each page references, for preloading: {"pages": {N: [url, ...]}, "files": [all urls]}
+
+    bgUrl/fgUrl/audioUrl/animationAudio are taken as-is (skipping empty values, bare
+    folders like "media/" and inline data: URLs); animationFolder is expanded to the
+    files it contains, in playback order.
+    """
+    manifest = {"pages": {}, "files": []}
+    seen = set()
+    for key, pagedata in pages_data.items():
+        urls = []
+        for field in MEDIA_FIELDS:
+            url = str(pagedata.get(field) or '').strip()
+            if url and not url.endswith('/') and not url.startswith('data:'):
+                urls.append(url)
+        folder = str(pagedata.get("animationFolder") or '').strip()
+        if folder:
+            folder_dir = Path(folder_path) / folder
+            if folder_dir.is_dir():
+                names = sorted((p.name for p in folder_dir.iterdir() if p.is_file()), key=_natural_key)
+                urls.extend(folder.rstrip('/') + '/' + name for name in names)
+            else:
+                urls.append(folder)
+        manifest["pages"][key] = urls
+        for url in urls:
+            if url not in seen:
+                seen.add(url)
+                manifest["files"].append(url)
+    return manifest
+
+def save_story_json(folder_path, pages_data, plan, options=None):
+    """
+    Write json/pages.json (and the optional outputs) where they differ from what is on disk
+
+    Files are replaced atomically, so a reader never sees a half-written pages.json.
+
+    Args:
+        options (dict): "compact" (no indentation), "shards" (json/pages/N.json + index)
+            and "media" (json/media.json manifest), all off by default
+
+    Returns:
+        tuple: (pages.json path or None on failure, whether any output was rewritten)
+    """
+    options = options or {}
+    compact = options.get("compact", False)
+    # Create json directory if it doesn't exist
+    json_dir = Path(folder_path) / "json"
+    json_dir.mkdir(exist_ok=True)
+
+    pages_json_path = json_dir / PAGES_JSON
+    # Keep page-number order regardless of which pages were re-extracted
+    pages_data = {key: pages_data[key] for key in sorted(pages_data, key=int)}
+    # Only fingerprint pages that made it into pages.json, so failed pages are retried
+    fingerprints = {key: value for key, value in plan["fingerprints"].items() if key in pages_data}
+
+    try:
+        changed = _write_if_changed(pages_json_path, dump_json(pages_data, compact))
+        # Recorded so the next run can tell whether pages.json is still this build's output
+        pages_json_print = page_fingerprint(pages_json_path, plan.get("pages_json"))[0]
+        if options.get("shards"):
+            changed |= write_shards(json_dir, pages_data, compact)
+        if options.get("media"):
+            changed |= _write_if_changed(json_dir / MEDIA_JSON,
+                                         dump_json(media_manifest(folder_path, pages_data), compact))
+        _write_if_changed(json_dir / FINGERPRINTS_JSON,
+                          dump_json({"pages_json": pages_json_print, "pages": fingerprints}))
+        return pages_json_path, changed
+
     except Exception as e:
-        print(f"  ❌ Error reading {html_file_path}: {e}")
-        return None
+        print(f"  ❌ Failed to save pages.json: {e}")
+        return None, False
 
-def process_story_folder(folder_path):
-    """Process all pageN.html files in a story folder"""
+def process_story_folder(folder_path, full=False, options=None):
+    """Process all pageN.html files in a story folder (only changed ones unless full)"""
     folder_path = Path(folder_path)
     
     if not folder_path.exists():
@@ -44,25 +258,21 @@ def process_story_folder(folder_path):
     print(f"\n📁 Processing folder: {folder_path}")
     
     # Find all pageN.html files
-    page_files = []
-    for file_path in folder_path.glob("page*.html"):
-        match = re.match(r'page(\d+)\.html', file_path.name, re.IGNORECASE)
-        if match:
-            page_num = int(match.group(1))
-            page_files.append((page_num, file_path))
+    page_files = find_page_files(folder_path)
     
     if not page_files:
         print(f"  ❌ No pageN.html files found in {folder_path}")
         return
     
-    # Sort by page number
-    page_files.sort(key=lambda x: x[0])
-    
-    # Extract data from each page
-    pages_data = {}
+    plan = plan_story_folder(folder_path, page_files, full)
+    if plan["reused"]:
+        print(f"  ♻️  {len(plan['reused'])} unchanged pages reused")
+
+    # Extract data from each new or changed page
+    pages_data = dict(plan["reused"])
     extracted_count = 0
     
-    for page_num, file_path in page_files:
+    for page_num, file_path in plan["changed"]:
         print(f"  📄 Extracting page{page_num}.html...")
         pagedata = extract_pagedata_from_html(file_path)
         
@@ -77,38 +287,168 @@ def process_story_folder(folder_path):
         print(f"  ❌ No valid pageData found in any files")
         return
     
-    # Create json directory if it doesn't exist
-    json_dir = folder_path / "json"
-    json_dir.mkdir(exist_ok=True)
-    
-    # Save pages.json
-    pages_json_path = json_dir / "pages.json"
-    
-    try:
-        with open(pages_json_path, 'w', encoding='utf-8') as f:
-            json.dump(pages_data, f, indent=2, ensure_ascii=False)
-        
+    pages_json_path, changed = save_story_json(folder_path, pages_data, plan, options)
+    if pages_json_path and changed:
         print(f"  ✅ Created {pages_json_path}")
         print(f"  📊 Extracted {extracted_count} pages successfully")
-        
-    except Exception as e:
-        print(f"  ❌ Failed to save pages.json: {e}")
+    elif pages_json_path:
+        print(f"  ✅ {pages_json_path} is up to date")
+
+def discover_story_folders(stories_dir=STORIES_DIR):
+    """Every folder under stories_dir that contains pageN.html files"""
+    if not Path(stories_dir).is_dir():
+        print(f"❌ Stories folder does not exist: {stories_dir}")
+        return []
+    return sorted(str(path) for path in Path(stories_dir).iterdir()
+                  if path.is_dir() and find_page_files(path))
+
+def _read_page(task):
+    folder, page_num, file_path = task
+    pagedata, error = read_pagedata(file_path)
+    return folder, page_num, pagedata, error
+
+def process_story_folders(folders, workers=None, full=False, options=None, timings=None):
+    """
+    Extract the pages of many story folders in one process pool
+
+    All new or changed pages of all folders are fanned out together (so one big
+    story does not leave the other workers idle); results are grouped per folder
+    and each json/pages.json is written once, and only if it changed.
+
+    Returns:
+        dict: folder -> {"pages": extracted, "reused": unchanged, "skipped": failed,
+            "output": pages.json path or None, "changed": whether it was rewritten}
+    """
+    timings = timings or Timings()
+    tasks = []
+    summary = {}
+    plans = {}
+    for folder in folders:
+        if not Path(folder).exists():
+            print(f"❌ Folder does not exist: {folder}")
+            continue
+        page_files = find_page_files(folder)
+        if not page_files:
+            print(f"❌ No pageN.html files found in {folder}")
+            continue
+        with timings.timed("plan", story=folder, pages=len(page_files)):
+            plans[folder] = plan = plan_story_folder(folder, page_files, full)
+        summary[folder] = {"pages": 0, "reused": len(plan["reused"]), "skipped": 0,
+                           "output": None, "changed": False}
+        tasks.extend((folder, page_num, str(file_path)) for page_num, file_path in plan["changed"])
+
+    pages_by_folder = {folder: dict(plan["reused"]) for folder, plan in plans.items()}
+    workers = workers or os.cpu_count() or 1
+    # Large chunks keep inter-process overhead small: most pages parse in well under a millisecond
+    chunksize = max(1, len(tasks) // (workers * 8))
+    with timings.timed("extract", pages=len(tasks), workers=workers):
+        if len(tasks) <= 1:
+            # The usual edit-one-page case: not worth starting a pool
+            results = [_read_page(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_read_page, tasks, chunksize=chunksize))
+    for folder, page_num, pagedata, error in results:
+        if pagedata:
+            pages_by_folder[folder][str(page_num)] = pagedata
+            summary[folder]["pages"] += 1
+        else:
+            summary[folder]["skipped"] += 1
+            print(f"  ⚠️  {error}")
+
+    for folder, pages_data in pages_by_folder.items():
+        result = summary[folder]
+        if not pages_data:
+            print(f"❌ {folder}: no valid pageData found in any files")
+            continue
+        with timings.timed("write", story=folder, pages=len(pages_data)):
+            result["output"], result["changed"] = save_story_json(folder, pages_data, plans[folder], options)
+        if result["output"] and result["changed"]:
+            skipped = f", {result['skipped']} skipped" if result["skipped"] else ""
+            print(f"✅ {folder}: {result['pages']} extracted, {result['reused']} reused{skipped} -> {result['output']}")
+    return summary
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Migrate pageN.html files of story folders to json/pages.json.",
+        epilog="Example: python pageNhtml2json.py ../stories/story1 ../stories/tenfloors")
+    parser.add_argument("folders", nargs="*", help="Story folders")
+    parser.add_argument("--all", action="store_true", help="Also process every story folder under --stories-dir")
+    parser.add_argument("--stories-dir", default=STORIES_DIR, help="Folder searched by --all (default: the repo's stories/)")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-extract every page instead of only pages changed since the last run")
+    parser.add_argument("--compact", action="store_true", help="Write JSON without indentation")
+    parser.add_argument("--shards", action="store_true",
+                        help="Also write one json/pages/N.json per page plus json/pages/index.json")
+    parser.add_argument("--media-manifest", action="store_true",
+                        help="Also write json/media.json listing the media each page references (for preloading)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Worker processes across all pages (default: CPU count; 1 = serial, per-page output)")
+    add_runtime_arguments(parser, jobs=None, retries=None)
+    return parser
+
+def story_folders(args):
+    """
+    The folders named on the command line plus those found by --all, each once
+
+    Folders are compared by real path, so ../stories/story1 and the absolute path
+    --all finds for it are not processed (and written) twice.
+    """
+    candidates = list(args.folders)
+    if args.all:
+        candidates += discover_story_folders(args.stories_dir)
+    folders = []
+    seen = set()
+    for folder in candidates:
+        real = os.path.realpath(folder)
+        if real not in seen:
+            seen.add(real)
+            folders.append(folder)
+    return folders
+
+def run(folders, args, timings=None):
+    """
+    Migrate folders with parsed build_parser() options
+
+    Returns:
+        dict: process_story_folders() summary (None with --jobs 1, which
+            processes and reports one folder at a time)
+    """
+    options = {"compact": args.compact, "shards": args.shards, "media": args.media_manifest}
+    timings = timings or Timings()
+    if args.jobs == 1:
+        for folder in folders:
+            with timings.timed("story", story=folder):
+                process_story_folder(folder, args.full, options)
+        return None
+    return process_story_folders(folders, args.jobs, args.full, options, timings)
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python html2json.py <folder1> [folder2] ... [folderN]")
-        print("Example: python html2json.py stories/story1 stories/tenfloors")
+    parser = build_parser()
+    args = parser.parse_args()
+
+    folders = story_folders(args)
+    if not folders:
+        parser.print_usage()
         sys.exit(1)
     
-    folders = sys.argv[1:]
-    
     print("🚀 HTML to JSON Migration Tool")
     print("=" * 40)
     
-    for folder in folders:
-        process_story_folder(folder)
+    start_time = time.time()
+    timings = timings_from_args(args)
+    summary = run(folders, args, timings)
+    if summary is not None:
+        pages = sum(result["pages"] for result in summary.values())
+        reused = sum(result["reused"] for result in summary.values())
+        rewritten = sum(result["changed"] for result in summary.values())
+        elapsed = time.time() - start_time
+        print(f"📊 {pages} pages extracted, {reused} unchanged, {rewritten}/{len(summary)} pages.json rewritten "
+              f"in {elapsed:.2f} seconds")
     
+    if args.timings:
+        timings.report()
     print("\n✅ Migration completed!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
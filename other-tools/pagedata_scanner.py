@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# python3 pagedata_scanner.py stories/story1/page6.html
+# -*- coding: utf-8 -*-
+"""
+Streaming extraction of the `var pageData = {...};` object from story pages
+The page is memory-mapped instead of read into a str, the marker is found with a
+byte search, and the object is delimited by a brace counter that skips over string
+literals (so "};" inside a conversation line does not end it). Scanning stops at
+the closing brace; the rest of the file (scripts, inline base64 media) is never
+touched. Only the object's bytes are decoded and handed to json.loads().
+"""
+import re
+import sys
+import json
+import mmap
+
+MARKER = b"pageData"
+DECLARATION = re.compile(rb"(?:var|let|const)\s+$")
+ASSIGNMENT = re.compile(rb"\s*=\s*")
+# Structural characters inside the object: braces and string delimiters
+STRUCTURAL = re.compile(rb"[{}\"'`]")
+
+
+def _string_end(buf, quote_pos):
+    """Index just past the string literal opening at quote_pos"""
+    quote = buf[quote_pos:quote_pos + 1]
+    pos = quote_pos + 1
+    while True:
+        end = buf.find(quote, pos)
+        if end < 0:
+            raise ValueError(f"unterminated string starting at byte {quote_pos}")
+        # The quote is escaped if preceded by an odd number of backslashes
+        backslashes = 0
+        while buf[end - 1 - backslashes] == 0x5C:
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end + 1
+        pos = end + 1
+
+
+def object_end(buf, start):
+    """Index just past the object whose opening brace is at start"""
+    depth = 0
+    pos = start
+    while True:
+        match = STRUCTURAL.search(buf, pos)
+        if match is None:
+            raise ValueError(f"unbalanced braces in object starting at byte {start}")
+        char = match.group()
+        if char == b"{":
+            depth += 1
+            pos = match.end()
+        elif char == b"}":
+            depth -= 1
+            pos = match.end()
+            if depth == 0:
+                return pos
+        else:
+            pos = _string_end(buf, match.start())
+
+
+def find_pagedata(buf):
+    """
+    (start, end) byte span of the pageData object literal in buf, or None
+
+    Args:
+        buf: bytes-like page content (bytes or mmap)
+    """
+    pos = 0
+    while True:
+        found = buf.find(MARKER, pos)
+        if found < 0:
+            return None
+        pos = found + len(MARKER)
+        # Must be a declaration: `var pageData = {`
+        if not DECLARATION.search(buf[max(0, found - 16):found]):
+            continue
+        assignment = ASSIGNMENT.match(buf, pos)
+        if assignment and buf[assignment.end():assignment.end() + 1] == b"{":
+            start = assignment.end()
+            return start, object_end(buf, start)
+
+
+def scan_pagedata(path):
+    """
+    Parse the pageData object of an HTML page
+
+    Returns:
+        dict: The pageData object, or None if the page declares none
+
+    Raises:
+        ValueError: The object is malformed (json.JSONDecodeError is a ValueError)
+    """
+    with open(path, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None  # empty file: nothing to map
+        with buf:
+            span = find_pagedata(buf)
+            if span is None:
+                return None
+            return json.loads(buf[span[0]:span[1]].decode("utf-8"))
+
+
+if __name__ == "__main__":
+    for page in sys.argv[1:]:
+        print(json.dumps(scan_pagedata(page), ensure_ascii=False, indent=2))
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+# python3 pagesjson2html.py ../stories/story1 [more story folders] [--jobs N] [--force]
+# -*- coding: utf-8 -*-
+"""
+Regenerate pageN.html files from json/pages.json (the reverse of pageNhtml2json.py)
+Produces the same markup as modules/serverPageGenerator.js (the builder's batch
+update), rendered from a template compiled once per run. Only pages whose rendered
+bytes differ from the file on disk are written, so bulk edits to pages.json
+republish just the pages they touched. Large stories render in a process pool.
+
+The ?v= cache-busters on the page scripts are content hashes of
+javascript/video.js, tts1.js, tts2.js and animation.js instead of the time of
+generation, so regenerating unchanged data gives byte-identical pages.
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import hashlib
+import argparse
+from pathlib import Path
+from string import Formatter
+from concurrent.futures import ProcessPoolExecutor
+
+PAGE_SCRIPTS = ("video", "tts1", "tts2", "animation")
+# Below this many pages a process pool costs more than it saves
+POOL_MIN_PAGES = 200
+
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.ogg')
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.gif', '.webp')
+
+TITLE_POSITIONS = {
+    'top-left': 'left: 10px; top: 10px;',
+    'top': 'left: 50%; top: 10px; transform: translateX(-50%);',
+    'top-right': 'right: 10px; top: 10px;',
+    'bottom-left': 'left: 10px; bottom: 10px;',
+    'bottom': 'left: 50%; bottom: 10px; transform: translateX(-50%);',
+    'bottom-right': 'right: 10px; bottom: 10px;',
+}
+ANIMATION_BUTTON_STYLE = 'top: 4px; right: 4px;'
+TELEPORT_POSITIONS = {
+    'top-left': 'top: 10px; left: 10px;',
+    'top': 'top: 10px; left: 50%; transform: translateX(-50%);',
+    'top-right': 'top: 10px; right: 10px;',
+    'middle-left': 'top: 50%; left: 10px; transform: translateY(-50%);',
+    'center': 'top: 50%; left: 50%; transform: translate(-50%, -50%);',
+    'middle-right': 'top: 50%; right: 10px; transform: translateY(-50%);',
+    'bottom-left': 'bottom: 10px; left: 10px;',
+    'bottom': 'bottom: 10px; left: 50%; transform: translateX(-50%);',
+    'bottom-right': 'bottom: 10px; right: 10px;',
+}
+
+# Page skeleton, kept in sync with generatePageHTML() in modules/serverPageGenerator.js.
+# Literal braces are doubled; {fields} are filled per page.
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang='en'>
+<head>
+    <meta charset='UTF-8'>
+    <meta name='viewport' content='width=device-width, initial-scale=1.0'>
+    <title>Saved Webpage</title>
+    <link rel='stylesheet' type='text/css' href='javascript/builder.css'>
+    <style>
+        body {{ background-color: {bg_color} !important; }}
+        html {{ background-color: {bg_color} !important; }}
+    </style>
+    <script> var pageData = {page_json}; </script>
+</head>
+<body style='background-color: {bg_color};'>
+{content}
+    <script>
+        function toggleAudioAndVideo() {{
+            var audio = document.getElementById('audioPlayer');
+            var video = document.getElementById('bgVideo');
+            var icon = document.getElementById('audioIcon');
+            var isPlaying = false;
+            if (audio && !audio.paused) isPlaying = true;
+            if (video && !video.paused) isPlaying = true;
+            if (isPlaying) {{
+                if (audio) audio.pause();
+                if (video) video.pause();
+                icon.classList.remove('pause');
+                icon.classList.add('play');
+            }} else {{
+                if (audio) audio.play();
+                if (video) video.play();
+                icon.classList.remove('play');
+                icon.classList.add('pause');
+            }}
+        }}
+        function toggleAudio() {{ toggleAudioAndVideo(); }}
+        function handleTeleportClick(url, newWindow, loop) {{
+            var pageMatch = url.match(/page(\\\\d+)\\\\.html/);
+            if (pageMatch) {{
+                // For page navigation, always use player.html to enable iframe and timing functionality
+                var pageNum = pageMatch[1];
+                var currentPath = window.location.pathname;
+                var pathParts = currentPath.split('/');
+                var storiesIndex = pathParts.indexOf('stories');
+                var storyName = (storiesIndex !== -1 && pathParts[storiesIndex + 1]) ? pathParts[storiesIndex + 1] : '';
+                var playerUrl = '/stories/' + storyName + '/player.html?page=' + pageNum;
+                if (window.parent !== window) {{
+                    try {{
+                        window.parent.postMessage({{ type: 'teleport', url: playerUrl }}, '*');
+                    }} catch (e) {{
+                        window.location.href = playerUrl;
+                    }}
+                }} else {{
+                    if (newWindow) {{
+                        window.open(playerUrl, '_blank');
+                    }} else {{
+                        window.location.href = playerUrl;
+                    }}
+                }}
+            }} else {{
+                // For non-page URLs, use direct navigation
+                if (newWindow) {{ window.open(url, '_blank'); }} else {{
+                    // Mute background music in parent before navigation
+                    if (window.parent !== window) {{
+                        try {{
+                            var parentAudio = window.parent.document.getElementById('bgAudio');
+                            if (parentAudio) {{
+                                parentAudio.muted = true;
+                            }}
+                        }} catch (e) {{
+                            // Cross-origin restriction, ignore
+                        }}
+                    }}
+                    window.location.href = url;
+                }}
+            }}
+        }}
+        document.addEventListener('DOMContentLoaded', function() {{
+            var urlParams = new URLSearchParams(window.location.search);
+            var pageParam = urlParams.get('page');
+            if (pageParam) {{
+                var targetUrl = './page' + pageParam + '.html';
+                setTimeout(function() {{ window.location.href = targetUrl; }}, 100);
+                return;
+            }}
+            document.addEventListener('keydown', function(event) {{
+                if (event.key === 'ArrowUp') {{
+                    if (typeof skipToNextFrame === 'function') {{
+                        skipToNextFrame();
+                        console.log('ArrowUp: skipped to next frame');
+                    }}
+                }} else if (event.key === 'ArrowDown') {{
+                    if (typeof skipToPreviousFrame === 'function') {{
+                        skipToPreviousFrame();
+                        console.log('ArrowDown: skipped to previous frame');
+                    }}
+                }} else if (event.key === ' ') {{
+                    event.preventDefault();
+                    if (typeof toggleAnimationPause === 'function') {{
+                        toggleAnimationPause();
+                        console.log('Space: toggled animation pause');
+                    }}
+                }}
+            }});
+        }});
+    </script>
+    <script src='javascript/video.js?v={v_video}'></script>
+    <script src='javascript/tts1.js?v={v_tts1}'></script>
+    <script src='javascript/tts2.js?v={v_tts2}'></script>
+    <script src='javascript/animation.js?v={v_animation}'></script>
+</body>
+</html>"""
+
+
+def compile_template(template):
+    """
+    Pre-split a str.format template into literal chunks and field names
+
+    Returns a render(fields) function that only joins strings, so the template is
+    parsed once per run instead of once per page.
+    """
+    parts = []
+    names = []
+    for literal, name, _, _ in Formatter().parse(template):
+        parts.append(literal)
+        if name is not None:
+            names.append(name)
+            parts.append(None)
+
+    def render(fields):
+        values = iter(fields[name] for name in names)
+        return "".join(part if part is not None else next(values) for part in parts)
+
+    return render
+
+
+render_page = compile_template(PAGE_TEMPLATE)
+
+
+# --- JavaScript value semantics, so output matches the Node generator exactly ---
+
+# A key absent from pageData (JavaScript undefined); None is a JSON null
+UNDEFINED = object()
+
+def _js_number(value):
+    """JavaScript ToNumber() for JSON values"""
+    if value is UNDEFINED:
+        return math.nan
+    if value is None:
+        return 0.0
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return 0.0
+        try:
+            return float(text) if re.fullmatch(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?|[+-]?Infinity', text) \
+                else math.nan
+        except ValueError:
+            return math.nan
+    return math.nan
+
+
+def _js_str(value):
+    """String concatenation of a JSON value as JavaScript does it ('' + value)"""
+    if value is UNDEFINED:
+        return 'undefined'
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return 'Infinity' if value > 0 else '-Infinity'
+        if value.is_integer() and abs(value) < 1e21:
+            return str(int(value))
+        return repr(value)
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        return value
+    return json_stringify(value) if isinstance(value, list) else '[object Object]'
+
+
+def json_stringify(value):
+    """JSON.stringify() output (compact, non-ASCII kept as-is)"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def _truthy(value):
+    if value is UNDEFINED or (isinstance(value, float) and math.isnan(value)):
+        return False
+    return value not in (None, False, '', 0)
+
+
+def _crop(width):
+    return _js_str((100 - _js_number(width)) / 2) + '%'
+
+
+def _media_style(page, scale, position, width):
+    return ('width: ' + _js_str(page.get(scale, UNDEFINED)) + '%;' +
+            'left: ' + _js_str(page.get(position, UNDEFINED)) + '%;' +
+            'clip-path: inset(0% ' + _crop(page.get(width, UNDEFINED)) + ' 0% ' +
+            _crop(page.get(width, UNDEFINED)) + ');')
+
+
+def _is_set(value):
+    return isinstance(value, str) and value.strip() != ''
+
+
+def page_content(page):
+    """The <body> markup between the opening tag and the page scripts"""
+    bg_url = page.get('bgUrl')
+    fg_url = page.get('fgUrl')
+    audio_url = page.get('audioUrl')
+    has_bg_video = _truthy(bg_url) and bg_url.endswith(VIDEO_EXTENSIONS)
+    bg_style = _media_style(page, 'bgScale', 'bgPos', 'bgWid') if _truthy(bg_url) else ''
+    fg_style = _media_style(page, 'fgScale', 'fgPos', 'fgWid') if _truthy(fg_url) else ''
+
+    audio_element = ''
+    if _is_set(audio_url) or has_bg_video:
+        audio_element = '<div id="audioIcon" class="audio-icon play" onclick="toggleAudioAndVideo()"></div>'
+        if _is_set(audio_url):
+            audio_element += ('<audio id="audioPlayer" style="display: none;"><source src="' + audio_url +
+                              '" type="audio/mpeg">Your browser does not support the audio element.</audio>')
+
+    bg_element = ''
+    if has_bg_video:
+        bg_element = ('<video id="bgVideo" src="' + bg_url + '" muted loop style="position: absolute; bottom:0; ' +
+                      bg_style + '"></video>')
+    elif _truthy(bg_url) and bg_url.endswith(IMAGE_EXTENSIONS):
+        bg_element = '<img src="' + bg_url + '" alt="Background Image" class="bgImg" style="' + bg_style + '">'
+
+    fg_element = ''
+    if _truthy(fg_url) and fg_url.endswith(VIDEO_EXTENSIONS):
+        fg_element = '<video id="fgVideo" src="' + fg_url + '"muted loop style="position:absolute;' + fg_style + '"></video>'
+    elif _truthy(fg_url) and fg_url.endswith(IMAGE_EXTENSIONS):
+        fg_element = '<img src="' + fg_url + '" alt="Foreground Image" class="fgImg" style="' + fg_style + '">'
+
+    content = '<div>' + bg_element + fg_element + audio_element
+    if _truthy(page.get('title')) or _truthy(page.get('showPageNumber')):
+        content += ('<div class="title" style="position: absolute; ' +
+                    TITLE_POSITIONS.get(page.get('titlePos'), TITLE_POSITIONS['top-left']) + '">' +
+                    _js_str(page.get('title') or '') +
+                    ('&nbsp;' + _js_str(page.get('pageNum') or '') if _truthy(page.get('showPageNumber')) else '') +
+                    '</div>')
+
+    if _is_set(page.get('animationFolder')):
+        content += ('<button id="animationPlayButton" onclick="playPageAnimation()" style="position: absolute; ' +
+                    ANIMATION_BUTTON_STYLE + ' z-index: 10001; padding: 10px; background: rgba(0,0,0,0.7); '
+                    'color: white; border: none; cursor: pointer;">播放幻灯片</button>')
+    content += '</div>'
+
+    descript_style = ('position: absolute; background-color: rgba(0, 0, 0, 0.6); color: white; font-size: 18px; '
+                      'padding: 20px; z-index: 8888; box-sizing: border-box; text-align: center;')
+    if page.get('descriptPos') == 'top':
+        descript_style += 'top: 0; left: 0; right: 0; width: 100%;'
+    elif page.get('descriptPos') == 'middle':
+        descript_style += ('top: 50%; left: 50%; transform: translate(-50%, -50%); width: 60%; display: flex; '
+                           'align-items: center; justify-content: center; background-color: rgba(0, 0, 0, 0); color: #999;')
+    else:
+        descript_style += 'bottom: 0; left: 0; right: 0; width: 100%;'
+    if _truthy(page.get('descript')):
+        content += '<div class="descript" style="' + descript_style + '">' + _js_str(page['descript']) + '</div>'
+
+    for n in ('1', '2'):
+        if _is_set(page.get('conv' + n)):
+            content += ('<div class="conv" style="position: absolute; left: ' +
+                        _js_str(page.get(f'conv{n}PosL') or 50) + 'px; top: ' +
+                        _js_str(page.get(f'conv{n}PosT') or 50) + 'px;" onclick="speakText' + n + '()">' +
+                        page['conv' + n] + '</div>')
+
+    buttons = page.get('teleportButtons')
+    if isinstance(buttons, list):
+        for button in buttons:
+            if not isinstance(button, dict):
+                continue
+            if _truthy(button.get('name')) and _truthy(button.get('url')) and _truthy(button.get('position')):
+                white = button.get('color') == 'white'
+                style = ('position: absolute; padding: 10px 15px; border: none; cursor: pointer; font-size: 24pt; '
+                         'font-weight: bold; border-radius: 0; z-index: 9999; background-color: rgba(' +
+                         ('255,255,255' if white else '0,0,0') + ', 0.6); color: ' + ('black' if white else 'white') +
+                         '; ' + TELEPORT_POSITIONS.get(button.get('position'), ''))
+                args = ', '.join(json_stringify(button[key]) if key in button else 'undefined'
+                                 for key in ('url', 'newWindow', 'loop'))
+                content += ('<button class="teleportButton" onclick=\'handleTeleportClick(' + args + ')\' style="' +
+                            style + '">' + _js_str(button['name']) + '</button>')
+    return content
+
+
+def generate_page_html(page, versions):
+    """
+    Full pageN.html for one pageData object
+
+    Args:
+        page (dict): pageData (showPageNumber defaults to true, as in the batch updater)
+        versions (dict): script name -> ?v= cache-buster (see script_versions())
+    """
+    if 'showPageNumber' not in page:
+        page = dict(page, showPageNumber=True)
+    bg_color = _js_str(page.get('sceneBgColor') or '#ffffff')
+    fields = {'bg_color': bg_color, 'page_json': json_stringify(page), 'content': page_content(page)}
+    fields.update(('v_' + name, versions[name]) for name in PAGE_SCRIPTS)
+    return render_page(fields)
+
+
+def script_versions(story_dir):
+    """Content hash of each page script, so ?v= only changes when the script does"""
+    versions = {}
+    for name in PAGE_SCRIPTS:
+        path = Path(story_dir) / "javascript" / f"{name}.js"
+        try:
+            versions[name] = hashlib.sha1(path.read_bytes()).hexdigest()[:10]
+        except OSError:
+            versions[name] = "0"
+    return versions
+
+
+def _same_bytes(path, data):
+    try:
+        # Different size means different content, no need to read the file
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest()
+    except OSError:
+        return False
+
+
+def write_if_changed(path, html, force=False):
+    """Write html to path unless the file already has exactly these bytes; returns whether it wrote"""
+    data = html.encode('utf-8')
+    if not force and _same_bytes(path, data):
+        return False
+    temp_path = str(path) + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return True
+
+
+def render_pages(task):
+    """Worker: render and write a chunk of pages; returns [(page number, written, error)]"""
+    story_dir, versions, items, force = task
+    results = []
+    for page_num, page in items:
+        try:
+            html = generate_page_html(page, versions)
+            results.append((page_num, write_if_changed(Path(story_dir) / f"page{page_num}.html", html, force), None))
+        except Exception as e:
+            results.append((page_num, False, str(e)))
+    return results
+
+
+def generate_story(story_dir, workers=None, force=False):
+    """
+    Regenerate every page of a story from its json/pages.json
+
+    Args:
+        workers (int): Pool size (default: CPU count); stories under POOL_MIN_PAGES
+            pages, or workers=1, render in this process
+        force (bool): Rewrite pages even if their bytes are unchanged
+
+    Returns:
+        dict: "written", "unchanged" and "failed" page numbers, or None if pages.json is unusable
+    """
+    pages_json_path = Path(story_dir) / "json" / "pages.json"
+    try:
+        with open(pages_json_path, 'r', encoding='utf-8') as f:
+            pages = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot read {pages_json_path}: {e}")
+        return None
+
+    versions = script_versions(story_dir)
+    items = [(int(key), page) for key, page in pages.items() if key.isdigit()]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(items) < POOL_MIN_PAGES:
+        results = render_pages((story_dir, versions, items, force))
+    else:
+        # A few chunks per worker: page rendering is fast, process round-trips are not
+        size = max(1, math.ceil(len(items) / (workers * 4)))
+        tasks = [(story_dir, versions, items[i:i + size], force) for i in range(0, len(items), size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = [result for chunk in executor.map(render_pages, tasks) for result in chunk]
+
+    summary = {"written": [], "unchanged": [], "failed": []}
+    for page_num, written, error in sorted(results):
+        if error:
+            summary["failed"].append(page_num)
+            print(f"  ❌ page{page_num}.html: {error}")
+        else:
+            summary["written" if written else "unchanged"].append(page_num)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate pageN.html files from json/pages.json.")
+    parser.add_argument("folders", nargs="+", help="Story folders")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for large stories (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Rewrite every page even if unchanged")
+    args = parser.parse_args()
+
+    failed = False
+    for folder in args.folders:
+        start_time = time.time()
+        summary = generate_story(folder, args.jobs, args.force)
+        if summary is None:
+            failed = True
+            continue
+        failed = failed or bool(summary["failed"])
+        written = ", ".join(map(str, summary["written"][:20])) + (" ..." if len(summary["written"]) > 20 else "")
+        print(f"✅ {folder}: {len(summary['written'])} written, {len(summary['unchanged'])} unchanged, "
+              f"{len(summary['failed'])} failed in {time.time() - start_time:.2f} seconds"
+              + (f" (pages {written})" if written else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
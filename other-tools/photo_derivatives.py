@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Web-sized copies and thumbnails of slide folders, for organize_photos.py --derivatives
+For every slide <folder>/<n>.jpg writes:
+  <folder>/web/<n>.jpg     longest edge at most --web-size (default 1920)
+  <folder>/thumb/<n>.jpg   longest edge at most --thumb-size (default 320)
+JPEGs are decoded in draft mode, at the smallest 1/2..1/8 scale that is still
+at least the largest requested size, so a 24 MP photo is never fully decoded.
+EXIF orientation is applied, as browsers would. <folder>/.derivatives.json records
+which slide file (size, mtime, inode) and size each derivative was made from; a
+derivative is skipped while those still match, so rerunning only does new work,
+and a slide replaced by another photo with the same mtime is still redone.
+Jobs run in a process pool. Requires Pillow (pip install pillow).
+"""
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_WEB_SIZE = 1920
+DEFAULT_THUMB_SIZE = 320
+DERIVATIVE_DIRS = ("web", "thumb")
+JPEG_QUALITY = {"web": 82, "thumb": 75}
+SOURCES_FILE = ".derivatives.json"
+
+
+def source_identity(src, size):
+    """What a derivative of src at size was made from (the file, not just its mtime)"""
+    stat = os.stat(src)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "inode": stat.st_ino, "max_size": size}
+
+
+def load_sources(folder_path):
+    """{kind: {slot: source_identity()}} recorded for the folder's derivatives"""
+    try:
+        with open(os.path.join(folder_path, SOURCES_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_sources(folder_path, sources):
+    path = os.path.join(folder_path, SOURCES_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(sources, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def is_up_to_date(dst, identity, recorded):
+    """dst exists and was made from the same slide file at the same size"""
+    return os.path.exists(dst) and recorded == identity
+
+
+def make_derivatives(job):
+    """
+    Decode src once and write each (kind, dst, size) derivative via a temp file
+
+    Returns:
+        tuple: (src, number written, error message or None)
+    """
+    from PIL import Image, ImageOps
+
+    src, outputs = job
+    try:
+        with Image.open(src) as image:
+            largest = max(size for _, _, size in outputs)
+            image.draft("RGB", (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "L", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            stat = os.stat(src)
+            for kind, dst, size in sorted(outputs, key=lambda output: -output[2]):
+                image.thumbnail((size, size), Image.LANCZOS)
+                root, ext = os.path.splitext(dst)
+                temp_path = f"{root}.tmp{ext}"
+                if ext.lower() in (".jpg", ".jpeg"):
+                    image.convert("RGB").save(temp_path, "JPEG", quality=JPEG_QUALITY[kind],
+                                              optimize=True, progressive=True)
+                else:
+                    image.save(temp_path)
+                os.utime(temp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))  # for browsing; freshness is in SOURCES_FILE
+                os.replace(temp_path, dst)
+        return src, len(outputs), None
+    except (OSError, ValueError) as e:
+        return src, 0, str(e)
+
+
+def plan_derivatives(folder_path, slots, web_size=DEFAULT_WEB_SIZE, thumb_size=DEFAULT_THUMB_SIZE):
+    """
+    Jobs for the out-of-date derivatives of one folder's slides; derivatives of
+    slides that are gone are deleted
+
+    Returns:
+        tuple: ((src, [(kind, dst, size), ...]) jobs, {kind: {slot: identity}} the
+            sources file should hold once the jobs succeed)
+    """
+    sizes = {"web": web_size, "thumb": thumb_size}
+    jobs = []
+    for kind in DERIVATIVE_DIRS:
+        kind_dir = os.path.join(folder_path, kind)
+        os.makedirs(kind_dir, exist_ok=True)
+        for name in os.listdir(kind_dir):
+            if name not in slots:
+                os.remove(os.path.join(kind_dir, name))
+    recorded = load_sources(folder_path)
+    sources = {kind: {} for kind in DERIVATIVE_DIRS}
+    for slot in slots:
+        src = os.path.join(folder_path, slot)
+        outputs = []
+        for kind in DERIVATIVE_DIRS:
+            dst = os.path.join(folder_path, kind, slot)
+            identity = source_identity(src, sizes[kind])
+            sources[kind][slot] = identity
+            if not is_up_to_date(dst, identity, recorded.get(kind, {}).get(slot)):
+                outputs.append((kind, dst, sizes[kind]))
+        if outputs:
+            jobs.append((src, outputs))
+    return jobs, sources
+
+
+def remove_derivatives(folder_path):
+    """Delete the derivative folders of a slide folder that is no longer used"""
+    for kind in DERIVATIVE_DIRS:
+        kind_dir = os.path.join(folder_path, kind)
+        if os.path.isdir(kind_dir):
+            for name in os.listdir(kind_dir):
+                os.remove(os.path.join(kind_dir, name))
+            os.rmdir(kind_dir)
+    if os.path.exists(os.path.join(folder_path, SOURCES_FILE)):
+        os.remove(os.path.join(folder_path, SOURCES_FILE))
+
+
+def build_derivatives(folders, web_size=DEFAULT_WEB_SIZE, thumb_size=DEFAULT_THUMB_SIZE, workers=None):
+    """
+    Bring the derivatives of every (folder_path, slots) up to date
+
+    Returns:
+        dict: written (files), skipped (slides already up to date), failed (slides), seconds
+    """
+    start = time.perf_counter()
+    jobs = []
+    sources = {}
+    total = 0
+    for folder_path, slots in folders:
+        total += len(slots)
+        folder_jobs, sources[folder_path] = plan_derivatives(folder_path, slots, web_size, thumb_size)
+        jobs.extend(folder_jobs)
+    summary = {"written": 0, "skipped": total - len(jobs), "failed": 0}
+    if len(jobs) <= 1 or workers == 1:
+        results = list(map(make_derivatives, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(make_derivatives, jobs))
+    for src, written, error in results:
+        if error:
+            summary["failed"] += 1
+            print(f"  ❌ {src}: {error}")
+            # Not recorded, so the next run tries again
+            folder_path, slot = os.path.split(src)
+            for kind in DERIVATIVE_DIRS:
+                sources[folder_path][kind].pop(slot, None)
+        summary["written"] += written
+    for folder_path, folder_sources in sources.items():
+        save_sources(folder_path, folder_sources)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Perceptual hashes of sequence photos, for organize_photos.py --similar
+Each photo gets a 64-bit difference hash (dHash): the image is decoded at a
+reduced size (JPEG draft mode), shrunk to 9x8 grey pixels, and every bit says
+whether a pixel is brighter than its right neighbour. Near-duplicate shots
+(a burst, a re-take) differ in only a few bits; the Hamming distance between
+hashes is the measure of similarity.
+
+Hashes are computed in a process pool and cached in the photo folder by file
+size and mtime, so only new or edited photos are decoded on later runs.
+Requires Pillow (pip install pillow).
+"""
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+HASH_CACHE = ".organize_hashes.json"
+HASH_SIZE = 8
+DEFAULT_THRESHOLD = 6  # bits of 64 that may differ for two shots to count as near-duplicates
+
+
+def check_pillow():
+    """Error message if Pillow is missing, else None"""
+    try:
+        import PIL  # noqa: F401
+    except ImportError as e:
+        return f"Pillow unavailable ({e}); pip install pillow"
+    return None
+
+
+def dhash(path, hash_size=HASH_SIZE):
+    """64-bit difference hash of the image at path"""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        # Let the JPEG decoder skip detail we are about to throw away (1/2..1/8 scale)
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        pixels = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR).tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def _hash_job(path):
+    try:
+        return dhash(path), None
+    except (OSError, ValueError) as e:
+        return None, str(e)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def load_cache(source_dir):
+    """{filename: [size, mtime_ns, hash hex]} from the last run ({} if there is none)"""
+    try:
+        with open(os.path.join(source_dir, HASH_CACHE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(source_dir, cache):
+    path = os.path.join(source_dir, HASH_CACHE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=0, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def hash_photos(source_dir, filenames, workers=None, update_cache=True):
+    """
+    Perceptual hash of every photo, reusing the cache for unchanged files
+
+    Photos that cannot be decoded are left out (and reported). Unless
+    update_cache is False, the cache is rewritten with the photos of this run.
+
+    Returns:
+        tuple: ({filename: hash}, number of photos that were decoded)
+    """
+    cache = load_cache(source_dir)
+    hashes = {}
+    stamps = {}
+    todo = []
+    for filename in filenames:
+        stat = os.stat(os.path.join(source_dir, filename))
+        stamps[filename] = [stat.st_size, stat.st_mtime_ns]
+        cached = cache.get(filename)
+        if cached and cached[:2] == stamps[filename]:
+            hashes[filename] = int(cached[2], 16)
+        else:
+            todo.append(filename)
+
+    if todo:
+        paths = [os.path.join(source_dir, filename) for filename in todo]
+        if len(todo) == 1 or workers == 1:
+            results = list(map(_hash_job, paths))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_hash_job, paths, chunksize=16))
+        for filename, (value, error) in zip(todo, results):
+            if error:
+                print(f"  ⚠️  Cannot hash {filename}: {error}")
+            else:
+                hashes[filename] = value
+
+    if update_cache:
+        save_cache(source_dir, {filename: stamps[filename] + [f"{value:016x}"]
+                                for filename, value in hashes.items()})
+    return hashes, len(todo)
+
+
+def dedup_files(files, hashes, threshold=DEFAULT_THRESHOLD):
+    """
+    Drop near-duplicates within one sequence, keeping the first shot of each
+
+    Returns:
+        tuple: (kept files, dropped files), both in sequence order
+    """
+    kept, dropped, kept_hashes = [], [], []
+    for filename in files:
+        value = hashes.get(filename)
+        if value is not None and any(hamming(value, other) <= threshold for other in kept_hashes):
+            dropped.append(filename)
+            continue
+        kept.append(filename)
+        if value is not None:
+            kept_hashes.append(value)
+    return kept, dropped
+
+
+def split_files(files, hashes, max_per_folder, threshold=DEFAULT_THRESHOLD):
+    """
+    Cut one sequence into batches of at most max_per_folder files, starting a
+    new batch early whenever a shot is a near-duplicate of one already in the
+    current batch, so no folder holds two near-identical slides
+    """
+    batches, batch, batch_hashes = [], [], []
+    for filename in files:
+        value = hashes.get(filename)
+        similar = value is not None and any(hamming(value, other) <= threshold for other in batch_hashes)
+        if batch and (len(batch) >= max_per_folder or similar):
+            batches.append(batch)
+            batch, batch_hashes = [], []
+        batch.append(filename)
+        if value is not None:
+            batch_hashes.append(value)
+    if batch:
+        batches.append(batch)
+    return batches
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# python3 story_build.py ../stories/story1 [--all [--stories-dir DIR]] [--compress gzip br]
+# -*- coding: utf-8 -*-
+"""
+Precompile story folders for static serving
+Writes <story>/build/ with everything server.js would otherwise compute per request:
+  pageN.html           the page, its media/ src/href URLs versioned (?v=<hash>) for caching
+  pageN.nosub.html     the same without subtitles (title, descript, conv, animation and
+                       teleport buttons), the ?noSubtitles=1 variant
+  media-manifest.json  every file under media/: bytes, sha256 and versioned url
+  *.gz / *.br          pre-compressed copies of the above (--compress; br needs the brotli module)
+Media hashes are kept per file by mtime/size (build/.build-state.json, or taken from
+json/media-index.json written by media_index.py), so a rebuild only reads new or changed
+media; outputs are only rewritten when their content changes. server.js serves build/
+pages when they are at least as new as the source page and no media file is newer
+than the manifest, so an unchanged output of a re-saved page (or the manifest after
+media were touched) gets its mtime bumped instead.
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from pageNhtml2json import STORIES_DIR, find_page_files, story_folders, page_fingerprint
+from media_index import media_files, load_index
+from jobkit import Timings, add_runtime_arguments, timings_from_args
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BUILD_DIR = "build"
+STATE_FILE = ".build-state.json"
+MANIFEST_FILE = "media-manifest.json"
+NOSUB_SUFFIX = ".nosub.html"
+VERSION_LENGTH = 10  # hex digits of the sha256 in ?v=
+COMPRESSIONS = ("gzip", "br")
+COMPRESSED_SUFFIX = {"gzip": ".gz", "br": ".br"}
+
+# The same elements server.js strips for ?noSubtitles=1
+SUBTITLE_PATTERNS = [
+    re.compile(r'<div class="title"[^>]*>[\s\S]*?</div>'),
+    re.compile(r'<div class="descript"[^>]*>[\s\S]*?</div>'),
+    re.compile(r'<div class="conv"[^>]*>[\s\S]*?</div>'),
+    re.compile(r'<button[^>]*id="animationPlayButton"[^>]*>[\s\S]*?</button>'),
+    re.compile(r'<button class="teleportButton"[^>]*>[\s\S]*?</button>'),
+]
+# src="media/6.jpg", href='media/a.mp3' (pageData in the script is left alone: players compare those URLs)
+MEDIA_ATTRIBUTE = re.compile(r'''(\b(?:src|href)\s*=\s*["'])(media/[^"'?#]+)(?=["'])''')
+
+
+def check_brotli():
+    """Return an error message if brotli compression is unavailable, else None"""
+    if brotli is None:
+        return "Brotli compression needs the brotli module (pip install brotli)"
+    return None
+
+
+def _load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_if_changed(path, data):
+    """Atomically replace path with data (bytes) unless it already holds exactly that; returns whether it wrote"""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    temp_path = str(path) + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return True
+
+
+def hash_media(folder_path, previous, workers=None):
+    """
+    {relative path: fingerprint} for every media file, re-hashing only files whose
+    mtime/size changed since previous; returns (fingerprints, number hashed)
+    """
+    files = media_files(folder_path)
+
+    def fingerprint(name):
+        return page_fingerprint(os.path.join(folder_path, name), previous.get(name))
+
+    # hashlib releases the GIL on large reads, so threads are enough
+    with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as executor:
+        results = list(executor.map(fingerprint, files))
+    prints = {name: result[0] for name, result in zip(files, results)}
+    # page_fingerprint() hands back the previous fingerprint itself when it did not read the file
+    hashed = sum(1 for name in files if prints[name] is not previous.get(name))
+    return prints, hashed
+
+
+def build_manifest(prints):
+    files = {}
+    for name, fingerprint in prints.items():
+        files[name] = {"bytes": fingerprint["size"], "sha256": fingerprint["sha256"],
+                       "url": f"{name}?v={fingerprint['sha256'][:VERSION_LENGTH]}"}
+    return {"files": files}
+
+
+def version_media_urls(html, manifest):
+    """Add ?v=<hash> to media/ src/href attributes of files in the manifest"""
+    files = manifest["files"]
+
+    def versioned(match):
+        entry = files.get(match.group(2))
+        return match.group(1) + (entry["url"] if entry else match.group(2))
+
+    return MEDIA_ATTRIBUTE.sub(versioned, html)
+
+
+def strip_subtitles(html):
+    for pattern in SUBTITLE_PATTERNS:
+        html = pattern.sub("", html)
+    return html
+
+
+def compress(data, method):
+    if method == "gzip":
+        # mtime=0: identical input gives identical output, so unchanged files are not rewritten
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+
+def _keep_newer_than(path, source_mtime_ns):
+    """Bump an unchanged output's mtime to now (or the source's, if later) if its source was saved after it was written"""
+    if source_mtime_ns is not None and os.stat(path).st_mtime_ns < source_mtime_ns:
+        mtime_ns = max(time.time_ns(), source_mtime_ns)
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def write_output(build_dir, name, data, compressions, source_mtime_ns=None):
+    """
+    Write build/name (and compressed copies worth keeping); returns the number of files written
+
+    With source_mtime_ns, outputs left as they are still end up at least as new as
+    the source (server.js only serves build files that are).
+    """
+    path = build_dir / name
+    written = int(_write_if_changed(path, data))
+    if not written:
+        _keep_newer_than(path, source_mtime_ns)
+    for method in COMPRESSIONS:
+        compressed_path = build_dir / (name + COMPRESSED_SUFFIX[method])
+        if method not in compressions:
+            if compressed_path.exists():
+                os.remove(compressed_path)  # would go stale
+            continue
+        if not written and compressed_path.exists():
+            _keep_newer_than(compressed_path, source_mtime_ns)
+            continue
+        packed = compress(data, method)
+        if len(packed) < len(data):
+            if _write_if_changed(compressed_path, packed):
+                written += 1
+            else:
+                _keep_newer_than(compressed_path, source_mtime_ns)
+        elif compressed_path.exists():
+            os.remove(compressed_path)  # not smaller: serve the plain file
+    return written
+
+
+def build_story(folder_path, compressions=(), workers=None, timings=None):
+    """
+    Build one story folder into <folder>/build/
+
+    Returns:
+        dict: pages, media files, media hashed (new/changed), files written, output folder
+    """
+    timings = timings or Timings()
+    folder_path = Path(folder_path)
+    build_dir = folder_path / BUILD_DIR
+    build_dir.mkdir(exist_ok=True)
+    state = _load_json(build_dir / STATE_FILE)
+    written = 0
+
+    # Hashes media_index.py already took count as known (page_fingerprint() still checks mtime/size)
+    previous = {name: {key: entry[key] for key in ("mtime_ns", "size", "sha256")}
+                for name, entry in load_index(folder_path)["files"].items() if entry.get("sha256")}
+    previous.update(state.get("media", {}))
+
+    with timings.timed("media", story=str(folder_path)):
+        prints, hashed = hash_media(folder_path, previous, workers)
+        manifest = build_manifest(prints)
+        data = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+        newest_media = max((fingerprint["mtime_ns"] for fingerprint in prints.values()), default=None)
+        written += write_output(build_dir, MANIFEST_FILE, data, compressions, newest_media)
+
+    page_files = find_page_files(folder_path)
+    with timings.timed("pages", story=str(folder_path), pages=len(page_files)):
+        names = set()
+        for page_num, file_path in page_files:
+            html = version_media_urls(Path(file_path).read_text(encoding="utf-8"), manifest)
+            name = f"page{page_num}.html"
+            nosub_name = f"page{page_num}{NOSUB_SUFFIX}"
+            source_mtime_ns = os.stat(file_path).st_mtime_ns
+            written += write_output(build_dir, name, html.encode("utf-8"), compressions, source_mtime_ns)
+            written += write_output(build_dir, nosub_name, strip_subtitles(html).encode("utf-8"), compressions,
+                                    source_mtime_ns)
+            names.update((name, nosub_name))
+        # Pages deleted from the story leave the build too
+        for path in build_dir.glob("page*.html*"):
+            base = path.name[:-3] if path.suffix in (".gz", ".br") else path.name
+            if base not in names:
+                path.unlink()
+
+    state = {"media": prints, "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+    with open(build_dir / (STATE_FILE + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(build_dir / (STATE_FILE + ".tmp"), build_dir / STATE_FILE)
+    return {"pages": len(page_files), "media": len(prints), "hashed": hashed, "written": written,
+            "output": str(build_dir)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompile story folders (page variants, media manifest, compressed copies) into build/.",
+        epilog="Example: python story_build.py ../stories/story1 --compress gzip")
+    parser.add_argument("folders", nargs="*", help="Story folders")
+    parser.add_argument("--all", action="store_true", help="Also build every story folder under --stories-dir")
+    parser.add_argument("--stories-dir", default=STORIES_DIR, help="Folder searched by --all (default: the repo's stories/)")
+    parser.add_argument("--compress", nargs="+", choices=COMPRESSIONS, default=[],
+                        help="Also write pre-compressed .gz and/or .br copies (br needs the brotli module)")
+    parser.add_argument("--workers", type=int, default=None, help="Threads for hashing media (default: up to 8)")
+    add_runtime_arguments(parser, jobs=None, retries=None)
+    args = parser.parse_args()
+
+    folders = story_folders(args)
+    if not folders:
+        parser.print_usage()
+        sys.exit(1)
+    if "br" in args.compress:
+        error = check_brotli()
+        if error:
+            print(f"❌ {error}")
+            sys.exit(1)
+
+    timings = timings_from_args(args)
+    start_time = time.time()
+    for folder in folders:
+        if not find_page_files(folder):
+            print(f"❌ No pageN.html files found in {folder}")
+            continue
+        result = build_story(folder, args.compress, args.workers, timings)
+        print(f"✅ {folder}: {result['pages']} pages, {result['media']} media files "
+              f"({result['hashed']} hashed), {result['written']} files written -> {result['output']}")
+    print(f"📊 Built {len(folders)} stories in {time.time() - start_time:.2f} seconds")
+    if args.timings:
+        timings.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# python3 tts_postprocess.py out_dir 1.mp3 2.mp3 ... [--format opus] [--sprite narration]
+# -*- coding: utf-8 -*-
+"""
+Post-processing for generated narration audio
+Trims leading/trailing silence, normalizes every line to the same loudness
+(two-pass EBU R128 loudnorm) and re-encodes to a compact speech format in a
+process pool. Optionally packs all lines into one sprite file plus a JSON
+offset index so the player can fetch a story's narration in one request; the
+sprite is encoded once from the processed PCM of every line, so offsets are exact
+sample counts and the audio is not encoded twice. Silent lines are encoded as they
+are (nothing to trim or normalize). Requires ffmpeg on PATH.
+"""
+import os
+import re
+import json
+import math
+import time
+import wave
+import shutil
+import tempfile
+import subprocess
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+# format name -> (file extension, ffmpeg audio codec, sample rate)
+FORMATS = {
+    "opus": (".opus", "libopus", 24000),
+    "mp3": (".mp3", "libmp3lame", 22050),
+    "aac": (".m4a", "aac", 24000),
+}
+DEFAULT_FORMAT = "opus"
+DEFAULT_BITRATE = "32k"
+DEFAULT_LUFS = -16.0
+SILENCE_THRESHOLD = "-50dB"
+
+# Trim silence at the start, then reverse and trim again to handle the end
+TRIM_FILTER = (
+    f"silenceremove=start_periods=1:start_threshold={SILENCE_THRESHOLD}:start_silence=0.05,"
+    "areverse,"
+    f"silenceremove=start_periods=1:start_threshold={SILENCE_THRESHOLD}:start_silence=0.05,"
+    "areverse"
+)
+
+
+def _loudnorm(target_lufs, measured=None):
+    """Build the loudnorm filter for the measuring pass or the linear correcting pass"""
+    base = f"loudnorm=I={target_lufs}:TP=-1.5:LRA=11"
+    if measured is None:
+        return base + ":print_format=json"
+    return (
+        f"{base}:measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+        f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+        f":offset={measured['target_offset']}:linear=true"
+    )
+
+
+def measure_loudness(src, target_lufs=DEFAULT_LUFS, trim=True):
+    """First loudnorm pass: returns the measured stats printed by ffmpeg"""
+    filters = (TRIM_FILTER + "," if trim else "") + _loudnorm(target_lufs)
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-nostats', '-i', src, '-af', filters, '-f', 'null', '-'],
+        check=True, capture_output=True, text=True,
+    )
+    match = re.search(r'\{[^{}]*"input_i"[^{}]*\}', result.stderr)
+    if not match:
+        raise RuntimeError(f"loudnorm produced no measurement for {src}")
+    return json.loads(match.group(0))
+
+
+def _is_silent(measured):
+    """loudnorm measures -inf for input with nothing above its gate (or nothing left after trimming)"""
+    try:
+        return not math.isfinite(float(measured["input_i"]))
+    except ValueError:
+        return True
+
+
+def postprocess_file(src, dst, fmt=DEFAULT_FORMAT, bitrate=DEFAULT_BITRATE,
+                     target_lufs=DEFAULT_LUFS, trim=True, pcm_path=None):
+    """
+    Trim, normalize and re-encode one audio file
+
+    Args:
+        pcm_path (str): Also keep the processed audio here as 16-bit mono WAV
+            (at the format's sample rate), for build_sprite()
+
+    Returns:
+        dict: src, dst, pcm, ok, silent, bytes_in, bytes_out, seconds and error (if any)
+    """
+    start = time.perf_counter()
+    result = {"src": src, "dst": dst, "pcm": pcm_path, "ok": False, "silent": False,
+              "bytes_in": os.path.getsize(src), "bytes_out": 0}
+    _, codec, sample_rate = FORMATS[fmt]
+    try:
+        measured = measure_loudness(src, target_lufs, trim)
+        if _is_silent(measured):
+            # Trimming would leave no audio and loudnorm cannot scale silence
+            result["silent"] = True
+            filters = None
+        else:
+            filters = (TRIM_FILTER + "," if trim else "") + _loudnorm(target_lufs, measured)
+        command = ['ffmpeg', '-hide_banner', '-y', '-i', src] + (['-af', filters] if filters else [])
+        output = ['-ac', '1', '-ar', str(sample_rate), '-map_metadata', '-1']
+        if pcm_path:
+            subprocess.run(command + output + ['-c:a', 'pcm_s16le', pcm_path],
+                           check=True, capture_output=True, text=True)
+            command = ['ffmpeg', '-hide_banner', '-y', '-i', pcm_path]
+        subprocess.run(command + output + ['-c:a', codec, '-b:a', bitrate, dst],
+                       check=True, capture_output=True, text=True)
+        result["ok"] = True
+        result["bytes_out"] = os.path.getsize(dst)
+    except subprocess.CalledProcessError as e:
+        result["error"] = e.stderr.strip().splitlines()[-1] if e.stderr else str(e)
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _postprocess_job(job):
+    return postprocess_file(*job)
+
+
+def check_output_names(files, sprite=None):
+    """
+    Return an error message if outputs would overwrite each other, else None
+
+    Every line is written to <out_dir>/<stem><ext> and the sprite to <out_dir>/<sprite><ext>
+    plus <sprite>.json, so stems must be unique and the sprite name must not be one of them.
+    """
+    seen = {}
+    for src in files:
+        stem = os.path.splitext(os.path.basename(src))[0]
+        if stem in seen:
+            return f"{seen[stem]} and {src} would both be written as {stem}: rename one of them"
+        seen[stem] = src
+    if sprite and sprite in seen:
+        return f"--sprite {sprite} would overwrite the processed {seen[sprite]}: choose another sprite name"
+    return None
+
+
+def postprocess_files(files, out_dir, fmt=DEFAULT_FORMAT, bitrate=DEFAULT_BITRATE,
+                      target_lufs=DEFAULT_LUFS, trim=True, workers=None, pcm_dir=None):
+    """
+    Post-process many files in a process pool
+
+    Args:
+        files (list[str]): Source audio files
+        out_dir (str): Output directory; each file keeps its stem with the new extension
+        workers (int): Pool size (defaults to the CPU count)
+        pcm_dir (str): Also keep each processed line as <stem>.wav here (for build_sprite())
+
+    Returns:
+        list[dict]: One result per file, in input order
+    """
+    error = check_output_names(files)
+    if error:
+        raise ValueError(error)
+    os.makedirs(out_dir, exist_ok=True)
+    ext = FORMATS[fmt][0]
+    jobs = []
+    for src in files:
+        stem = os.path.splitext(os.path.basename(src))[0]
+        pcm_path = os.path.join(pcm_dir, stem + ".wav") if pcm_dir else None
+        jobs.append((src, os.path.join(out_dir, stem + ext), fmt, bitrate, target_lufs, trim, pcm_path))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_postprocess_job, jobs))
+
+    for result in results:
+        if result["ok"]:
+            note = " (silent, kept as is)" if result["silent"] else ""
+            print(f"✅ {result['src']} -> {result['dst']} ({result['bytes_in']} -> {result['bytes_out']} bytes){note}")
+        else:
+            print(f"❌ {result['src']}: {result.get('error')}")
+    return results
+
+
+def build_sprite(items, sprite_path, index_path=None, fmt=DEFAULT_FORMAT, bitrate=DEFAULT_BITRATE):
+    """
+    Pack several lines into one sprite file with a JSON offset index
+
+    The lines are joined as PCM and encoded once; start/duration come from their
+    sample counts, so they do not drift with encoder padding.
+
+    Args:
+        items (list[tuple[str, str]]): (key, WAV file) pairs in playback order, all with
+            the same channels, sample width and rate (postprocess_files(pcm_dir=...) output)
+        sprite_path (str): Output sprite file
+        index_path (str): Output index (defaults to sprite_path with .json)
+
+    Returns:
+        dict: The index ({"file": ..., "items": {key: {"start", "duration"}}})
+    """
+    if index_path is None:
+        index_path = os.path.splitext(sprite_path)[0] + ".json"
+    _, codec, sample_rate = FORMATS[fmt]
+
+    index = {"file": os.path.basename(sprite_path), "items": {}}
+    frames = 0
+    with tempfile.TemporaryDirectory() as temp_dir:
+        joined_path = os.path.join(temp_dir, "sprite.wav")
+        with wave.open(joined_path, "wb") as joined:
+            for i, (key, path) in enumerate(items):
+                with wave.open(path, "rb") as line:
+                    params = (line.getnchannels(), line.getsampwidth(), line.getframerate())
+                    if i == 0:
+                        joined.setnchannels(params[0])
+                        joined.setsampwidth(params[1])
+                        joined.setframerate(params[2])
+                    elif params != (joined.getnchannels(), joined.getsampwidth(), joined.getframerate()):
+                        raise ValueError(f"{path} does not match the other lines' WAV format")
+                    count = line.getnframes()
+                    joined.writeframes(line.readframes(count))
+                rate = params[2]
+                index["items"][str(key)] = {"start": round(frames / rate, 3), "duration": round(count / rate, 3)}
+                frames += count
+        subprocess.run(
+            ['ffmpeg', '-hide_banner', '-y', '-i', joined_path,
+             '-ac', '1', '-ar', str(sample_rate), '-c:a', codec, '-b:a', bitrate, sprite_path],
+            check=True, capture_output=True, text=True,
+        )
+    total = frames / rate if items else 0.0
+
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    print(f"✅ Sprite saved to {sprite_path} ({len(items)} lines, {total:.1f}s), index: {index_path}")
+    return index
+
+
+def add_postprocess_arguments(parser):
+    """Shared CLI options for scripts that run this stage after synthesis"""
+    parser.add_argument("--format", choices=sorted(FORMATS), default=DEFAULT_FORMAT, help="Output audio format")
+    parser.add_argument("--bitrate", default=DEFAULT_BITRATE, help="Output audio bitrate (e.g. 32k)")
+    parser.add_argument("--lufs", type=float, default=DEFAULT_LUFS, help="Target integrated loudness")
+    parser.add_argument("--no-trim", action="store_true", help="Keep leading/trailing silence")
+    parser.add_argument("--sprite", type=str, default=None, help="Also pack all lines into <out_dir>/<name> plus a JSON index")
+    parser.add_argument("--pool", type=int, default=None, help="Post-processing process pool size (default: CPU count)")
+
+
+def run_postprocess(files, out_dir, args):
+    """Run the stage (and optional sprite packing) with parsed add_postprocess_arguments() options"""
+    start_time = time.time()
+    error = check_output_names(files, args.sprite)
+    if error:
+        raise ValueError(error)
+    # The sprite is built from the processed PCM, kept only until it is packed
+    pcm_dir = tempfile.mkdtemp(prefix="tts-pcm-") if args.sprite else None
+    try:
+        results = postprocess_files(files, out_dir, args.format, args.bitrate, args.lufs,
+                                    not args.no_trim, args.pool, pcm_dir)
+        done = [r for r in results if r["ok"]]
+        bytes_in = sum(r["bytes_in"] for r in done)
+        bytes_out = sum(r["bytes_out"] for r in done)
+        print(f"📊 Post-processed {len(done)}/{len(results)} files: {bytes_in} -> {bytes_out} bytes "
+              f"in {time.time() - start_time:.2f} seconds")
+
+        if args.sprite and done:
+            sprite_path = os.path.join(out_dir, args.sprite + FORMATS[args.format][0])
+            items = [(os.path.splitext(os.path.basename(r["src"]))[0], r["pcm"]) for r in done]
+            build_sprite(items, sprite_path, fmt=args.format, bitrate=args.bitrate)
+    finally:
+        if pcm_dir:
+            shutil.rmtree(pcm_dir, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normalize, trim and re-encode narration audio files.")
+    parser.add_argument("out_dir", type=str, help="Directory for processed files")
+    parser.add_argument("files", nargs="+", help="Audio files to process (sprite order follows this list)")
+    add_postprocess_arguments(parser)
+    args = parser.parse_args()
+    error = check_output_names(args.files, args.sprite)
+    if error:
+        parser.error(error)
+
+    run_postprocess(args.files, args.out_dir, args)
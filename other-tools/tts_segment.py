@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Long-text helpers for the CosyVoice TTS scripts
+Splits narration on sentence punctuation, synthesizes the pieces in parallel
+and joins the returned MP3 data frame-by-frame (no re-encoding)
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Lines longer than this are split into several requests (0 disables splitting)
+DEFAULT_MAX_CHARS = 150
+DEFAULT_WORKERS = 4
+
+# Sentence ends: Chinese full-width marks, or English marks followed by a space, the
+# end or a CJK character (so "3.5" stays intact). Closing quotes/brackets stay attached.
+SENTENCE_END = re.compile(r'(?:[。！？；…]+|[.!?;]+(?=\s|$|[^\x00-\x7f]))[”’"\'）)\]」』]*\s*')
+# Softer break points used only when a single sentence is still too long
+CLAUSE_END = re.compile(r'(?:[，、：,:]+)\s*')
+
+
+def _split_keep(text, pattern):
+    """Split text after each match of pattern, keeping the punctuation"""
+    parts = []
+    start = 0
+    for match in pattern.finditer(text):
+        if match.end() > start:
+            parts.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        parts.append(text[start:])
+    return [p for p in parts if p.strip()]
+
+
+def _pack(pieces, max_chars):
+    """Greedily merge consecutive pieces into chunks of at most max_chars"""
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text, max_chars=DEFAULT_MAX_CHARS):
+    """
+    Split text into segments of at most max_chars, preferring sentence
+    boundaries, then clause boundaries, then a hard cut
+
+    Args:
+        text (str): Text to split
+        max_chars (int): Maximum segment length; 0/None returns the text as-is
+
+    Returns:
+        list[str]: Segments in reading order
+    """
+    text = text.strip()
+    if not max_chars or len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces = []
+    for sentence in _split_keep(text, SENTENCE_END):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in _split_keep(sentence, CLAUSE_END):
+            while len(clause) > max_chars:
+                pieces.append(clause[:max_chars])
+                clause = clause[max_chars:]
+            if clause:
+                pieces.append(clause)
+
+    return [chunk.strip() for chunk in _pack(pieces, max_chars) if chunk.strip()]
+
+
+# --- MP3 frame handling ---
+
+_BITRATES = {
+    # (version_bits, layer_bits) -> kbps table indexed by bitrate_index
+    (3, 1): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],   # MPEG1 L3
+    (2, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],       # MPEG2 L3
+    (0, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],       # MPEG2.5 L3
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _strip_id3(data):
+    """Remove a leading ID3v2 tag and a trailing ID3v1 tag"""
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+def _frame_length(data, offset):
+    """Length of the Layer III frame starting at offset, or None if not a frame header"""
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[offset + 1] >> 3) & 0x03
+    layer = (data[offset + 1] >> 1) & 0x03
+    bitrate_index = (data[offset + 2] >> 4) & 0x0F
+    rate_index = (data[offset + 2] >> 2) & 0x03
+    padding = (data[offset + 2] >> 1) & 0x01
+    if (version, layer) not in _BITRATES or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES[(version, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    coefficient = 144 if version == 3 else 72
+    return coefficient * bitrate // sample_rate + padding
+
+
+def _strip_vbr_header(data):
+    """Drop a Xing/Info/VBRI header frame; its frame count is wrong once joined"""
+    length = _frame_length(data, 0)
+    if length and (b"Xing" in data[:length] or b"Info" in data[:length] or b"VBRI" in data[:length]):
+        return data[length:]
+    return data
+
+
+def concat_mp3(chunks):
+    """
+    Join MP3 byte strings into one stream without re-encoding
+
+    Segments come from the same synthesizer settings, so their frames share
+    sample rate, channel layout and gain and can simply be appended once the
+    per-file ID3 tags and VBR header frames are removed.
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    return b"".join(_strip_vbr_header(_strip_id3(chunk)) for chunk in chunks)
+
+
+def synthesize_segments(segments, synth_fn, workers=DEFAULT_WORKERS):
+    """
+    Run synth_fn over every segment in parallel, keeping reading order
+
+    Args:
+        segments (list[str]): Text segments
+        synth_fn (callable): Takes one segment, returns audio bytes (or None on failure)
+        workers (int): Maximum concurrent requests
+
+    Returns:
+        bytes | None: Joined audio, or None if any segment failed
+    """
+    if not segments:
+        return None
+    if len(segments) == 1:
+        return synth_fn(segments[0])
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(segments)))) as executor:
+        results = list(executor.map(synth_fn, segments))
+
+    if not all(results):
+        missing = [i + 1 for i, audio in enumerate(results) if not audio]
+        print(f"❌ No audio data received for segment(s) {missing}")
+        return None
+    return concat_mp3(results)
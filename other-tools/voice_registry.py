@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# python3 voice_registry.py            (print per-voice throughput stats)
+# -*- coding: utf-8 -*-
+"""
+Cloned voice registry and per-voice throughput stats for the CosyVoice TTS scripts
+Voices live in voices.json (or $TTS_VOICES_FILE) instead of code; it is only read
+the first time a voice is looked up. Latency, bytes and errors per voice are kept
+in voice_stats.json (or $TTS_VOICE_STATS_FILE) across runs so batch runs can
+schedule slow voices first and we can estimate rendering time for a story.
+"""
+import os
+import json
+import math
+import time
+import threading
+import functools
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+VOICES_FILE = os.getenv("TTS_VOICES_FILE", os.path.join(SCRIPT_DIR, "voices.json"))
+STATS_FILE = os.getenv("TTS_VOICE_STATS_FILE", os.path.join(SCRIPT_DIR, "voice_stats.json"))
+
+DEFAULT_MODEL = "cosyvoice-v2"
+DEFAULT_MAX_CONCURRENCY = 2
+MAX_SAMPLES = 500  # recent requests kept per voice for percentiles
+
+
+@functools.lru_cache(maxsize=None)
+def load_voices(path=VOICES_FILE):
+    """
+    Read the registry once: {"1": {"voice": "...", "model": "...", "max_concurrency": 2}, ...}
+    A plain string value is shorthand for {"voice": value}.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    voices = {}
+    for key, entry in raw.items():
+        if isinstance(entry, str):
+            entry = {"voice": entry}
+        entry.setdefault("model", DEFAULT_MODEL)
+        entry.setdefault("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+        voices[str(key)] = entry
+    return voices
+
+
+def get_voice(voice_id):
+    """Registry entry for a voice ID, or None if it is not registered"""
+    return load_voices().get(str(voice_id))
+
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+class VoiceStats:
+    """Per-voice request samples, persisted as JSON between runs"""
+
+    def __init__(self, path=STATS_FILE):
+        self.path = path
+        self.voices = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.voices = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️  Ignoring unreadable voice stats {path}: {e}")
+
+    def record(self, voice_id, seconds, nbytes, chars, ok):
+        """Add one request outcome for a voice"""
+        with self._lock:
+            entry = self.voices.setdefault(str(voice_id), {"requests": 0, "errors": 0, "samples": []})
+            entry["requests"] += 1
+            if ok:
+                entry["samples"].append([round(seconds, 3), nbytes, chars])
+                del entry["samples"][:-MAX_SAMPLES]
+            else:
+                entry["errors"] += 1
+            self._dirty = True
+
+    def summary(self, voice_id):
+        """Latency p50/p95, bytes/sec, seconds/char and error rate for a voice (None if unseen)"""
+        entry = self.voices.get(str(voice_id))
+        if not entry or not entry["requests"]:
+            return None
+        samples = entry["samples"]
+        latencies = [s[0] for s in samples]
+        total_seconds = sum(latencies)
+        return {
+            "requests": entry["requests"],
+            "error_rate": entry["errors"] / entry["requests"],
+            "p50": _percentile(latencies, 0.50) if samples else None,
+            "p95": _percentile(latencies, 0.95) if samples else None,
+            "bytes_per_sec": sum(s[1] for s in samples) / total_seconds if total_seconds else None,
+            "sec_per_char": total_seconds / max(1, sum(s[2] for s in samples)) if samples else None,
+        }
+
+    def estimate(self, voice_id, chars):
+        """Expected seconds to synthesize chars characters with this voice (None if unknown)"""
+        summary = self.summary(voice_id)
+        if not summary or summary["sec_per_char"] is None:
+            return None
+        return summary["sec_per_char"] * chars
+
+    def save(self):
+        """Write the stats atomically if anything was recorded"""
+        with self._lock:
+            if not self._dirty:
+                return
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.voices, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self._dirty = False
+
+
+@functools.lru_cache(maxsize=None)
+def get_stats():
+    """Shared stats object, loaded on first use"""
+    return VoiceStats()
+
+
+def timed_call(voice_id, text, call):
+    """Run call() (returns audio bytes or None), recording its latency and size for voice_id"""
+    start = time.perf_counter()
+    audio = None
+    try:
+        audio = call()
+        return audio
+    finally:
+        get_stats().record(voice_id, time.perf_counter() - start, len(audio) if audio else 0, len(text), bool(audio))
+
+
+def print_report(stats=None):
+    """Table of per-voice throughput, slowest first"""
+    stats = stats or get_stats()
+    rows = [(voice_id, stats.summary(voice_id)) for voice_id in stats.voices]
+    rows = [row for row in rows if row[1]]
+    rows.sort(key=lambda row: row[1]["p50"] or 0, reverse=True)
+    print(f"{'voice':<8} {'requests':>8} {'errors':>7} {'p50':>8} {'p95':>8} {'KB/s':>8} {'s/char':>8}")
+    for voice_id, s in rows:
+        p50 = f"{s['p50']:.2f}s" if s["p50"] is not None else "-"
+        p95 = f"{s['p95']:.2f}s" if s["p95"] is not None else "-"
+        kbps = f"{s['bytes_per_sec'] / 1024:.1f}" if s["bytes_per_sec"] else "-"
+        spc = f"{s['sec_per_char']:.3f}" if s["sec_per_char"] is not None else "-"
+        print(f"{voice_id:<8} {s['requests']:>8} {s['error_rate']:>6.0%} {p50:>8} {p95:>8} {kbps:>8} {spc:>8}")
+
+
+if __name__ == "__main__":
+    print_report()
@@ -1,155 +1,512 @@
 """
-python youtube_download.py urls.txt
-urls.txt: [r90] https://www.youtube.com/watch?v=dQw4w9WgXcQ r stands for rotation in degrees (90, 180, 270)
-urls.txt: [c180] https://vimeo.com/12345678 c stands for cutting the video to a certain duration in seconds
+python youtube_download.py urls.txt [--workers 4] [--per-host 2]
+Each line is a URL with optional directives in square brackets, e.g.
+urls.txt: [r90] https://www.youtube.com/watch?v=dQw4w9WgXcQ
+urls.txt: [c30-90] [h720] https://vimeo.com/12345678
+urls.txt: [a] https://www.youtube.com/watch?v=dQw4w9WgXcQ
+  [rN]          rotate clockwise N degrees (90/180/270 are applied losslessly as
+                display rotation; other angles are re-encoded)
+  [cN]          download only the first N seconds
+  [cA-B]        download only A..B (seconds, m:ss or h:mm:ss, e.g. [c1:30-2:45])
+  [hN]          cap video height at N pixels (default 2160)
+  [bN]          cap total bitrate at N kbps
+  [a] / [a:fmt] audio only (fmt: mp3 (default), m4a, opus, wav)
+  [f:fmt]       video container (fmt: mp4 (default), webm, mkv)
+Cuts, caps and audio-only are pushed down into yt-dlp's format selection and
+--download-sections, so only the needed streams and ranges are fetched.
+Several videos download at once (at most --per-host per site); rotation of finished
+videos runs while the remaining downloads continue.
+Outputs are named downloads/video_<id>.<ext> where <id> hashes the URL and options, so
+reordering urls.txt never re-downloads; downloads/manifest.jsonl maps lines to files,
+duplicate lines are fetched once and finished videos are skipped on rerun.
+With --story ../stories/story1 the finished videos are also prepared for the story
+(faststart web encode, preview, poster, thumbnails in its media/, see media_prep.py).
 """
 import os
 import subprocess
-import sys
 import time
 import re
+import shlex
+import json
+import glob
+import hashlib
+import argparse
+from collections import namedtuple
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-# Get the URLs file path from command-line arguments
-if len(sys.argv) < 2:
-    print("Usage: python script.py <urls_file>")
-    sys.exit(1)
+from media_prep import add_prep_arguments, run_prep
+from jobkit import JobQueue, Timings, file_checksum, log, retry, add_runtime_arguments, timings_from_args
 
-URLS_FILE = sys.argv[1]
 # FIX: The default MAX_FILESIZE_MB constant has been removed.
 DOWNLOAD_DIR = 'downloads'
+# Downloader command; override with --downloader (e.g. a stub for testing)
+DOWNLOADER = ['yt-dlp', '--cookies-from-browser', 'chrome']
 
-if not os.path.exists(DOWNLOAD_DIR):
-    os.makedirs(DOWNLOAD_DIR)
+def build_format(directives):
+    """yt-dlp -f selector honoring height/bitrate caps, audio-only and the container"""
+    if directives.audio:
+        caps = f"[abr<={directives.max_bitrate}]" if directives.max_bitrate else ""
+        return f"bestaudio{caps}/bestaudio/best"
 
-def download_video(url, output_path, max_filesize):
+    caps = f"[height<={directives.max_height}]"
+    if directives.max_bitrate:
+        caps += f"[tbr<={directives.max_bitrate}]"
+    # Request highest quality within the caps: try VP9/AV1 first, fallback to H.264, then any format
+    codecs = ['[vcodec*=vp9]', '[vcodec*=av01]']
+    if directives.container != 'webm':
+        codecs.append('[vcodec^=avc]')
+    codecs.append('')
+    choices = [f"bestvideo{caps}{codec}+bestaudio" for codec in codecs] + [f"best{caps}"]
+    if directives.max_bitrate:
+        # Never fail outright because a site reports no bitrate: drop the bitrate cap last
+        choices.append(f"best[height<={directives.max_height}]")
+    return "/".join(choices)
+
+def download_video(url, output_path, directives, log_file=None):
     """
-    Downloads a video using yt-dlp. The max_filesize argument is now optional.
+    Downloads a video (or its audio) using yt-dlp, fetching only what the directives need.
+    With log_file set, yt-dlp output goes to that file instead of the terminal
+    (used when several downloads run at once).
     """
-    print(f"Downloading video from {url}...")
-    
+    log(f"Downloading {'audio' if directives.audio else 'video'} from {url}...")
+
     # FIX: The command is now built dynamically.
     # Start with the base command arguments that are always present.
-    command = [
-        'yt-dlp',
-        '--cookies-from-browser', 'chrome',
-        # Request highest quality: try VP9/AV1 first, fallback to H.264, then any format
-        '-f', 'bestvideo[height<=2160][vcodec*=vp9]+bestaudio/bestvideo[height<=2160][vcodec*=av01]+bestaudio/bestvideo[height<=2160][vcodec^=avc]+bestaudio/bestvideo[height<=2160]+bestaudio/best[height<=2160]',
-        '--merge-output-format', 'mp4',
+    command = DOWNLOADER + [
+        '-f', build_format(directives),
+        '--continue',  # resume .part files left by an interrupted run
         '--output', output_path,
     ]
+    if directives.audio:
+        command.extend(['--extract-audio', '--audio-format', directives.audio])
+    else:
+        # Merged downloads get the container directly; single-file (pre-merged) formats are remuxed into it
+        command.extend(['--merge-output-format', directives.container, '--remux-video', directives.container])
 
-    # If filesize limit specified, treat it as duration in seconds
-    if max_filesize is not None:
-        duration_seconds = max_filesize  # Now it's duration, not filesize
-        command.extend(['--download-sections', f'*0-{duration_seconds}'])
-        print(f"Limiting download to first {duration_seconds} seconds")
+    # Only fetch the requested time range
+    if directives.start is not None or directives.end is not None:
+        start = directives.start or 0
+        end = directives.end if directives.end is not None else 'inf'
+        command.extend(['--download-sections', f'*{start}-{end}'])
+        log(f"Limiting download to {start}-{end} seconds")
 
     # Add the URL at the very end
     command.append(url)
-    
+
     try:
-        # By removing capture_output=True, yt-dlp's output will be displayed in real-time.
-        subprocess.run(command, check=True, timeout=600)
-        print("Download successful.")
+        if log_file is None:
+            # By removing capture_output=True, yt-dlp's output will be displayed in real-time.
+            subprocess.run(command, check=True, timeout=600)
+        else:
+            with open(log_file, 'w') as f:
+                subprocess.run(command, check=True, timeout=600, stdout=f, stderr=subprocess.STDOUT)
+            os.remove(log_file)  # only kept for failed downloads
+        log(f"Download successful: {url}")
     except subprocess.CalledProcessError:
-        # The specific error from yt-dlp will be visible in the terminal output.
-        print(f"Download failed for {url}.")
+        # The specific error from yt-dlp is in the terminal output (or the log file).
+        log(f"Download failed for {url}." + (f" See {log_file}" if log_file else ""))
         return False
     except subprocess.TimeoutExpired:
-        print(f"Download timed out for {url}.")
+        log(f"Download timed out for {url}.")
         return False
     return True
 
 def process_video(command, action_name, output_path):
     """Helper function to run FFmpeg commands and handle errors."""
-    print(f"Running {action_name} on {command[2]}...")
+    log(f"Running {action_name} on {command[command.index('-i') + 1]}...")
     try:
         subprocess.run(command, check=True, capture_output=True, text=True)
-        print(f"{action_name.capitalize()} successful. Output: {output_path}")
+        log(f"{action_name.capitalize()} successful. Output: {output_path}")
         return True
     except subprocess.CalledProcessError as e:
-        print(f"Error during {action_name}: {e}\nFFmpeg stderr:\n{e.stderr}")
+        log(f"Error during {action_name}: {e}\nFFmpeg stderr:\n{e.stderr}")
         return False
 
-# Main processing loop
-def parse_urls_and_process():
-    with open(URLS_FILE, 'r') as file:
-        lines = file.readlines()
+Directives = namedtuple('Directives', 'rotation start end max_height max_bitrate audio container',
+                        defaults=(0, None, None, 2160, None, None, 'mp4'))
 
-    for idx, line in enumerate(lines, start=1):
-        line = line.strip()
-        if not line:
-            continue
+AUDIO_FORMATS = ('mp3', 'm4a', 'opus', 'wav')
+CONTAINERS = ('mp4', 'webm', 'mkv')
+DIRECTIVE_RE = re.compile(r'\[([^\[\]]*)\]')
+TIME_RE = r'(?:\d+:){0,2}\d+(?:\.\d+)?'
+DIRECTIVE_PATTERNS = [
+    ('rotation', re.compile(r'r(\d+)')),
+    ('cut', re.compile(rf'c({TIME_RE})(?:-({TIME_RE})?)?')),
+    ('max_height', re.compile(r'h(\d+)p?')),
+    ('max_bitrate', re.compile(r'b(\d+)k?')),
+    ('audio', re.compile(r'a(?::(\w+))?')),
+    ('container', re.compile(r'f:(\w+)')),
+]
 
-        line_copy = line
-        rotation_match = re.search(r'\[r(\d+)\]', line_copy)
-        angle = int(rotation_match.group(1)) if rotation_match else 0
-        if rotation_match:
-            line_copy = line_copy.replace(rotation_match.group(0), '')
-
-        duration_match = re.search(r'\[c(\d+)\]', line_copy)
-        # Parse duration limit in seconds (e.g., [c180] = 180 seconds)
-        duration_limit = int(duration_match.group(1)) if duration_match else None
-        if duration_match:
-            line_copy = line_copy.replace(duration_match.group(0), '')
-
-        url = line_copy.strip()
-
-        print("-" * 50)
-        print(f"Processing Video {idx}: URL: {url}")
-        
-        duration_display = f"{duration_limit} seconds" if duration_limit is not None else "No limit"
-        print(f"Rotation: {angle} degrees, Duration limit: {duration_display}")
-
-        # Define file paths
-        output_template = os.path.join(DOWNLOAD_DIR, f"video_{idx}.%(ext)s")
-        downloaded_file = os.path.join(DOWNLOAD_DIR, f"video_{idx}.mp4")
-        processed_file = os.path.join(DOWNLOAD_DIR, f"video_{idx}_final.mp4")
-
-        # 1. Download the video (now with optional filesize limit)
-        if os.path.exists(downloaded_file):
-            print(f"Video {downloaded_file} already exists. Skipping download.")
-        elif not download_video(url, output_template, duration_limit):
-            print(f"Skipping video {idx} due to download failure.")
-            continue
+def parse_time(value):
+    """Seconds from '90', '1:30' or '1:02:03.5'"""
+    seconds = 0.0
+    for part in value.split(':'):
+        seconds = seconds * 60 + float(part)
+    return int(seconds) if seconds.is_integer() else seconds
 
-        # 2. Process video only if rotation is specified
-        if angle != 0:
-            if os.path.exists(processed_file):
-                print(f"Processed video {processed_file} already exists. Skipping processing.")
-                print(f"Final file: {processed_file}")
-                continue
-            ffmpeg_command = ['ffmpeg', '-i', downloaded_file]
-            
-            video_filters = []
-            if angle == 90:
-                video_filters.append("transpose=1")
-            elif angle == 180:
-                video_filters.append("transpose=2,transpose=2")
-            elif angle == 270:
-                video_filters.append("transpose=2")
+def parse_line(line):
+    """
+    Split a urls.txt line into (url, Directives)
+    Raises ValueError for unknown or malformed directives.
+    """
+    options = {}
+    for match in DIRECTIVE_RE.finditer(line):
+        text = match.group(1).strip().lower()
+        for name, pattern in DIRECTIVE_PATTERNS:
+            directive = pattern.fullmatch(text)
+            if directive:
+                break
+        else:
+            raise ValueError(f"unknown directive [{text}]")
+
+        if name == 'cut':
+            first, second = directive.group(1), directive.group(2)
+            if '-' in text:
+                # [cA-B] is a range, [cA-] runs to the end
+                options['start'] = parse_time(first)
+                options['end'] = parse_time(second) if second else None
+                if options['end'] is not None and options['end'] <= options['start']:
+                    raise ValueError(f"empty time range [{text}]")
             else:
-                video_filters.append(f"rotate={angle}*PI/180")
-            
-            ffmpeg_command.extend([
-                '-vf', ",".join(video_filters),
-                '-c:v', 'mpeg4',      # Basic encoder without crf
-                '-q:v', '12',         # Higher compression for smaller file size
-                '-c:a', 'copy',
-                processed_file
-            ])
-
-            if not process_video(ffmpeg_command, "video processing (rotation)", processed_file):
-                print(f"Skipping video {idx} due to processing failure.")
+                # [cN] keeps its original meaning: the first N seconds
+                options['start'], options['end'] = None, parse_time(first)
+        elif name == 'audio':
+            audio = directive.group(1) or 'mp3'
+            if audio not in AUDIO_FORMATS:
+                raise ValueError(f"unsupported audio format [{text}] (use {', '.join(AUDIO_FORMATS)})")
+            options['audio'] = audio
+        elif name == 'container':
+            if directive.group(1) not in CONTAINERS:
+                raise ValueError(f"unsupported container [{text}] (use {', '.join(CONTAINERS)})")
+            options['container'] = directive.group(1)
+        else:
+            options[name] = int(directive.group(1))
+
+    url = DIRECTIVE_RE.sub('', line).strip()
+    if not url:
+        raise ValueError("no URL")
+    return url, Directives(**options)
+
+def host_of(url):
+    """Site a URL is downloaded from, used for per-host concurrency limits"""
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+def rotation_command(angle, source_file, output_file, mode):
+    """
+    ffmpeg command that rotates source_file clockwise by angle degrees.
+    For 90/180/270 in 'auto' mode only the display matrix is rewritten (stream copy,
+    no re-encode; players apply it). Other angles, or mode 'reencode', run one
+    libx264 encode with a fast, hardware-agnostic preset.
+    """
+    if mode == 'auto' and angle % 90 == 0:
+        # -display_rotation is counter-clockwise, the [rN] directive is clockwise
+        return ['ffmpeg', '-y', '-display_rotation:v:0', str(-(angle % 360)), '-i', source_file,
+                '-map', '0', '-c', 'copy', '-movflags', '+faststart', output_file]
+
+    if angle % 360 == 90:
+        video_filter = "transpose=1"
+    elif angle % 360 == 180:
+        video_filter = "transpose=2,transpose=2"
+    elif angle % 360 == 270:
+        video_filter = "transpose=2"
+    else:
+        video_filter = f"rotate={angle}*PI/180"
+    if output_file.endswith('.webm'):
+        # WebM only carries VP8/VP9/AV1
+        codec = ['-c:v', 'libvpx-vp9', '-deadline', 'realtime', '-cpu-used', '8', '-crf', '32', '-b:v', '0', '-pix_fmt', 'yuv420p']
+    else:
+        codec = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-pix_fmt', 'yuv420p']
+    return ['ffmpeg', '-y', '-i', source_file, '-vf', video_filter] + codec + [
+            '-c:a', 'copy', '-movflags', '+faststart', output_file]
+
+def rotate_video(idx, angle, downloaded_file, processed_file, mode='auto', keep_intermediate=False, timings=None):
+    """Rotate a downloaded video with ffmpeg; returns the final file or None"""
+    if os.path.exists(processed_file):
+        log(f"Processed video {processed_file} already exists. Skipping processing.")
+        return processed_file
+    if timings is not None:
+        with timings.timed('rotate', key=idx, angle=angle, mode=mode):
+            return rotate_video(idx, angle, downloaded_file, processed_file, mode, keep_intermediate)
+
+    # Write to a temp name so an interrupted run never leaves a half-written final file
+    root, ext = os.path.splitext(processed_file)
+    temp_file = root + '.tmp' + ext
+    ok = process_video(rotation_command(angle, downloaded_file, temp_file, mode),
+                       f"video processing (rotation, {mode})", processed_file)
+    if not ok and mode == 'auto' and angle % 90 == 0:
+        # ffmpeg before 6.1 has no -display_rotation: fall back to a single re-encode
+        log(f"Metadata rotation failed for video {idx}, re-encoding instead.")
+        ok = process_video(rotation_command(angle, downloaded_file, temp_file, 'reencode'),
+                           "video processing (rotation, reencode)", processed_file)
+    if not ok:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        log(f"Skipping video {idx} due to processing failure.")
+        return None
+
+    os.replace(temp_file, processed_file)
+    if not keep_intermediate:
+        os.remove(downloaded_file)
+    log(f"Successfully processed video {idx}. Final file: {processed_file}")
+    return processed_file
+
+# --- Manifest: downloads/manifest.jsonl is a jobkit JobQueue, one JSON line per state change
+# (queued, running, done, failed), last line per key wins ---
+
+def job_key(url, directives, rotate_mode):
+    """Stable ID for a URL + options; output files are named after it, not the line number"""
+    options = json.dumps([url, list(directives), rotate_mode if directives.rotation else None])
+    return hashlib.sha256(options.encode('utf-8')).hexdigest()[:16]
+
+def job_files(key, directives):
+    """(yt-dlp output template, downloaded file, final file) for a job"""
+    prefix = 'audio' if directives.audio else 'video'
+    ext = directives.audio or directives.container
+    return (os.path.join(DOWNLOAD_DIR, f"{prefix}_{key}.%(ext)s"),
+            os.path.join(DOWNLOAD_DIR, f"{prefix}_{key}.{ext}"),
+            os.path.join(DOWNLOAD_DIR, f"{prefix}_{key}_final.{ext}"))
+
+# Leftovers of an unfinished or failed download, never a finished output
+PARTIAL_SUFFIXES = ('.part', '.ytdl', '.temp', '.tmp')
+
+def find_output(key, directives, final=False):
+    """
+    The file a job actually produced (video_<key>.<ext>, or video_<key>_final.<ext> with final),
+    or None. The expected extension wins; otherwise any other container yt-dlp ended up with
+    (e.g. a pre-merged format it could not remux).
+    """
+    _, downloaded_file, processed_file = job_files(key, directives)
+    expected = processed_file if final else downloaded_file
+    if os.path.exists(expected):
+        return expected
+    root = os.path.splitext(expected)[0]
+    for path in sorted(glob.glob(glob.escape(root) + '.*')):
+        suffix = path[len(root):]
+        # video_<key>.f137.mp4 (unmerged stream) and .part/.ytdl files are not outputs
+        if suffix.count('.') == 1 and suffix not in PARTIAL_SUFFIXES and os.path.isfile(path):
+            return path
+    return None
+
+def final_name(downloaded_file):
+    """Rotated output next to the download, keeping its actual extension"""
+    root, ext = os.path.splitext(downloaded_file)
+    return f"{root}_final{ext}"
+
+def needs_rotation(directives):
+    """Rotation applies to video jobs only; [a] ignores [rN]"""
+    return bool(directives.rotation % 360) and not directives.audio
+
+def is_complete(record, verify=False):
+    """A job is complete if its recorded output still exists with the recorded size (and hash)"""
+    if not record or record.get('status') != 'done':
+        return False
+    try:
+        if os.path.getsize(record['output']) != record['size']:
+            return False
+    except OSError:
+        return False
+    return not verify or file_checksum(record['output']) == record['sha256']
+
+def download_job(job, quiet, retries=0, backoff=5.0, timings=None):
+    """
+    Worker: download one video
+    Returns the downloaded file (or the already rotated file when only rotation is
+    left to skip), or None if the download failed or produced no file.
+    """
+    key, url, directives, lines = job
+    output_template = job_files(key, directives)[0]
+    log_file = os.path.join(DOWNLOAD_DIR, f"{key}.log") if quiet else None
+
+    # 1. Download the video (only the streams and range the directives ask for)
+    processed_file = find_output(key, directives, final=True) if needs_rotation(directives) else None
+    if processed_file:
+        log(f"Processed video {processed_file} already exists. Skipping download.")
+        return processed_file
+    downloaded_file = find_output(key, directives)
+    if downloaded_file:
+        log(f"Video {downloaded_file} already exists. Skipping download.")
+        return downloaded_file
+    # An interrupted download leaves video_<key>.*.part; the stable name lets yt-dlp --continue it
+    start = time.perf_counter()
+    ok, attempts = retry(lambda: download_video(url, output_template, directives, log_file), retries, backoff,
+                         retry_on=(), on_retry=lambda attempt, delay, error: log(
+                             f"Retrying {url} in {delay:.1f}s (attempt {attempt + 1}/{retries + 1})"))
+    if timings is not None:
+        timings.record('download', time.perf_counter() - start, ok, key=key, host=host_of(url), attempts=attempts)
+    if not ok:
+        log(f"Skipping video {key} (line {lines[0]}) due to download failure.")
+        return None
+    downloaded_file = find_output(key, directives)
+    if downloaded_file is None:
+        log(f"Download of {url} reported success but left no video_{key}.* file; counting it as failed.")
+    return downloaded_file
+
+def read_jobs(urls_file, rotate_mode):
+    """Parse the URL list into unique jobs keyed by URL + options, remembering every line number"""
+    jobs = {}
+    with open(urls_file, 'r') as file:
+        for idx, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
                 continue
-            
-            print(f"Successfully processed video {idx}. Final file: {processed_file}")
+            try:
+                url, directives = parse_line(line)
+            except ValueError as e:
+                log(f"Skipping line {idx}: {e}")
+                continue
+            key = job_key(url, directives, rotate_mode)
+            if key in jobs:
+                jobs[key][3].append(idx)
+            else:
+                jobs[key] = (key, url, directives, [idx])
+    return jobs
+
+# Main processing loop
+def parse_urls_and_process(urls_file, workers=4, per_host=2, rotate_workers=2,
+                           rotate_mode='auto', keep_intermediate=False, verify=False,
+                           retries=0, backoff=5.0, timings=None):
+    manifest_file = os.path.join(DOWNLOAD_DIR, 'manifest.jsonl')
+    manifest = JobQueue(manifest_file)
+    timings = timings or Timings()
+    jobs = read_jobs(urls_file, rotate_mode)
+
+    # Jobs an interrupted run left queued or running stay first in line; lines removed
+    # from urls.txt since then are dropped
+    for key in manifest.pending_keys():
+        if key not in jobs:
+            manifest.discard(key)
+            log(f"Dropped queued video {key}: no longer in {urls_file}")
+    # Queue only unfinished jobs, per host so dispatching does not rescan the whole list
+    already_done = 0
+    line_count = 0
+    outputs = []  # final files of every job in the list, for later stages
+    for key, (_, url, directives, lines) in jobs.items():
+        line_count += len(lines)
+        if is_complete(manifest.get(key), verify):
+            already_done += 1
+            outputs.append(manifest.get(key)['output'])
+            continue
+        manifest.put(key, group=host_of(url), url=url, directives=directives._asdict(), lines=lines)
+    total = manifest.queued()
+    log(f"{line_count} lines, {len(jobs)} unique videos: {already_done} already complete, {total} to fetch")
+
+    stats = {'downloaded': 0, 'failed': 0, 'bytes': 0, 'finished': 0, 'outputs': outputs}
+    active_per_host = {}
+    quiet = workers > 1
+    start_time = time.time()
+
+    def finish(job, final_file):
+        key, url, directives, lines = job
+        stats['finished'] += 1
+        if final_file and not os.path.isfile(final_file):
+            log(f"Output {final_file} of video {key} is missing.")
+            final_file = None
+        if final_file:
+            size = os.path.getsize(final_file)
+            stats['bytes'] += size
+            manifest.done(key, output=final_file, size=size, sha256=file_checksum(final_file))
+            outputs.append(final_file)
         else:
-            # If no rotation, the downloaded file is the final file.
-            print(f"No rotation needed for video {idx}. Final file: {downloaded_file}")
+            stats['failed'] += 1
+            manifest.fail(key, output=None, size=0, sha256=None)
+        elapsed = time.time() - start_time
+        log(f"[{stats['finished']}/{total}] Video {key} (lines {', '.join(map(str, lines))}): {final_file or 'FAILED'} "
+            f"({stats['bytes'] / 1e6:.1f} MB in {elapsed:.1f}s, {stats['bytes'] / 1e6 / max(elapsed, 1e-9):.2f} MB/s)")
 
+    download_pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    rotate_pool = ThreadPoolExecutor(max_workers=max(1, rotate_workers))
+    downloads = {}
+    rotations = {}
+    try:
+        while manifest.queued() or downloads or rotations:
+            # Start queued downloads while the pool and the job's host have free slots
+            while len(downloads) < workers:
+                record = manifest.take(lambda host: active_per_host.get(host, 0) < per_host)
+                if record is None:
+                    break
+                job = jobs[record['key']]
+                host = record['group']
+                active_per_host[host] = active_per_host.get(host, 0) + 1
+                downloads[download_pool.submit(download_job, job, quiet, retries, backoff, timings)] = job
+
+            done, _ = wait(list(downloads) + list(rotations), timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in downloads:
+                    job = downloads.pop(future)
+                    key, url, directives = job[:3]
+                    active_per_host[host_of(url)] -= 1
+                    downloaded_file = future.result()
+                    if not downloaded_file:
+                        finish(job, None)
+                        continue
+                    stats['downloaded'] += 1
+                    # download_job() hands back video_<key>_final.<ext> when an earlier run already rotated it
+                    rotated = os.path.splitext(downloaded_file)[0].endswith('_final')
+                    processed_file = downloaded_file if rotated else final_name(downloaded_file)
+                    # 2. Process video only if rotation is specified (overlaps remaining downloads)
+                    if needs_rotation(directives):
+                        rotations[rotate_pool.submit(rotate_video, key, directives.rotation,
+                                                     downloaded_file, processed_file,
+                                                     rotate_mode, keep_intermediate, timings)] = job
+                    else:
+                        # If no rotation, the downloaded file is the final file.
+                        log(f"No rotation needed for {key}. Final file: {downloaded_file}")
+                        finish(job, downloaded_file)
+                else:
+                    finish(rotations.pop(future), future.result())
+    finally:
+        download_pool.shutdown(wait=False, cancel_futures=True)
+        rotate_pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.time() - start_time
+    log("-" * 50)
+    log(f"Finished {total} videos: {stats['downloaded']} downloaded, {stats['failed']} failed, "
+        f"{stats['bytes'] / 1e6:.1f} MB final output, {stats['bytes'] / 1e6 / max(elapsed, 1e-9):.2f} MB/s overall")
+    log(f"Line -> file mapping: {manifest_file}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download (and optionally rotate/cut) videos listed in a URLs file.")
+    parser.add_argument("urls_file", help="Text file with one URL (plus optional [directives]) per line")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent downloads")
+    parser.add_argument("--per-host", type=int, default=2, help="Concurrent downloads per site")
+    parser.add_argument("--rotate-workers", type=int, default=2, help="Concurrent ffmpeg rotation jobs")
+    parser.add_argument("--rotate-mode", choices=['auto', 'reencode'], default='auto',
+                        help="auto: lossless display-matrix rotation for 90/180/270, re-encode otherwise")
+    parser.add_argument("--keep-intermediate", action="store_true", help="Keep video_<id>.<ext> after writing video_<id>_final.<ext>")
+    parser.add_argument("--verify", action="store_true", help="Re-hash completed outputs instead of trusting their recorded size")
+    parser.add_argument("--downloader", type=str, default=None,
+                        help="Downloader command replacing 'yt-dlp --cookies-from-browser chrome' (e.g. a test stub)")
+    parser.add_argument("--story", type=str, default=None,
+                        help="Story directory: prepare finished videos for it into <story>/media")
+    add_prep_arguments(parser)
+    add_runtime_arguments(parser, jobs=None, retries=2, backoff=5.0)
+    args = parser.parse_args()
+
+    global DOWNLOADER
+    if args.downloader:
+        DOWNLOADER = shlex.split(args.downloader)
+
+    if not os.path.exists(DOWNLOAD_DIR):
+        os.makedirs(DOWNLOAD_DIR)
 
-if __name__ == '__main__':
     start_time = time.time()
-    parse_urls_and_process()
-    print(f"\nTotal processing time: {time.time() - start_time:.2f} seconds.")
\ No newline at end of file
+    timings = timings_from_args(args)
+    stats = parse_urls_and_process(args.urls_file, args.workers, args.per_host, args.rotate_workers,
+                                   args.rotate_mode, args.keep_intermediate, args.verify,
+                                   args.retries, args.backoff, timings)
+    if args.timings:
+        timings.report()
+    if args.story:
+        videos = [path for path in stats['outputs'] if not os.path.basename(path).startswith('audio_')]
+        if videos:
+            run_prep(videos, args.story, args)
+    print(f"\nTotal processing time: {time.time() - start_time:.2f} seconds.")
+
+
+if __name__ == '__main__':
+    main()
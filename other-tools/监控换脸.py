@@ -3,7 +3,9 @@ import time
 import shutil
 import subprocess
 import glob
+import argparse
 from PIL import Image
+from jobkit import run_jobs, add_runtime_arguments, timings_from_args
 
 # --- Configuration ---
 SOURCE_DIR = "/Volumes/Users/DevAdmin/Pictures/Screenshots"
@@ -150,11 +152,24 @@ def process_single_file_with_facefusion(script_dir, input_file_path_abs, output_
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description="Watch a folder and run facefusion on new images and videos.")
+    parser.add_argument("--source-dir", default=SOURCE_DIR, help=f"Folder to watch (default: {SOURCE_DIR})")
+    parser.add_argument("--interval", type=int, default=INTERVAL_SECONDS,
+                        help=f"Seconds between checks (default: {INTERVAL_SECONDS})")
+    parser.add_argument("--settle", type=float, default=5,
+                        help="Seconds to let new source files finish writing before copying (default: 5)")
+    parser.add_argument("--once", action="store_true", help="Run a single check cycle and exit")
+    # One facefusion at a time by default: each run already loads the GPU; raise --jobs if memory allows
+    add_runtime_arguments(parser, jobs=1, retries=1, backoff=10.0)
+    args = parser.parse_args()
+    source_dir = args.source_dir
+    timings = timings_from_args(args)
+
     script_dir = get_script_dir()
     input_dir, output_dir = ensure_dirs(script_dir)
     seen_files = load_seen_files(script_dir)
 
-    print(f"Monitoring directory: {SOURCE_DIR} for new files every {INTERVAL_SECONDS} seconds.")
+    print(f"Monitoring directory: {source_dir} for new files every {args.interval} seconds.")
     print(f"Input directory for media: {input_dir}")
     print(f"Output directory for processed media: {output_dir}")
     print(f"Using source image for facefusion: {os.path.join(script_dir, SRC_FILENAME)}")
@@ -173,7 +188,16 @@ def main():
     if not os.path.exists(facefusion_script_path):
          print(f"ERROR: facefusion.py not found at {facefusion_script_path}. Please ensure it's in the script directory.")
 
+    def facefusion(input_file_path_abs):
+        return process_single_file_with_facefusion(script_dir, input_file_path_abs, output_dir, src_file_path_abs, python_interpreter, facefusion_script_path)
+
+    def facefusion_batch(files):
+        """Run facefusion on [(name, input path)], --jobs at a time with --retries"""
+        return run_jobs(files, facefusion, workers=args.jobs, retries=args.retries, backoff=args.backoff,
+                        timings=timings, stage="facefusion")
+
     while True:
+        timed_jobs = len(timings.records)
         # --- Stage 1: Process existing files in the input directory ---
         # This will run regardless of SOURCE_DIR accessibility.
         print(f"\n{time.strftime('%Y-%m-%d %H:%M:%S')} - Checking for un-processed files in input directory: {input_dir}...")
@@ -183,11 +207,8 @@ def main():
         if not files_in_input:
             print("No supported files found in input directory to process.")
         else:
-            processed_count_in_input = 0
-            for filename_in_input in files_in_input:
-                input_file_path_abs = os.path.join(input_dir, filename_in_input)
-                if process_single_file_with_facefusion(script_dir, input_file_path_abs, output_dir, src_file_path_abs, python_interpreter, facefusion_script_path):
-                    processed_count_in_input += 1
+            summary = facefusion_batch([(f, os.path.join(input_dir, f)) for f in files_in_input])
+            processed_count_in_input = summary["ok"]
             
             if processed_count_in_input > 0:
                 print(f"Processed {processed_count_in_input} files from input directory in this cycle.")
@@ -198,8 +219,8 @@ def main():
         # --- Stage 2: Check SOURCE_DIR for new files and copy them to input_dir ---
         # This part will only run if SOURCE_DIR is accessible.
         try:
-            print(f"\n{time.strftime('%Y-%m-%d %H:%M:%S')} - Checking for new files in source directory: {SOURCE_DIR}...")
-            current_files_in_source = set(os.listdir(SOURCE_DIR))
+            print(f"\n{time.strftime('%Y-%m-%d %H:%M:%S')} - Checking for new files in source directory: {source_dir}...")
+            current_files_in_source = set(os.listdir(source_dir))
 
             new_files_relative_paths = current_files_in_source - seen_files
 
@@ -207,25 +228,26 @@ def main():
                 print("No new files found in source directory.")
             else:
                 print(f"Found {len(new_files_relative_paths)} potential new files in source directory.")
-                
-                # Process new files from SOURCE_DIR
+
+                # --- Wait once for all new source files to stabilize before copying ---
+                source_stabilize_wait_seconds = args.settle
+                print(f"Waiting {source_stabilize_wait_seconds}s for new source files to stabilize...")
+                time.sleep(source_stabilize_wait_seconds)
+
+                # Copy new files from the source directory, then face-swap them as one batch
+                copied = []
                 for filename in new_files_relative_paths:
                     # Double-check if file is already seen (debugging)
                     if filename in seen_files:
                         print(f"WARNING: {filename} is in seen_files but was detected as new. Skipping.")
                         continue
                         
-                    source_file_path_abs = os.path.join(SOURCE_DIR, filename)
+                    source_file_path_abs = os.path.join(source_dir, filename)
 
                     # Check if it's a supported file and exists
                     if os.path.isfile(source_file_path_abs) and is_supported_extension(filename):
                         print(f"Processing new supported file from source: {filename}")
 
-                        # --- Wait for source file to stabilize before copying ---
-                        source_stabilize_wait_seconds = 5
-                        print(f"Waiting {source_stabilize_wait_seconds}s for source file to stabilize: {filename}")
-                        time.sleep(source_stabilize_wait_seconds)
-
                         try:
                             source_file_size = os.path.getsize(source_file_path_abs)
                             if source_file_size == 0:
@@ -248,7 +270,7 @@ def main():
                             # Convert PNG to JPG in the source directory, then delete PNG
                             base_name, _ = os.path.splitext(filename)
                             jpg_filename = f"{base_name}.jpg"
-                            source_jpg_path = os.path.join(SOURCE_DIR, jpg_filename)
+                            source_jpg_path = os.path.join(source_dir, jpg_filename)
                             
                             # Check if JPG already exists in source directory
                             if os.path.exists(source_jpg_path):
@@ -312,17 +334,12 @@ def main():
                             seen_files.add(filename)
                             continue
 
-                        # Run facefusion
-                        if process_single_file_with_facefusion(script_dir, input_file_path_abs, output_dir, src_file_path_abs, python_interpreter, facefusion_script_path):
-                            # If successfully processed, log the current file as seen (JPG filename for converted files)
-                            save_seen_file(script_dir, filename)
-                            seen_files.add(filename)
-                            print(f"Logged source file {filename} as seen.")
-                        else:
-                            # If facefusion failed, still log as seen to avoid endless retries
-                            save_seen_file(script_dir, filename)
-                            seen_files.add(filename)
-                            print(f"Logged source file {filename} as seen, despite processing failure in this cycle.")
+                        # Log as seen now (JPG filename for converted files); a failed facefusion run is
+                        # not retried from the source either, and the copy in the input directory is
+                        # picked up by stage 1 if this cycle is interrupted before the batch below
+                        save_seen_file(script_dir, filename)
+                        seen_files.add(filename)
+                        copied.append((filename, input_file_path_abs))
 
 
                     elif os.path.isfile(source_file_path_abs) and not is_supported_extension(filename):
@@ -332,14 +349,23 @@ def main():
                     else:
                          print(f"Skipping {filename} (not a supported file or no longer exists in source).")
 
+                if copied:
+                    summary = facefusion_batch(copied)
+                    print(f"Face-swapped {summary['ok']} of {len(copied)} new files "
+                          f"({summary['failed']} failed) in {summary['seconds']:.1f}s")
+
 
         except FileNotFoundError:
-            print(f"Error: Source directory not found: {SOURCE_DIR}. Skipping checking for new files from source.")
+            print(f"Error: Source directory not found: {source_dir}. Skipping checking for new files from source.")
         except Exception as e:
             print(f"An unexpected error occurred during source directory check: {e}")
 
-        print(f"Finished check cycle. Waiting {INTERVAL_SECONDS} seconds...")
-        time.sleep(INTERVAL_SECONDS)
+        if args.timings and len(timings.records) > timed_jobs:
+            timings.report()
+        if args.once:
+            break
+        print(f"Finished check cycle. Waiting {args.interval} seconds...")
+        time.sleep(args.interval)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -4,7 +4,9 @@ import sys
 import time
 import shutil
 import subprocess
+import argparse
 from PIL import Image
+from jobkit import run_jobs, add_runtime_arguments, timings_from_args
 
 # --- Configuration ---
 SOURCE_DIR = "/Volumes/Users/DevAdmin/Pictures/Screenshots"
@@ -122,11 +124,24 @@ def process_single_file_with_facefusion(script_dir, input_file_path_abs, output_
 
 # --- Main Loop ---
 def main():
+    parser = argparse.ArgumentParser(description="Watch a folder and run facefusion on new images and videos.")
+    parser.add_argument("--source-dir", default=SOURCE_DIR, help=f"Folder to watch (default: {SOURCE_DIR})")
+    parser.add_argument("--interval", type=int, default=INTERVAL_SECONDS,
+                        help=f"Seconds between checks (default: {INTERVAL_SECONDS})")
+    parser.add_argument("--settle", type=float, default=5,
+                        help="Seconds to let new source files finish writing before copying (default: 5)")
+    parser.add_argument("--once", action="store_true", help="Run a single check cycle and exit")
+    # One facefusion at a time by default: each run already loads the GPU; raise --jobs if memory allows
+    add_runtime_arguments(parser, jobs=1, retries=1, backoff=10.0)
+    args = parser.parse_args()
+    source_dir = args.source_dir
+    timings = timings_from_args(args)
+
     script_dir = get_script_dir()
     input_dir, output_dir = ensure_dirs(script_dir)
     seen_files = load_seen_files(script_dir)
 
-    print(f"Monitoring directory: {SOURCE_DIR} every {INTERVAL_SECONDS} seconds.")
+    print(f"Monitoring directory: {source_dir} every {args.interval} seconds.")
     print(f"Input directory: {input_dir}")
     print(f"Output directory: {output_dir}")
     print(f"Source image: {os.path.join(script_dir, SRC_FILENAME)}")
@@ -141,28 +156,37 @@ def main():
     if not os.path.exists(facefusion_script_path):
         print(f"ERROR: facefusion.py not found: {facefusion_script_path}")
 
+    def facefusion(input_file_path_abs):
+        return process_single_file_with_facefusion(script_dir, input_file_path_abs, output_dir, src_file_path_abs, facefusion_script_path)
+
+    def facefusion_batch(files):
+        """Run facefusion on [(name, input path)], --jobs at a time with --retries"""
+        return run_jobs(files, facefusion, workers=args.jobs, retries=args.retries, backoff=args.backoff,
+                        timings=timings, stage="facefusion")
+
     while True:
+        timed_jobs = len(timings.records)
         # Stage 1: Process files in input dir
         print(f"\n{time.strftime('%Y-%m-%d %H:%M:%S')} - Checking input dir...")
         files_in_input = [f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f)) and is_supported_extension(f)]
-        for filename_in_input in files_in_input:
-            input_file_path_abs = os.path.join(input_dir, filename_in_input)
-            process_single_file_with_facefusion(script_dir, input_file_path_abs, output_dir, src_file_path_abs, facefusion_script_path)
+        if files_in_input:
+            facefusion_batch([(f, os.path.join(input_dir, f)) for f in files_in_input])
 
         # Stage 2: Watch source dir
         try:
             print(f"\n{time.strftime('%Y-%m-%d %H:%M:%S')} - Checking source dir...")
-            current_files_in_source = set(os.listdir(SOURCE_DIR))
+            current_files_in_source = set(os.listdir(source_dir))
             new_files_relative_paths = current_files_in_source - seen_files
 
             if not new_files_relative_paths:
                 print("No new files in source directory.")
             else:
                 print(f"Found {len(new_files_relative_paths)} new file(s) in source directory.")
+                time.sleep(args.settle)  # once for all new files, to let them finish writing
+                copied = []
                 for filename in new_files_relative_paths:
-                    source_file_path_abs = os.path.join(SOURCE_DIR, filename)
+                    source_file_path_abs = os.path.join(source_dir, filename)
                     if os.path.isfile(source_file_path_abs) and is_supported_extension(filename):
-                        time.sleep(5)
                         try:
                             source_file_size = os.path.getsize(source_file_path_abs)
                             if source_file_size == 0:
@@ -177,7 +201,7 @@ def main():
                         if filename.lower().endswith(".png"):
                             base_name, _ = os.path.splitext(filename)
                             jpg_filename = f"{base_name}.jpg"
-                            source_jpg_path = os.path.join(SOURCE_DIR, jpg_filename)
+                            source_jpg_path = os.path.join(source_dir, jpg_filename)
                             if not os.path.exists(source_jpg_path):
                                 if convert_png_to_jpg(source_file_path_abs, source_jpg_path):
                                     try:
@@ -211,7 +235,7 @@ def main():
                             continue
 
                         if wait_for_file_stable(input_file_path_abs, source_file_size):
-                            process_single_file_with_facefusion(script_dir, input_file_path_abs, output_dir, src_file_path_abs, facefusion_script_path)
+                            copied.append((filename, input_file_path_abs))
 
                         save_seen_file(script_dir, filename)
                         seen_files.add(filename)
@@ -219,13 +243,22 @@ def main():
                         print(f"Skipping unsupported or missing file: {filename}")
                         save_seen_file(script_dir, filename)
                         seen_files.add(filename)
+
+                if copied:
+                    summary = facefusion_batch(copied)
+                    print(f"Face-swapped {summary['ok']} of {len(copied)} new files "
+                          f"({summary['failed']} failed) in {summary['seconds']:.1f}s")
         except FileNotFoundError:
-            print(f"Error: Source directory not found: {SOURCE_DIR}")
+            print(f"Error: Source directory not found: {source_dir}")
         except Exception as e:
             print(f"Unexpected error during source dir check: {e}")
 
-        print(f"Finished cycle. Waiting {INTERVAL_SECONDS} seconds...")
-        time.sleep(INTERVAL_SECONDS)
+        if args.timings and len(timings.records) > timed_jobs:
+            timings.report()
+        if args.once:
+            break
+        print(f"Finished cycle. Waiting {args.interval} seconds...")
+        time.sleep(args.interval)
 
 if __name__ == "__main__":
     main()
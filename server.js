@@ -3,6 +3,7 @@ const fs = require('fs').promises;
 const path = require('path');
 const { batchUpdatePages } = require('./modules/batchUpdater');
 const { generatePageTiming, listImagesFromFolder, executeImageRenaming } = require('./modules/sourceAPI');
+const { submitJob, getJob, cancelJob, streamJobEvents } = require('./modules/jobClient');
 const app = express();
 
 // Middleware
@@ -40,6 +41,49 @@ app.get('/stories/:folder/player.html', async (req, res) => {
     }
 });
 
+// Built file (or its .br/.gz copy, if the client accepts it) that is at least as new as the source
+async function findBuiltFile(builtPath, sourcePath, encoding) {
+    const mtime = async (file) => fs.stat(file).then(stat => stat.mtimeMs).catch(() => null);
+    const sourceTime = await mtime(sourcePath);
+    const candidates = [];
+    if (encoding === 'br') candidates.push({ path: `${builtPath}.br`, encoding: 'br' });
+    if (encoding === 'br' || encoding === 'gzip') candidates.push({ path: `${builtPath}.gz`, encoding: 'gzip' });
+    candidates.push({ path: builtPath, encoding: null });
+    for (const candidate of candidates) {
+        const builtTime = await mtime(candidate.path);
+        if (builtTime !== null && sourceTime !== null && builtTime >= sourceTime) return candidate;
+    }
+    return null;
+}
+
+// Newest mtime (ms) of any file under dir, or null if there is none
+async function newestMtime(dir) {
+    const entries = await fs.readdir(dir, { withFileTypes: true }).catch(() => []);
+    let newest = null;
+    for (const entry of entries) {
+        const entryPath = path.join(dir, entry.name);
+        const time = entry.isDirectory() ? await newestMtime(entryPath)
+            : await fs.stat(entryPath).then(stat => stat.mtimeMs).catch(() => null);
+        if (time !== null && (newest === null || time > newest)) newest = time;
+    }
+    return newest;
+}
+
+// Whether build/ still versions media/ correctly: no media file is newer than the manifest.
+// Checked at most every MEDIA_CHECK_MS per story so page requests do not walk media/ each time.
+const MEDIA_CHECK_MS = 2000;
+const mediaChecks = new Map();
+async function buildMediaCurrent(folderPath) {
+    const cached = mediaChecks.get(folderPath);
+    if (cached && Date.now() - cached.time < MEDIA_CHECK_MS) return cached.current;
+    const manifestTime = await fs.stat(path.join(folderPath, 'build', 'media-manifest.json'))
+        .then(stat => stat.mtimeMs).catch(() => null);
+    const mediaTime = await newestMtime(path.join(folderPath, 'media'));
+    const current = manifestTime !== null && (mediaTime === null || mediaTime <= manifestTime);
+    mediaChecks.set(folderPath, { time: Date.now(), current });
+    return current;
+}
+
 // Handle pageN.html with subtitle control
 app.get('/stories/:folder/page:pageNum.html', async (req, res) => {
     const { folder, pageNum } = req.params;
@@ -50,6 +94,19 @@ app.get('/stories/:folder/page:pageNum.html', async (req, res) => {
         const exists = await fs.access(pagePath).then(() => true).catch(() => false);
         if (!exists) return res.status(404).send('Page not found');
 
+        // Prefer the variant precompiled by other-tools/story_build.py while it is newer than the page
+        // and its media versions are current (media changed since the build: rewrite as usual)
+        const builtName = noSubtitles === '1' ? `page${pageNum}.nosub.html` : `page${pageNum}.html`;
+        const built = await buildMediaCurrent(path.join(storiesDir, folder)) &&
+            await findBuiltFile(path.join(storiesDir, folder, 'build', builtName), pagePath,
+                req.acceptsEncodings('br', 'gzip', 'identity'));
+        if (built) {
+            res.set('Content-Type', 'text/html; charset=utf-8');
+            res.set('Vary', 'Accept-Encoding');
+            if (built.encoding) res.set('Content-Encoding', built.encoding);
+            return res.sendFile(built.path);
+        }
+
         let data = await fs.readFile(pagePath, 'utf8');
 
         if (noSubtitles === '1') {
@@ -68,6 +125,14 @@ app.get('/stories/:folder/page:pageNum.html', async (req, res) => {
     }
 });
 
+// Media URLs versioned by story_build.py (?v=<content hash>) change whenever the file does
+app.use('/stories', (req, res, next) => {
+    if (req.query.v && /\/media\//.test(req.path)) {
+        res.set('Cache-Control', 'public, max-age=31536000, immutable');  // express.static keeps it
+    }
+    next();
+});
+
 // Serve static files
 app.use('/stories', express.static(storiesDir));
 app.use('/modules', express.static(modulesDir));
@@ -269,6 +334,87 @@ app.post('/api/batch-update', async (req, res) => {
     }
 });
 
+// Jobs run local tools on local files: only the editor on this machine may use them.
+// The client must be on loopback, address the server by a loopback name (no DNS
+// rebinding) and, from a browser, be a page of this server (no cross-site requests)
+const LOOPBACK_ADDRESSES = ['127.0.0.1', '::1', '::ffff:127.0.0.1'];
+const LOOPBACK_HOSTS = ['localhost', '127.0.0.1', '[::1]'];
+
+function localEditorOnly(req, res, next) {
+    const origin = req.get('Origin');
+    const local = LOOPBACK_ADDRESSES.includes(req.socket.remoteAddress) &&
+        LOOPBACK_HOSTS.includes(req.hostname) &&
+        (!origin || origin === `${req.protocol}://${req.get('Host')}`);
+    if (!local) {
+        return res.status(403).json({ success: false, error: 'Jobs are only available to the editor on this machine' });
+    }
+    next();
+}
+
+app.use('/api/jobs', localEditorOnly);
+
+// API: Queue a Python tool job (tts, pages, photos, faceswap) on the job service;
+// args are the tool's command-line arguments, relative to the story folder
+app.post('/api/jobs', async (req, res) => {
+    try {
+        if (!req.is('application/json')) {
+            return res.status(415).json({ success: false, error: 'Send the job as Content-Type: application/json' });
+        }
+        const { operation, args } = req.body;
+        let storyFolder = req.body.story;
+        const referer = req.get('Referer');
+
+        if (!storyFolder && referer) {
+            const match = referer.match(/\/stories\/([^\/]+)\//);
+            if (match) storyFolder = decodeURIComponent(match[1]);
+        }
+
+        const cwd = storyFolder ? path.resolve(storiesDir, storyFolder) : toolsDir;
+        if (storyFolder && path.dirname(cwd) !== path.resolve(storiesDir)) {
+            // A story folder name, never a path out of stories/
+            return res.status(400).json({ success: false, error: `Invalid story folder: ${storyFolder}` });
+        }
+        const { status, body } = await submitJob(operation, args, cwd);
+        res.status(status).json(body);
+    } catch (error) {
+        console.error('Error submitting job:', error);
+        res.status(502).json({ success: false, error: error.message });
+    }
+});
+
+// API: Job status, progress and result
+app.get('/api/jobs/:id', async (req, res) => {
+    try {
+        const { status, body } = await getJob(req.params.id);
+        res.status(status).json(body);
+    } catch (error) {
+        res.status(502).json({ success: false, error: error.message });
+    }
+});
+
+// API: Cancel a queued job
+app.delete('/api/jobs/:id', async (req, res) => {
+    try {
+        const { status, body } = await cancelJob(req.params.id);
+        res.status(status).json(body);
+    } catch (error) {
+        res.status(502).json({ success: false, error: error.message });
+    }
+});
+
+// API: Stream job events (newline-delimited JSON) until the job ends
+app.get('/api/jobs/:id/events', async (req, res) => {
+    try {
+        const events = await streamJobEvents(req.params.id, req.query.since);
+        res.status(events.statusCode);
+        res.set('Content-Type', events.headers['content-type']);
+        events.pipe(res);
+        req.on('close', () => events.destroy());
+    } catch (error) {
+        res.status(502).json({ success: false, error: error.message });
+    }
+});
+
 // API: Get favorites
 app.get('/api/favorites', async (req, res) => {
     try {